@@ -1,7 +1,9 @@
 from django.contrib import admin
 from django.utils.html import format_html
 from django.utils import timezone
-from .models import Appointment
+from django.db import transaction
+from .availability import sync_day_occupancies
+from .models import Appointment, SlotHold
 
 
 @admin.register(Appointment)
@@ -89,12 +91,7 @@ class AppointmentAdmin(admin.ModelAdmin):
     
     def duracao_display(self, obj):
         """Exibe duração formatada"""
-        hours = obj.duracao_minutos // 60
-        minutes = obj.duracao_minutos % 60
-        
-        if hours > 0:
-            return f"{hours}h{minutes:02d}min" if minutes else f"{hours}h"
-        return f"{minutes}min"
+        return Appointment.format_duracao(obj.duracao_minutos)
     duracao_display.short_description = 'Duração'
     
     def status_badge(self, obj):
@@ -151,11 +148,22 @@ class AppointmentAdmin(admin.ModelAdmin):
         """Otimizar query com select_related"""
         return super().get_queryset(request).select_related('professional')
     
+    def delete_queryset(self, request, queryset):
+        """Deletar em massa e atualizar a ocupação dos dias"""
+        with transaction.atomic():
+            affected = list(queryset.values_list('professional_id', 'data_hora', 'duracao_minutos'))
+            super().delete_queryset(request, queryset)
+            sync_day_occupancies(affected)
+    
     actions = ['marcar_como_confirmada', 'marcar_como_realizada', 'cancelar_consultas']
     
     def marcar_como_confirmada(self, request, queryset):
         """Action para confirmar múltiplas consultas"""
-        updated = queryset.filter(status='AGENDADA').update(status='CONFIRMADA')
+        queryset = queryset.filter(status='AGENDADA')
+        with transaction.atomic():
+            affected = list(queryset.values_list('professional_id', 'data_hora', 'duracao_minutos'))
+            updated = queryset.update(status='CONFIRMADA')
+            sync_day_occupancies(affected)
         self.message_user(
             request,
             f'{updated} consulta(s) confirmada(s) com sucesso.'
@@ -164,9 +172,11 @@ class AppointmentAdmin(admin.ModelAdmin):
     
     def marcar_como_realizada(self, request, queryset):
         """Action para marcar como realizadas"""
-        updated = queryset.filter(
-            status__in=['AGENDADA', 'CONFIRMADA']
-        ).update(status='REALIZADA')
+        queryset = queryset.filter(status__in=['AGENDADA', 'CONFIRMADA'])
+        with transaction.atomic():
+            affected = list(queryset.values_list('professional_id', 'data_hora', 'duracao_minutos'))
+            updated = queryset.update(status='REALIZADA')
+            sync_day_occupancies(affected)
         self.message_user(
             request,
             f'{updated} consulta(s) marcada(s) como realizada(s).'
@@ -175,11 +185,22 @@ class AppointmentAdmin(admin.ModelAdmin):
     
     def cancelar_consultas(self, request, queryset):
         """Action para cancelar consultas"""
-        updated = queryset.exclude(
-            status__in=['REALIZADA', 'CANCELADA']
-        ).update(status='CANCELADA')
+        queryset = queryset.exclude(status__in=['REALIZADA', 'CANCELADA'])
+        with transaction.atomic():
+            affected = list(queryset.values_list('professional_id', 'data_hora', 'duracao_minutos'))
+            updated = queryset.update(status='CANCELADA')
+            sync_day_occupancies(affected)
         self.message_user(
             request,
             f'{updated} consulta(s) cancelada(s).'
         )
     cancelar_consultas.short_description = 'Cancelar consultas selecionadas'
+
+
+@admin.register(SlotHold)
+class SlotHoldAdmin(admin.ModelAdmin):
+    list_display = ('id', 'professional', 'data_hora', 'duracao_minutos', 'usuario', 'expira_em')
+    list_filter = ('professional',)
+    list_select_related = ('professional', 'usuario')
+    readonly_fields = ('data_hora_fim', 'created_at')
+    ordering = ('-expira_em',)
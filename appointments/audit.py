@@ -0,0 +1,119 @@
+"""
+Auditoria de overbooking (consultas ativas sobrepostas).
+
+Uma única passada em SQL por profissional: as consultas ativas são ordenadas
+por ``data_hora`` e cada uma é comparada com o maior término entre as
+anteriores (janela acumulada). Comparar só com a vizinha anterior (``LAG``)
+não basta: uma consulta longa pode cobrir várias seguintes.
+
+As expressões usam apenas ``data_hora`` e ``duracao_minutos`` para que a
+auditoria funcione também em bases anteriores às migrações 0003/0004.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime
+
+from django.db import connection, transaction
+
+from .availability import sync_day_occupancies
+from .models import Appointment, ProfessionalDayOccupancy
+
+
+@dataclass(frozen=True)
+class Overlap:
+    """Consulta que começa antes do término de outra anterior do mesmo profissional."""
+
+    professional_id: int
+    appointment_id: int
+    data_hora: datetime
+    conflita_com: int
+    conflita_ate: datetime
+
+
+# ARRAY[término, id]: o MAX da janela devolve o maior término e o id da
+# consulta dona dele, sem subconsulta correlacionada.
+OVERLAPS_SQL = """
+    SELECT professional_id, id, data_hora, anterior[2]::bigint,
+           to_timestamp(anterior[1])
+    FROM (
+        SELECT id, professional_id, data_hora,
+               MAX(ARRAY[
+                   EXTRACT(EPOCH FROM data_hora + duracao_minutos * interval '1 minute'),
+                   id
+               ]) OVER (
+                   PARTITION BY professional_id
+                   ORDER BY data_hora, id
+                   ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING
+               ) AS anterior
+        FROM {table}
+        WHERE status IN %s {extra}
+    ) janela
+    WHERE anterior IS NOT NULL
+      AND data_hora < to_timestamp(anterior[1])
+    ORDER BY professional_id, data_hora, id
+"""
+
+
+def find_overlaps(professional_id=None):
+    """Lista as sobreposições entre consultas ativas, em ordem de profissional e horário."""
+    params = [tuple(Appointment.ACTIVE_STATUSES)]
+    extra = ''
+    if professional_id is not None:
+        extra = 'AND professional_id = %s'
+        params.append(professional_id)
+
+    sql = OVERLAPS_SQL.format(table=connection.ops.quote_name(Appointment._meta.db_table), extra=extra)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [Overlap(*row) for row in cursor.fetchall()]
+
+
+def occupancy_schema_ready():
+    """
+    Indica se a base já tem o que ``sync_day_occupancies`` usa.
+
+    Antes da migração 0004 não existe ``data_hora_fim`` (nem, antes da 0002,
+    a tabela de ocupação): é o caso de quem roda ``--fix`` para destravar a
+    0003.
+    """
+    tables = connection.introspection.table_names()
+    if ProfessionalDayOccupancy._meta.db_table not in tables:
+        return False
+    with connection.cursor() as cursor:
+        columns = connection.introspection.get_table_description(cursor, Appointment._meta.db_table)
+    return any(column.name == 'data_hora_fim' for column in columns)
+
+
+def cancel_overlaps(professional_id=None, sync_occupancy=True):
+    """
+    Cancela as consultas em conflito, mantendo a que começa primeiro.
+
+    A cada rodada só são canceladas as consultas cujo conflito é com uma
+    consulta que não está, ela mesma, em conflito; a consulta seguinte pode
+    deixar de conflitar depois disso. Em cadeias comuns bastam 1–2 rodadas.
+    Retorna as sobreposições resolvidas.
+
+    Com ``sync_occupancy=False`` (bases anteriores à 0004) só os status são
+    alterados; a tabela de ocupação deve ser refeita depois com
+    ``rebuild_occupancy``.
+    """
+    resolved = []
+    while True:
+        overlaps = find_overlaps(professional_id)
+        flagged = {overlap.appointment_id for overlap in overlaps}
+        to_cancel = [overlap for overlap in overlaps if overlap.conflita_com not in flagged]
+        if not to_cancel:
+            return resolved
+
+        with transaction.atomic():
+            queryset = Appointment.objects.filter(
+                pk__in=[overlap.appointment_id for overlap in to_cancel],
+                status__in=Appointment.ACTIVE_STATUSES,
+            )
+            if not sync_occupancy:
+                queryset.update(status='CANCELADA')
+            else:
+                affected = list(queryset.values_list('professional_id', 'data_hora', 'duracao_minutos'))
+                queryset.update(status='CANCELADA')
+                sync_day_occupancies(affected)
+        resolved.extend(to_cancel)
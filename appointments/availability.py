@@ -0,0 +1,658 @@
+"""
+Carregamento de ocupação de agendas a partir do banco.
+
+Centraliza as consultas usadas pelos endpoints de disponibilidade: todas as
+consultas ativas de uma janela são lidas com uma única consulta de
+sobreposição exata (``data_hora < fim`` e ``data_hora_fim > inicio``, coberta
+pelo índice ``(professional, data_hora_fim, data_hora)``) e distribuídas em
+bitsets diários do motor em ``slots.py``.
+
+A fonte de leitura é a tabela desnormalizada ``professional_day_occupancy``
+(um bitmap por profissional/dia, mantido por ``sync_day_occupancies`` na
+mesma transação de cada escrita de consulta), então leituras e verificações
+de conflito são buscas pela chave primária em vez de varreduras em
+``Appointment``.
+
+A ocupação de cada par (profissional, dia) fica no cache de agendas
+(``core.cache``, compartilhado entre workers; desligado sem Redis) até que
+alguma escrita de consulta daquele profissional naquele dia a invalide:
+``sync_day_occupancies`` agenda ``invalidate_appointments`` para o commit da
+transação, então qualquer ``save()``/``delete()`` de consulta limpa o cache. Contadores de hit/miss ficam disponíveis em
+``cache_stats``.
+"""
+
+import bisect
+import heapq
+from datetime import timedelta
+from itertools import chain, islice
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from core.cache import agenda_cache as cache, agenda_cache_enabled
+
+from .models import Appointment, ProfessionalDayOccupancy, SlotHold
+from .slots import (
+    INTERVALO_GRADE_MINUTOS,
+    MAX_DURACAO_MINUTOS,
+    SLOT,
+    SLOT_MINUTES,
+    Occupancy,
+    day_start,
+)
+from professionals.schedules import get_compiled_schedules
+
+
+CACHE_PREFIX = 'availability'
+CACHE_HITS_KEY = f'{CACHE_PREFIX}:stats:hits'
+CACHE_MISSES_KEY = f'{CACHE_PREFIX}:stats:misses'
+
+
+def parse_duration(raw, default=INTERVALO_GRADE_MINUTOS):
+    """
+    Converte o parâmetro ``duration`` (minutos) em inteiro.
+
+    Retorna ``default`` se vazio e None se inválido (não numérico, fora de
+    15-240 ou não múltiplo de 15).
+    """
+    if not raw:
+        return default
+    try:
+        duration = int(raw)
+    except ValueError:
+        return None
+    if duration < SLOT_MINUTES or duration > MAX_DURACAO_MINUTOS or duration % SLOT_MINUTES:
+        return None
+    return duration
+
+
+def iter_days(first_day, last_day):
+    """Itera as datas de ``first_day`` a ``last_day`` (inclusive)."""
+    day = first_day
+    while day <= last_day:
+        yield day
+        day += timedelta(days=1)
+
+
+def days_touched(start, end):
+    """Datas locais tocadas pelo intervalo ``[start, end)``."""
+    # Instâncias salvas com datetime naive só são convertidas no banco
+    if timezone.is_naive(start):
+        start = timezone.make_aware(start, timezone.get_default_timezone())
+    if timezone.is_naive(end):
+        end = timezone.make_aware(end, timezone.get_default_timezone())
+    first_day = timezone.localtime(start).date()
+    last_day = timezone.localtime(end - timedelta(microseconds=1)).date()
+    return iter_days(first_day, last_day)
+
+
+def _cache_key(professional_id, day):
+    return f'{CACHE_PREFIX}:{professional_id}:{day.isoformat()}'
+
+
+def _incr_counter(key, amount):
+    if not amount:
+        return
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key, amount)
+    except ValueError:
+        # Chave expulsa entre o add e o incr
+        cache.set(key, amount, timeout=None)
+
+
+def _query_day_occupancies(professional_ids, first_day, last_day):
+    """Monta as ocupações diárias direto de ``Appointment``, com uma única consulta."""
+    professional_ids = list(professional_ids)
+    days = list(iter_days(first_day, last_day))
+    occupancies = {
+        (professional_id, day): Occupancy.for_day(day)
+        for professional_id in professional_ids
+        for day in days
+    }
+    if not occupancies:
+        return occupancies
+
+    window_start = day_start(first_day)
+    window_end = day_start(last_day + timedelta(days=1))
+    rows = Appointment.objects.active().filter(
+        professional_id__in=professional_ids
+    ).overlapping(window_start, window_end).values_list(
+        'professional_id', 'data_hora', 'duracao_minutos'
+    )
+
+    for professional_id, data_hora, duracao_minutos in rows:
+        fim = data_hora + timedelta(minutes=duracao_minutos)
+        for day in days_touched(data_hora, fim):
+            occupancy = occupancies.get((professional_id, day))
+            if occupancy is not None:
+                occupancy.add(data_hora, fim)
+
+    return occupancies
+
+
+def _stored_day_occupancies(professional_ids, first_day, last_day):
+    """
+    Lê as ocupações diárias da tabela ``professional_day_occupancy``.
+
+    Dias sem linha estão livres. Dias marcados como não exatos são
+    recarregados de ``Appointment`` para manter os intervalos exatos.
+    """
+    professional_ids = list(professional_ids)
+    occupancies = {
+        (professional_id, day): Occupancy.for_day(day)
+        for professional_id in professional_ids
+        for day in iter_days(first_day, last_day)
+    }
+    if not occupancies:
+        return occupancies
+
+    inexact = []
+    rows = ProfessionalDayOccupancy.objects.filter(
+        professional_id__in=professional_ids,
+        dia__gte=first_day,
+        dia__lte=last_day
+    ).values_list('professional_id', 'dia', 'bitmap', 'exato')
+
+    for professional_id, dia, bitmap, exato in rows:
+        if exato:
+            occupancies[(professional_id, dia)] = Occupancy.from_bitmap(dia, bitmap)
+        else:
+            inexact.append((professional_id, dia))
+
+    if inexact:
+        occupancies.update(_query_day_occupancies(
+            {professional_id for professional_id, _ in inexact},
+            min(day for _, day in inexact),
+            max(day for _, day in inexact),
+        ))
+
+    return occupancies
+
+
+def _contiguous_runs(days):
+    """Agrupa datas ordenadas em faixas contíguas ``(primeiro, último)``."""
+    runs = []
+    for day in sorted(days):
+        if runs and day == runs[-1][1] + timedelta(days=1):
+            runs[-1][1] = day
+        else:
+            runs.append([day, day])
+    return runs
+
+
+# Primeira chave dos advisory locks de ocupação (forma de duas chaves), para
+# não colidir com outros advisory locks que usem inteiros pequenos
+OCCUPANCY_LOCK_NAMESPACE = 0x0C0C
+
+
+def lock_professionals(professional_ids):
+    """
+    ``pg_advisory_xact_lock(OCCUPANCY_LOCK_NAMESPACE, id)`` por profissional,
+    liberado no fim da transação.
+
+    Uma consulta, em ordem crescente de id, para que duas escritas em lote
+    não travem uma à outra. Depois do lock, a leitura (READ COMMITTED) já
+    enxerga o que a transação anterior confirmou. A segunda chave é int4: ids
+    acima disso compartilham lock, o que só serializa a mais.
+    """
+    if not professional_ids:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT pg_advisory_xact_lock(%s, (id %% 2147483648)::int) '
+            'FROM (SELECT unnest(%s::bigint[]) AS id ORDER BY id) AS ids',
+            [OCCUPANCY_LOCK_NAMESPACE, sorted(professional_ids)],
+        )
+
+
+def sync_day_occupancies(rows):
+    """
+    Recalcula as linhas de ``professional_day_occupancy`` afetadas por consultas.
+
+    ``rows`` são tuplas ``(professional_id, data_hora, duracao_minutos)`` com
+    os valores anteriores e posteriores da escrita. Só os dias tocados são
+    recalculados; deve ser chamado dentro da transação da escrita. O cache
+    desses dias é invalidado quando a transação é confirmada.
+
+    Escritas concorrentes do mesmo profissional são serializadas por um
+    advisory lock de transação: sem ele, cada transação recalcularia o dia
+    sem enxergar a consulta ainda não confirmada da outra, e o último upsert
+    apagaria a ocupação gravada pela primeira.
+    """
+    rows = list(rows)
+    transaction.on_commit(lambda: invalidate_appointments(rows))
+
+    days_by_professional = {}
+    for professional_id, data_hora, duracao_minutos in rows:
+        if professional_id is None or data_hora is None:
+            continue
+        fim = data_hora + timedelta(minutes=duracao_minutos)
+        days_by_professional.setdefault(professional_id, set()).update(days_touched(data_hora, fim))
+
+    lock_professionals(days_by_professional)
+
+    upserts = []
+    deletes = []
+    for professional_id, days in days_by_professional.items():
+        for first_day, last_day in _contiguous_runs(days):
+            occupancies = _query_day_occupancies([professional_id], first_day, last_day)
+            for (_, day), occupancy in occupancies.items():
+                if occupancy.bits:
+                    upserts.append(ProfessionalDayOccupancy(
+                        professional_id=professional_id,
+                        dia=day,
+                        bitmap=occupancy.to_bitmap(),
+                        exato=occupancy.exact,
+                    ))
+                else:
+                    deletes.append(Q(professional_id=professional_id, dia=day))
+
+    if upserts:
+        ProfessionalDayOccupancy.objects.bulk_create(
+            upserts,
+            update_conflicts=True,
+            unique_fields=['professional', 'dia'],
+            update_fields=['bitmap', 'exato'],
+        )
+    if deletes:
+        condition = deletes.pop()
+        for other in deletes:
+            condition |= other
+        ProfessionalDayOccupancy.objects.filter(condition).delete()
+
+
+def is_slot_free(professional_id, start, end, exclude_pk=None, exclude_hold=None):
+    """
+    Verifica se ``[start, end)`` está livre na agenda do profissional.
+
+    Consulta apenas as linhas de ``professional_day_occupancy`` dos dias
+    tocados (busca pela chave primária). Só recorre a ``Appointment`` quando o
+    bitmap não é conclusivo: dias não exatos ou quando ``exclude_pk`` (a
+    própria consulta, em remarcações) precisa ser desconsiderada. Nesse caso
+    a sobreposição é exata (``overlapping``), por faixa no índice de fim.
+
+    Reservas temporárias ativas (``SlotHold``) também contam como ocupado,
+    exceto ``exclude_hold`` (a reserva sendo convertida).
+    """
+    if not _free_of_appointments(professional_id, start, end, exclude_pk):
+        return False
+
+    holds = SlotHold.objects.active().filter(
+        professional_id=professional_id
+    ).overlapping(start, end)
+    if exclude_hold is not None:
+        holds = holds.exclude(pk=exclude_hold)
+    return not holds.exists()
+
+
+def _free_of_appointments(professional_id, start, end, exclude_pk=None):
+    days = list(days_touched(start, end))
+    rows = ProfessionalDayOccupancy.objects.filter(
+        professional_id=professional_id,
+        dia__in=days
+    ).values_list('dia', 'bitmap', 'exato')
+
+    needs_scan = False
+    for dia, bitmap, exato in rows:
+        result = Occupancy.from_bitmap(dia, bitmap, exato).quick_check(start, end)
+        if result is True:
+            continue
+        if result is False and exclude_pk is None:
+            return False
+        needs_scan = True
+
+    if not needs_scan:
+        return True
+
+    existing = Appointment.objects.active().filter(
+        professional_id=professional_id
+    ).overlapping(start, end)
+    if exclude_pk is not None:
+        existing = existing.exclude(pk=exclude_pk)
+    return not existing.exists()
+
+
+def find_batch_conflicts(items):
+    """
+    Conflitos de um lote de novas consultas ``[(chave, professional_id, inicio, fim), ...]``.
+
+    As consultas ativas e reservas vigentes nas janelas afetadas de cada
+    profissional são lidas com uma consulta cada e mantidas, por
+    profissional, como uma lista ordenada de intervalos disjuntos. Os itens
+    são percorridos na ordem do lote: cada um é localizado na lista por
+    busca binária e, se não sobrepõe o vizinho anterior nem o seguinte, é
+    inserido nela. O resultado é o mesmo de enviar os itens um a um.
+    Retorna o conjunto de chaves rejeitadas.
+    """
+    windows = {}
+    for _, professional_id, start, end in items:
+        first, last = windows.get(professional_id, (start, end))
+        windows[professional_id] = (min(first, start), max(last, end))
+    if not windows:
+        return set()
+
+    condition = Q()
+    for professional_id, (start, end) in windows.items():
+        condition |= Q(professional_id=professional_id, data_hora__lt=end, data_hora_fim__gt=start)
+    existing = Appointment.objects.active().filter(condition).values_list(
+        'professional_id', 'data_hora', 'data_hora_fim'
+    )
+
+    holds = SlotHold.objects.active().filter(condition).values_list(
+        'professional_id', 'data_hora', 'data_hora_fim'
+    )
+
+    # Une consultas e reservas em intervalos disjuntos ordenados
+    starts = {professional_id: [] for professional_id in windows}
+    ends = {professional_id: [] for professional_id in windows}
+    for professional_id, data_hora, data_hora_fim in sorted(chain(existing, holds)):
+        professional_starts = starts[professional_id]
+        professional_ends = ends[professional_id]
+        if professional_ends and data_hora < professional_ends[-1]:
+            professional_ends[-1] = max(professional_ends[-1], data_hora_fim)
+            continue
+        professional_starts.append(data_hora)
+        professional_ends.append(data_hora_fim)
+
+    rejected = set()
+    for key, professional_id, start, end in items:
+        professional_starts = starts[professional_id]
+        professional_ends = ends[professional_id]
+        # Intervalos que começam antes do fim do item: [0, position)
+        position = bisect.bisect_left(professional_starts, end)
+        if position and professional_ends[position - 1] > start:
+            rejected.add(key)
+            continue
+        professional_starts.insert(position, start)
+        professional_ends.insert(position, end)
+    return rejected
+
+
+def load_day_occupancies(professional_ids, first_day, last_day):
+    """
+    Carrega a ocupação diária de vários profissionais em um período.
+
+    Retorna ``{(professional_id, dia): Occupancy}`` para todas as
+    combinações, inclusive dias sem consultas. Pares em cache não tocam o
+    banco; os demais são lidos juntos de ``professional_day_occupancy`` e
+    gravados no cache.
+    """
+    professional_ids = list(professional_ids)
+    keys = {
+        _cache_key(professional_id, day): (professional_id, day)
+        for professional_id in professional_ids
+        for day in iter_days(first_day, last_day)
+    }
+    cached = cache.get_many(keys.keys())
+    occupancies = {keys[key]: occupancy for key, occupancy in cached.items()}
+
+    missing = [pair for key, pair in keys.items() if key not in cached]
+    _incr_counter(CACHE_HITS_KEY, len(cached))
+    _incr_counter(CACHE_MISSES_KEY, len(missing))
+
+    if missing:
+        loaded = _stored_day_occupancies(
+            {professional_id for professional_id, _ in missing},
+            min(day for _, day in missing),
+            max(day for _, day in missing),
+        )
+        to_cache = {}
+        for pair in missing:
+            occupancies[pair] = loaded[pair]
+            to_cache[_cache_key(*pair)] = loaded[pair]
+        cache.set_many(to_cache, timeout=settings.AVAILABILITY_CACHE_TIMEOUT)
+
+    return occupancies
+
+
+def invalidate_appointments(rows):
+    """
+    Invalida o cache dos dias afetados por consultas.
+
+    ``rows`` são tuplas ``(professional_id, data_hora, duracao_minutos)``;
+    passe os valores anteriores e posteriores de uma alteração para cobrir
+    remarcações.
+    """
+    keys = set()
+    for professional_id, data_hora, duracao_minutos in rows:
+        if data_hora is None:
+            continue
+        fim = data_hora + timedelta(minutes=duracao_minutos)
+        for day in days_touched(data_hora, fim):
+            keys.add(_cache_key(professional_id, day))
+    if keys:
+        cache.delete_many(keys)
+
+
+def cache_stats():
+    """Contadores de hit/miss do cache de disponibilidade."""
+    hits = cache.get(CACHE_HITS_KEY, 0)
+    misses = cache.get(CACHE_MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'enabled': agenda_cache_enabled(),
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / total, 4) if total else None,
+    }
+
+
+def load_availability(professional_ids, first_day, last_day):
+    """
+    Carrega expedientes compilados e ocupação para dias locais dos profissionais.
+
+    Como cada profissional pode ter um fuso diferente, a ocupação é carregada
+    para todos os dias do servidor cobertos pelos dias locais pedidos (uma
+    única leitura para todos). Reservas temporárias vigentes são somadas à
+    ocupação. Retorna ``(schedules, occupancies)`` para uso com ``day_slots``.
+    """
+    professional_ids = list(professional_ids)
+    schedules = get_compiled_schedules(professional_ids)
+    if not professional_ids:
+        return schedules, {}
+
+    server_days = set()
+    for schedule in {schedule.tz_name: schedule for schedule in schedules.values()}.values():
+        server_days.update(days_touched(
+            schedule.day_start(first_day),
+            schedule.day_start(last_day + timedelta(days=1))
+        ))
+    occupancies = load_day_occupancies(professional_ids, min(server_days), max(server_days))
+    _add_active_holds(occupancies, professional_ids, min(server_days), max(server_days))
+    return schedules, occupancies
+
+
+def _add_active_holds(occupancies, professional_ids, first_day, last_day):
+    """
+    Marca as reservas temporárias vigentes sobre a ocupação carregada.
+
+    Reservas duram poucos minutos e não entram no cache nem na tabela de
+    ocupação: são lidas a cada chamada, com uma consulta indexada.
+    """
+    holds = SlotHold.objects.active().filter(
+        professional_id__in=professional_ids
+    ).overlapping(
+        day_start(first_day), day_start(last_day + timedelta(days=1))
+    ).values_list('professional_id', 'data_hora', 'data_hora_fim')
+
+    for professional_id, start, end in holds:
+        for day in days_touched(start, end):
+            occupancy = occupancies.get((professional_id, day))
+            if occupancy is not None:
+                occupancy.add(start, end)
+
+
+def local_day_occupancy(schedule, occupancies, professional_id, day):
+    """Ocupação do dia local ``day`` no fuso do expediente do profissional."""
+    origin = schedule.day_start(day)
+    end = schedule.day_start(day + timedelta(days=1))
+    parts = [occupancies[(professional_id, server_day)] for server_day in days_touched(origin, end)]
+    if len(parts) == 1 and parts[0].origin == origin and end - origin == timedelta(days=1):
+        return parts[0]
+    return Occupancy.combine(origin, end, parts)
+
+
+def day_slots(schedules, occupancies, professional_id, day, duration, not_before=None):
+    """
+    Slots do expediente de um dia local com sua disponibilidade.
+
+    Retorna ``[(inicio, disponivel), ...]`` em ordem cronológica, apenas com
+    inícios que cabem no expediente (e não anteriores a ``not_before``).
+    """
+    schedule = schedules[professional_id]
+    starts = schedule.slot_starts(day, duration, INTERVALO_GRADE_MINUTOS)
+    if not_before is not None:
+        starts = [start for start in starts if start >= not_before]
+    if not starts:
+        return []
+
+    occupancy = local_day_occupancy(schedule, occupancies, professional_id, day)
+    return list(zip(starts, occupancy.available(starts, duration)))
+
+
+def iter_free_starts(schedules, occupancies, professional_id, days, duration, not_before=None):
+    """
+    Gera, em ordem cronológica, os inícios livres de um profissional.
+
+    Produz tuplas ``(inicio, professional_id)`` para permitir o merge entre
+    vários profissionais com ``heapq.merge``.
+    """
+    for day in days:
+        for start, is_available in day_slots(
+            schedules, occupancies, professional_id, day, duration, not_before
+        ):
+            if is_available:
+                yield start, professional_id
+
+
+def earliest_free_slots(professional_ids, first_day, last_day, duration, limit, not_before=None):
+    """
+    Primeiros ``limit`` horários livres entre vários profissionais.
+
+    Carrega expedientes e ocupação de todos os candidatos de uma vez e faz o
+    merge das disponibilidades com um heap, parando assim que ``limit``
+    horários forem encontrados.
+    """
+    professional_ids = list(professional_ids)
+    schedules, occupancies = load_availability(professional_ids, first_day, last_day)
+    days = list(iter_days(first_day, last_day))
+
+    merged = heapq.merge(*(
+        iter_free_starts(schedules, occupancies, professional_id, days, duration, not_before)
+        for professional_id in professional_ids
+    ))
+    return list(islice(merged, limit))
+
+
+# Dias carregados por vez na busca do próximo horário livre
+DIAS_POR_LOTE = 7
+
+
+def next_free_slot(professional_id, duration, not_before, horizon_days, chunk_days=DIAS_POR_LOTE):
+    """
+    Primeiro horário livre de um profissional a partir de ``not_before``.
+
+    Avança em lotes de ``chunk_days`` dias locais: cada lote é carregado com
+    uma única leitura e a busca para no primeiro horário livre encontrado.
+    ``horizon_days`` limita o pior caso; retorna None se nada for encontrado.
+    """
+    schedule = get_compiled_schedules([professional_id])[professional_id]
+    first_day = schedule.local_date(not_before)
+    last_day = first_day + timedelta(days=horizon_days - 1)
+
+    chunk_start = first_day
+    while chunk_start <= last_day:
+        chunk_end = min(chunk_start + timedelta(days=chunk_days - 1), last_day)
+        schedules, occupancies = load_availability([professional_id], chunk_start, chunk_end)
+        free = iter_free_starts(
+            schedules, occupancies, professional_id,
+            iter_days(chunk_start, chunk_end), duration, not_before
+        )
+        for start, _ in free:
+            return start
+        chunk_start = chunk_end + timedelta(days=1)
+    return None
+
+
+def _start_mask(windows, duration, step):
+    """
+    Bitset dos inícios de slot de um dia, em blocos desde a meia-noite local.
+
+    Retorna None se algum início não cair na grade de 15 minutos.
+    """
+    mask = 0
+    for start, end in windows:
+        current = start
+        while current + duration <= end:
+            if current % SLOT_MINUTES:
+                return None
+            mask |= 1 << (current // SLOT_MINUTES)
+            current += step
+    return mask
+
+
+def availability_matrix(professional_ids, first_day, last_day, duration, not_before=None):
+    """
+    Capacidade livre de vários profissionais × dias locais.
+
+    Retorna ``(days, matrix)`` com ``matrix[professional_id]`` = lista de
+    ``(livres, abertos)`` por dia: quantidade de inícios de slot livres e
+    total de inícios dentro do expediente.
+
+    A ocupação de cada profissional no período inteiro vira um único bitset
+    (``Occupancy.combine``) e os inícios com ``duration`` livres são obtidos
+    de uma vez com ``free_runs``. Cada célula é então um deslocamento, um
+    ``AND`` com a máscara de inícios do dia da semana e um ``bit_count``.
+    Dias em que o bitset não é exato, com inícios fora da grade, com
+    mudança de horário de verão ou parcialmente antes de ``not_before``
+    usam ``day_slots``.
+    """
+    professional_ids = list(professional_ids)
+    schedules, occupancies = load_availability(professional_ids, first_day, last_day)
+    days = list(iter_days(first_day, last_day))
+    length = duration // SLOT_MINUTES
+    masks = {}
+
+    matrix = {}
+    for professional_id in professional_ids:
+        schedule = schedules[professional_id]
+        origin = schedule.day_start(first_day)
+        end = schedule.day_start(last_day + timedelta(days=1))
+        window = Occupancy.combine(origin, end, [
+            occupancies[(professional_id, server_day)]
+            for server_day in days_touched(origin, end)
+        ])
+        runs = window.free_runs(length) if window.exact else None
+
+        row = []
+        for day in days:
+            day_origin = schedule.day_start(day)
+            day_end = schedule.day_start(day + timedelta(days=1))
+            if not_before is not None and day_end <= not_before:
+                row.append((0, 0))
+                continue
+
+            windows = schedule.windows(day)
+            if windows not in masks:
+                masks[windows] = _start_mask(windows, duration, INTERVALO_GRADE_MINUTOS)
+            mask = masks[windows]
+            offset, remainder = divmod(day_origin - origin, SLOT)
+
+            if (
+                runs is None
+                or mask is None
+                or remainder
+                or day_end - day_origin != timedelta(days=1)
+                or (not_before is not None and day_origin < not_before)
+            ):
+                slots = day_slots(schedules, occupancies, professional_id, day, duration, not_before)
+                row.append((sum(is_available for _, is_available in slots), len(slots)))
+                continue
+
+            row.append((((runs >> offset) & mask).bit_count(), mask.bit_count()))
+        matrix[professional_id] = row
+
+    return days, matrix
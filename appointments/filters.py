@@ -1,7 +1,92 @@
+from datetime import date, datetime, time, timedelta
+from functools import reduce
+from operator import or_
+from zoneinfo import ZoneInfo
+
+from django.db.models import Max, Min, Q
+from django.db.models.functions import Upper
+from django.utils import timezone
 from django_filters import rest_framework as filters
+from rest_framework.filters import SearchFilter
+from professionals.models import Professional, validate_fuso_horario
 from .models import Appointment
 
 
+def local_midnight(day, tz):
+    """Início do dia ``day`` no fuso ``tz``"""
+    return datetime.combine(day, time.min, tzinfo=tz)
+
+
+def day_range(day, tz):
+    """[início, fim) do dia local"""
+    return local_midnight(day, tz), local_midnight(day + timedelta(days=1), tz)
+
+
+def month_range(year, month, tz):
+    """[início, fim) do mês local"""
+    first = date(year, month, 1)
+    following = date(year + month // 12, month % 12 + 1, 1)
+    return local_midnight(first, tz), local_midnight(following, tz)
+
+
+def year_range(year, tz):
+    """[início, fim) do ano local"""
+    return local_midnight(date(year, 1, 1), tz), local_midnight(date(year + 1, 1, 1), tz)
+
+
+def iso_week_range(year, week, tz):
+    """[segunda, segunda seguinte) da semana ISO; None se a semana não existe no ano"""
+    try:
+        monday = date.fromisocalendar(year, week, 1)
+    except ValueError:
+        return None
+    return day_range(monday, tz)[0], local_midnight(monday + timedelta(days=7), tz)
+
+
+def intersect_ranges(left, right):
+    """Interseções não vazias entre dois conjuntos de intervalos [início, fim)"""
+    return [
+        (max(left_start, right_start), min(left_end, right_end))
+        for left_start, left_end in left
+        for right_start, right_end in right
+        if max(left_start, right_start) < min(left_end, right_end)
+    ]
+
+
+def ranges_q(ranges, field='data_hora'):
+    """OR de intervalos semiabertos [início, fim) sobre ``field``"""
+    return reduce(or_, (Q(**{f'{field}__gte': start, f'{field}__lt': end}) for start, end in ranges))
+
+
+def search_appointments(queryset, terms):
+    """
+    Cada termo em paciente_nome, paciente_email ou nome do profissional.
+    
+    Os profissionais entram como subconsulta (``professional_id IN (SELECT
+    ...)``), servida pelo índice de trigramas de ``nome_social``: sem JOIN
+    na consulta principal e sem uma lista IN sem limite para termos curtos
+    ou comuns.
+    """
+    for term in terms:
+        professionals = Professional.objects.filter(nome_social__icontains=term).values('id')
+        queryset = queryset.filter(
+            Q(paciente_nome__icontains=term)
+            | Q(paciente_email__icontains=term)
+            | Q(professional_id__in=professionals)
+        )
+    return queryset
+
+
+class AppointmentSearchFilter(SearchFilter):
+    """?search= servido pelos índices de trigramas (ver search_appointments)"""
+    
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms:
+            return queryset
+        return search_appointments(queryset, terms)
+
+
 class AppointmentFilter(filters.FilterSet):
     """Filtros avançados para consultas"""
     
@@ -15,13 +100,14 @@ class AppointmentFilter(filters.FilterSet):
         lookup_expr='lte'
     )
     
-    # Filtro por mês/ano
-    mes = filters.NumberFilter(
-        field_name='data_hora__month'
-    )
-    ano = filters.NumberFilter(
-        field_name='data_hora__year'
-    )
+    # Filtros de calendário no fuso ?tz= (padrão: fuso do servidor). Todos
+    # viram intervalos [início, fim) em data_hora, atendidos pelos índices;
+    # a combinação é feita em filter_queryset.
+    data = filters.DateFilter(method='filter_calendario')
+    mes = filters.NumberFilter(method='filter_calendario', min_value=1, max_value=12)
+    ano = filters.NumberFilter(method='filter_calendario', min_value=1, max_value=9998)
+    semana = filters.NumberFilter(method='filter_calendario', min_value=1, max_value=53)
+    tz = filters.CharFilter(method='filter_calendario', validators=[validate_fuso_horario])
     
     # Filtros de status múltiplos
     status_in = filters.MultipleChoiceFilter(
@@ -32,14 +118,91 @@ class AppointmentFilter(filters.FilterSet):
     # Filtro por profissional
     professional_name = filters.CharFilter(
         field_name='professional__nome_social',
-        lookup_expr='icontains'
+        method='filter_nome'
     )
     
     # Filtro por paciente
     paciente_nome = filters.CharFilter(
-        lookup_expr='icontains'
+        field_name='paciente_nome',
+        method='filter_nome'
     )
     
+    # Busca aproximada (similaridade de trigramas) nos filtros de nome
+    fuzzy = filters.BooleanFilter(method='filter_fuzzy')
+    
+    def filter_nome(self, queryset, name, value):
+        """
+        icontains por padrão; com ?fuzzy=true, similaridade de palavra.
+        
+        As duas formas comparam UPPER(campo), a mesma expressão dos índices
+        GIN gin_trgm_ops (appointment_paciente_trgm, professional_nome_trgm).
+        """
+        if self.form.cleaned_data.get('fuzzy'):
+            alias = f'{name.replace("__", "_")}_upper'
+            return queryset.alias(**{alias: Upper(name)}).filter(
+                **{f'{alias}__trigram_word_similar': value.upper()}
+            )
+        return queryset.filter(**{f'{name}__icontains': value})
+    
+    def filter_fuzzy(self, queryset, name, value):
+        """Apenas liga o modo aproximado de filter_nome"""
+        return queryset
+    
+    def filter_calendario(self, queryset, name, value):
+        """Aplicados juntos em filter_queryset"""
+        return queryset
+    
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        ranges = self.calendar_ranges(queryset)
+        if ranges is None:
+            return queryset
+        if not ranges:
+            return queryset.none()
+        return queryset.filter(ranges_q(ranges))
+    
+    def calendar_ranges(self, queryset):
+        """
+        Intervalos de data_hora pedidos por data/mes/ano/semana, ou None.
+        
+        ``mes`` ou ``semana`` sem ``ano`` valem para todos os anos com
+        consultas (um intervalo por ano, limitado por MIN/MAX de data_hora).
+        ``semana`` usa o ano ISO; com ``mes`` junto, só os dias da semana
+        dentro do mês. Com ``data`` os demais são ignorados.
+        """
+        cleaned = self.form.cleaned_data
+        tz = ZoneInfo(cleaned['tz']) if cleaned.get('tz') else timezone.get_current_timezone()
+        day = cleaned.get('data')
+        mes, ano, semana = (
+            int(cleaned[name]) if cleaned.get(name) is not None else None
+            for name in ('mes', 'ano', 'semana')
+        )
+        
+        if day is not None:
+            return [day_range(day, tz)]
+        if mes is None and ano is None and semana is None:
+            return None
+        
+        if ano is not None:
+            years = [ano]
+        else:
+            bounds = queryset.order_by().aggregate(first=Min('data_hora'), last=Max('data_hora'))
+            if bounds['first'] is None:
+                return []
+            first = timezone.localtime(bounds['first'], tz).year
+            last = timezone.localtime(bounds['last'], tz).year
+            # O ano ISO de uma semana pode ser o anterior ou o seguinte
+            years = range(first - 1, last + 2) if semana is not None else range(first, last + 1)
+        
+        if semana is not None:
+            ranges = [r for r in (iso_week_range(year, semana, tz) for year in years) if r is not None]
+            if mes is not None:
+                ranges = intersect_ranges(ranges, [month_range(year, mes, tz) for year in years])
+            return ranges
+        if mes is not None:
+            return [month_range(year, mes, tz) for year in years]
+        return [year_range(year, tz) for year in years]
+    
     class Meta:
         model = Appointment
         fields = {
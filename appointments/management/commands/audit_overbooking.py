@@ -0,0 +1,65 @@
+"""
+Lista (e opcionalmente corrige) consultas ativas sobrepostas.
+
+Uso:
+    python manage.py audit_overbooking                    # relatório
+    python manage.py audit_overbooking --professional 7   # só um profissional
+    python manage.py audit_overbooking --fix              # cancela as consultas em conflito
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from appointments.audit import cancel_overlaps, find_overlaps, occupancy_schema_ready
+
+
+class Command(BaseCommand):
+    help = 'Audita consultas ativas sobrepostas por profissional'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--professional',
+            type=int,
+            help='Restringe a auditoria a um profissional',
+        )
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help='Cancela as consultas em conflito, mantendo a que começa primeiro',
+        )
+
+    def handle(self, *args, **options):
+        professional_id = options['professional']
+
+        if options['fix']:
+            sync_occupancy = occupancy_schema_ready()
+            resolved = cancel_overlaps(professional_id, sync_occupancy=sync_occupancy)
+            for overlap in resolved:
+                self.stdout.write(
+                    f'Cancelada: consulta {overlap.appointment_id} '
+                    f'(conflito com {overlap.conflita_com}, profissional {overlap.professional_id})'
+                )
+            self.stdout.write(self.style.SUCCESS(f'✓ {len(resolved)} consulta(s) cancelada(s)'))
+            if not sync_occupancy and resolved:
+                self.stdout.write(self.style.WARNING(
+                    'Base anterior à migração 0004: a tabela de ocupação não foi atualizada. '
+                    'Após "python manage.py migrate", execute "python manage.py rebuild_occupancy".'
+                ))
+            return
+
+        overlaps = find_overlaps(professional_id)
+        for overlap in overlaps:
+            self.stdout.write(self.style.WARNING(
+                f'Profissional {overlap.professional_id}: consulta {overlap.appointment_id} '
+                f'às {timezone.localtime(overlap.data_hora):%d/%m/%Y %H:%M} '
+                f'conflita com {overlap.conflita_com} '
+                f'(até {timezone.localtime(overlap.conflita_ate):%H:%M})'
+            ))
+
+        if overlaps:
+            raise CommandError(
+                f'{len(overlaps)} sobreposição(ões) encontrada(s). '
+                'Execute "python manage.py audit_overbooking --fix" para corrigir.'
+            )
+
+        self.stdout.write(self.style.SUCCESS('✓ Nenhuma sobreposição entre consultas ativas'))
@@ -0,0 +1,115 @@
+"""
+Compara a serialização da listagem de consultas: DRF x ``.values()`` compilado.
+
+Uso:
+    python manage.py benchmark_list_serializer                 # linhas existentes
+    python manage.py benchmark_list_serializer --seed 20000    # cria linhas numa transação desfeita
+    python manage.py benchmark_list_serializer --limit 100 --repeat 50
+
+Os dois caminhos partem do mesmo queryset e passam pelo JSONRenderer; o
+comando falha se os bytes gerados forem diferentes.
+"""
+
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from appointments.models import Appointment
+from appointments.serializers import AppointmentListSerializer
+from core.fastpath import compile_values_serializer
+from professionals.models import Professional
+
+
+class Rollback(Exception):
+    """Desfaz a transação do modo --seed"""
+
+
+class Command(BaseCommand):
+    help = 'Mede a serialização da listagem de consultas (DRF x .values())'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=1000, help='Linhas por rodada (padrão: 1000)')
+        parser.add_argument('--repeat', type=int, default=5, help='Rodadas por caminho (padrão: 5)')
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Cria N consultas canceladas antes de medir (desfeitas ao final)',
+        )
+
+    def handle(self, *args, **options):
+        if not options['seed']:
+            self._run(options['limit'], options['repeat'])
+            return
+
+        try:
+            with transaction.atomic():
+                self._seed(options['seed'])
+                self._run(options['limit'], options['repeat'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def _seed(self, count):
+        professional = Professional.objects.first() or Professional.objects.create(
+            nome_social='Profissional Benchmark',
+            profissao='MEDICO',
+            registro_profissional='CRM-SP-000000',
+            cep='01310-100',
+            logradouro='Av. Paulista',
+            numero='1000',
+            bairro='Bela Vista',
+            cidade='São Paulo',
+            estado='SP',
+            telefone='(11) 90000-0000',
+            email='benchmark@example.com',
+        )
+        inicio = timezone.now().replace(second=0, microsecond=0)
+        appointments = []
+        for i in range(count):
+            appointment = Appointment(
+                professional=professional,
+                data_hora=inicio + timedelta(minutes=15 * i),
+                status='CANCELADA',
+                paciente_nome=f'Paciente {i}',
+                paciente_email=f'paciente{i}@example.com',
+                paciente_telefone='(11) 99999-0000',
+            )
+            appointment.set_periodo()
+            appointments.append(appointment)
+        Appointment.objects.bulk_create(appointments, batch_size=1000)
+
+    def _run(self, limit, repeat):
+        queryset = Appointment.objects.select_related('professional').order_by('-data_hora', '-id')
+        renderer = JSONRenderer()
+
+        def drf():
+            rows = queryset.only(*AppointmentListSerializer.columns_for())[:limit]
+            return renderer.render(AppointmentListSerializer(rows, many=True).data)
+
+        def values():
+            compiled = compile_values_serializer(AppointmentListSerializer())
+            return renderer.render(compiled.many(compiled.values(queryset)[:limit]))
+
+        if drf() != values():
+            raise CommandError('Os dois caminhos geraram JSON diferente')
+
+        results = {}
+        for label, func in (('DRF (instâncias)', drf), ('.values() compilado', values)):
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                payload = func()
+                timings.append(time.perf_counter() - start)
+            results[label] = min(timings)
+            self.stdout.write(
+                f'{label:<22} {min(timings) * 1000:8.1f} ms (melhor de {repeat}), '
+                f'{len(payload)} bytes'
+            )
+
+        drf_time, values_time = results.values()
+        self.stdout.write(self.style.SUCCESS(f'Ganho: {drf_time / values_time:.1f}x (saída idêntica)'))
@@ -0,0 +1,75 @@
+"""
+Mostra os planos das buscas textuais de consultas (índices pg_trgm).
+
+Uso:
+    python manage.py explain_appointment_search --term silva
+    python manage.py explain_appointment_search --term silva --analyze
+    python manage.py explain_appointment_search --term silva --compare   # antes/depois
+
+``--compare`` também mostra o plano sem os índices de trigramas: eles são
+removidos dentro de uma transação desfeita ao final. O DROP INDEX bloqueia
+escritas na tabela enquanto o comando roda; use em réplica ou homologação.
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from appointments.filters import AppointmentFilter, search_appointments
+from appointments.models import Appointment
+
+# Índices de trigramas (appointments 0006 e professionals 0005)
+TRGM_INDEXES = ('appointment_paciente_trgm', 'appointment_email_trgm', 'professional_nome_trgm')
+
+
+class Rollback(Exception):
+    """Desfaz a transação do modo --compare"""
+
+
+class Command(BaseCommand):
+    help = 'Mostra os planos de execução das buscas textuais de consultas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--term', default='silva', help='Termo buscado (padrão: silva)')
+        parser.add_argument(
+            '--analyze',
+            action='store_true',
+            help='Executa as consultas (EXPLAIN ANALYZE) em vez de só estimar',
+        )
+        parser.add_argument(
+            '--compare',
+            action='store_true',
+            help='Mostra também o plano sem os índices de trigramas',
+        )
+
+    def handle(self, *args, **options):
+        term = options['term']
+        analyze = options['analyze']
+
+        self._explain_all(term, analyze, 'Com índices pg_trgm')
+
+        if options['compare']:
+            try:
+                with transaction.atomic():
+                    with connection.cursor() as cursor:
+                        for name in TRGM_INDEXES:
+                            cursor.execute(f'DROP INDEX IF EXISTS {connection.ops.quote_name(name)}')
+                    self._explain_all(term, analyze, 'Sem índices pg_trgm')
+                    raise Rollback
+            except Rollback:
+                pass
+
+    def _querysets(self, term):
+        base = Appointment.objects.all()
+        return [
+            ('paciente_nome (icontains)', AppointmentFilter({'paciente_nome': term}, queryset=base).qs),
+            ('paciente_nome (fuzzy)', AppointmentFilter({'paciente_nome': term, 'fuzzy': 'true'}, queryset=base).qs),
+            ('professional_name (icontains)', AppointmentFilter({'professional_name': term}, queryset=base).qs),
+            ('?search=', search_appointments(base, [term])),
+        ]
+
+    def _explain_all(self, term, analyze, title):
+        self.stdout.write(self.style.MIGRATE_HEADING(f'=== {title} ==='))
+        for label, queryset in self._querysets(term):
+            self.stdout.write(self.style.SUCCESS(f'--- {label}'))
+            self.stdout.write(queryset.order_by().explain(analyze=analyze))
+            self.stdout.write('')
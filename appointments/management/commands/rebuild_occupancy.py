@@ -0,0 +1,191 @@
+"""
+Reconstrói (ou verifica) a tabela professional_day_occupancy.
+
+Uso:
+    python manage.py rebuild_occupancy            # recria a tabela do zero
+    python manage.py rebuild_occupancy --verify   # apenas compara com as consultas
+"""
+
+from datetime import timedelta
+from itertools import groupby
+from operator import itemgetter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from appointments.availability import days_touched, lock_professionals
+from appointments.models import Appointment, ProfessionalDayOccupancy
+from appointments.slots import Occupancy
+
+
+# Profissionais travados e reconstruídos por transação
+PROFISSIONAIS_POR_LOTE = 100
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói a tabela professional_day_occupancy a partir das consultas ativas'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Não altera nada; compara a tabela com as consultas e lista divergências',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Tamanho dos lotes de leitura e escrita (padrão: 1000)',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        if options['verify']:
+            self._verify(batch_size)
+        else:
+            self._rebuild(batch_size)
+
+    def _iter_expected(self, batch_size, professional_ids=None):
+        """
+        Calcula a ocupação esperada a partir de Appointment.
+
+        Percorre as consultas ativas ordenadas por profissional e produz
+        ``(professional_id, {dia: Occupancy})`` um profissional por vez, com
+        memória limitada à agenda de um profissional. ``professional_ids``
+        restringe a leitura a esses profissionais.
+        """
+        rows = Appointment.objects.filter(status__in=Appointment.ACTIVE_STATUSES)
+        if professional_ids is not None:
+            rows = rows.filter(professional_id__in=professional_ids)
+        rows = rows.order_by('professional_id', 'data_hora').values_list(
+            'professional_id', 'data_hora', 'duracao_minutos'
+        ).iterator(chunk_size=batch_size)
+
+        current_id = None
+        occupancies = {}
+        for professional_id, data_hora, duracao_minutos in rows:
+            if professional_id != current_id:
+                if current_id is not None:
+                    yield current_id, occupancies
+                current_id = professional_id
+                occupancies = {}
+            fim = data_hora + timedelta(minutes=duracao_minutos)
+            for day in days_touched(data_hora, fim):
+                occupancy = occupancies.get(day)
+                if occupancy is None:
+                    occupancy = occupancies[day] = Occupancy.for_day(day)
+                occupancy.add(data_hora, fim)
+
+        if current_id is not None:
+            yield current_id, occupancies
+
+    def _professional_ids(self):
+        """Profissionais com consultas ativas ou com linhas na tabela, em ordem"""
+        with_appointments = Appointment.objects.filter(
+            status__in=Appointment.ACTIVE_STATUSES
+        ).values_list('professional_id', flat=True).distinct()
+        with_rows = ProfessionalDayOccupancy.objects.values_list('professional_id', flat=True).distinct()
+        return sorted(set(with_appointments) | set(with_rows))
+
+    def _rebuild(self, batch_size):
+        """
+        Refaz a tabela em lotes de profissionais, cada um em sua transação.
+
+        O lote é travado com os mesmos advisory locks de
+        ``sync_day_occupancies`` antes de ler as consultas: escritas
+        concorrentes desses profissionais esperam o lote terminar (ou o lote
+        espera por elas e já as enxerga), e nenhum bitmap recém-sincronizado
+        é sobrescrito com dados antigos.
+        """
+        total = 0
+        professional_ids = self._professional_ids()
+        for offset in range(0, len(professional_ids), PROFISSIONAIS_POR_LOTE):
+            batch = professional_ids[offset:offset + PROFISSIONAIS_POR_LOTE]
+            with transaction.atomic():
+                lock_professionals(batch)
+                ProfessionalDayOccupancy.objects.filter(professional_id__in=batch).delete()
+                for professional_id, occupancies in self._iter_expected(batch_size, batch):
+                    objs = [
+                        ProfessionalDayOccupancy(
+                            professional_id=professional_id,
+                            dia=day,
+                            bitmap=occupancy.to_bitmap(),
+                            exato=occupancy.exact,
+                        )
+                        for day, occupancy in occupancies.items()
+                        if occupancy.bits
+                    ]
+                    ProfessionalDayOccupancy.objects.bulk_create(objs, batch_size=batch_size)
+                    total += len(objs)
+
+        self.stdout.write(self.style.SUCCESS(f'✓ {total} linha(s) de ocupação reconstruída(s)'))
+
+    def _iter_stored(self, batch_size):
+        """
+        Lê a tabela ordenada por profissional e produz
+        ``(professional_id, {dia: (bitmap, exato)})`` um profissional por vez.
+        """
+        rows = ProfessionalDayOccupancy.objects.order_by('professional_id', 'dia').values_list(
+            'professional_id', 'dia', 'bitmap', 'exato'
+        ).iterator(chunk_size=batch_size)
+
+        for professional_id, group in groupby(rows, key=itemgetter(0)):
+            yield professional_id, {dia: (bytes(bitmap), exato) for _, dia, bitmap, exato in group}
+
+    def _verify(self, batch_size):
+        """
+        Compara a tabela com as consultas, um profissional por vez.
+
+        As duas leituras vêm ordenadas por profissional e são percorridas em
+        paralelo (merge), sem carregar a tabela inteira em memória.
+        """
+        expected_iter = self._iter_expected(batch_size)
+        stored_iter = self._iter_stored(batch_size)
+        expected = next(expected_iter, None)
+        stored = next(stored_iter, None)
+
+        divergences = []
+        while expected is not None or stored is not None:
+            if stored is None or (expected is not None and expected[0] < stored[0]):
+                professional_id, occupancies = expected
+                stored_days = {}
+                expected = next(expected_iter, None)
+            elif expected is None or stored[0] < expected[0]:
+                professional_id, stored_days = stored
+                occupancies = {}
+                stored = next(stored_iter, None)
+            else:
+                professional_id, occupancies = expected
+                stored_days = stored[1]
+                expected = next(expected_iter, None)
+                stored = next(stored_iter, None)
+            divergences.extend(self._compare(professional_id, occupancies, stored_days))
+
+        for line in divergences:
+            self.stdout.write(self.style.WARNING(line))
+
+        if divergences:
+            raise CommandError(
+                f'{len(divergences)} divergência(s) encontrada(s). '
+                'Execute "python manage.py rebuild_occupancy" para corrigir.'
+            )
+
+        self.stdout.write(self.style.SUCCESS('✓ Tabela de ocupação consistente com as consultas'))
+
+    def _compare(self, professional_id, occupancies, stored_days):
+        """Divergências entre a ocupação esperada e a armazenada de um profissional"""
+        divergences = []
+        for day, occupancy in sorted(occupancies.items()):
+            if not occupancy.bits:
+                continue
+            expected = (occupancy.to_bitmap(), occupancy.exact)
+            actual = stored_days.pop(day, None)
+            if actual is None:
+                divergences.append(f'Ausente: profissional {professional_id} em {day}')
+            elif actual != expected:
+                divergences.append(f'Divergente: profissional {professional_id} em {day}')
+
+        for day in sorted(stored_days):
+            divergences.append(f'Sobrando: profissional {professional_id} em {day}')
+        return divergences
@@ -0,0 +1,103 @@
+# Generated by Django 6.0 on 2026-10-17 07:37
+
+from datetime import datetime, time, timedelta
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+# Grade de appointments.slots no momento desta migração (blocos de 15
+# minutos, 96 por dia); copiada aqui para a migração não depender do código
+# atual do app.
+SLOT = timedelta(minutes=15)
+SLOTS_PER_DAY = 96
+
+
+def day_bits(day, start, end):
+    """Bits dos blocos do dia ocupados por ``[start, end)`` e se estão alinhados à grade."""
+    origin = timezone.make_aware(datetime.combine(day, time.min))
+    offset_start = start - origin
+    offset_end = end - origin
+    first = min(max(offset_start // SLOT, 0), SLOTS_PER_DAY)
+    last = min(max(-(-offset_end // SLOT), 0), SLOTS_PER_DAY)
+    if last <= first:
+        return 0, True
+    aligned = not (offset_start % SLOT) and not (offset_end % SLOT)
+    return ((1 << (last - first)) - 1) << first, aligned
+
+
+def populate_day_occupancy(apps, schema_editor):
+    """Preenche a tabela com a ocupação das consultas ativas já existentes."""
+    Appointment = apps.get_model("appointments", "Appointment")
+    ProfessionalDayOccupancy = apps.get_model("appointments", "ProfessionalDayOccupancy")
+
+    occupancies = {}
+    rows = Appointment.objects.filter(
+        status__in=["AGENDADA", "CONFIRMADA"]
+    ).values_list("professional_id", "data_hora", "duracao_minutos")
+
+    for professional_id, data_hora, duracao_minutos in rows.iterator(chunk_size=1000):
+        fim = data_hora + timedelta(minutes=duracao_minutos)
+        day = timezone.localtime(data_hora).date()
+        last_day = timezone.localtime(fim - timedelta(microseconds=1)).date()
+        while day <= last_day:
+            bits, aligned = day_bits(day, data_hora, fim)
+            if bits:
+                current_bits, exact = occupancies.get((professional_id, day), (0, True))
+                occupancies[(professional_id, day)] = (current_bits | bits, exact and aligned)
+            day += timedelta(days=1)
+
+    ProfessionalDayOccupancy.objects.bulk_create(
+        [
+            ProfessionalDayOccupancy(
+                professional_id=professional_id,
+                dia=day,
+                bitmap=bits.to_bytes(SLOTS_PER_DAY // 8, "little"),
+                exato=exact,
+            )
+            for (professional_id, day), (bits, exact) in occupancies.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("appointments", "0001_initial"),
+        ("professionals", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProfessionalDayOccupancy",
+            fields=[
+                (
+                    "pk",
+                    models.CompositePrimaryKey(
+                        "professional",
+                        "dia",
+                        blank=True,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("dia", models.DateField()),
+                ("bitmap", models.BinaryField(max_length=12)),
+                ("exato", models.BooleanField(default=True)),
+                (
+                    "professional",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="day_occupancies",
+                        to="professionals.professional",
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "professional_day_occupancy",
+            },
+        ),
+        migrations.RunPython(populate_day_occupancy, migrations.RunPython.noop),
+    ]
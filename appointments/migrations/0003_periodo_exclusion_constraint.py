@@ -0,0 +1,82 @@
+# Generated by Django 6.0 on 2026-10-17 07:57
+
+import django.contrib.postgres.constraints
+import django.contrib.postgres.fields.ranges
+from django.contrib.postgres.operations import BtreeGistExtension
+from django.db import migrations, models
+
+
+def check_overlaps(apps, schema_editor):
+    """Impede a criação da constraint se já houver consultas ativas sobrepostas."""
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT a.id, b.id, a.professional_id
+            FROM appointments_appointment a
+            JOIN appointments_appointment b
+              ON a.professional_id = b.professional_id
+             AND a.id < b.id
+             AND a.periodo && b.periodo
+            WHERE a.status IN ('AGENDADA', 'CONFIRMADA')
+              AND b.status IN ('AGENDADA', 'CONFIRMADA')
+            ORDER BY a.professional_id, a.id
+            LIMIT 20
+            """
+        )
+        overlaps = cursor.fetchall()
+
+    if overlaps:
+        pairs = ", ".join(
+            f"{first}x{second} (profissional {professional_id})"
+            for first, second, professional_id in overlaps
+        )
+        raise RuntimeError(
+            f"Existem consultas ativas sobrepostas: {pairs}. "
+            "Cancele ou remarque uma consulta de cada par antes de aplicar "
+            "esta migração (python manage.py audit_overbooking --fix)."
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("appointments", "0002_professionaldayoccupancy"),
+    ]
+
+    operations = [
+        BtreeGistExtension(),
+        migrations.AddField(
+            model_name="appointment",
+            name="periodo",
+            field=django.contrib.postgres.fields.ranges.DateTimeRangeField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.RunSQL(
+            """
+            UPDATE appointments_appointment
+            SET periodo = tstzrange(
+                data_hora,
+                data_hora + duracao_minutos * interval '1 minute',
+                '[)'
+            )
+            """,
+            migrations.RunSQL.noop,
+        ),
+        migrations.AlterField(
+            model_name="appointment",
+            name="periodo",
+            field=django.contrib.postgres.fields.ranges.DateTimeRangeField(
+                editable=False
+            ),
+        ),
+        migrations.RunPython(check_overlaps, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="appointment",
+            constraint=django.contrib.postgres.constraints.ExclusionConstraint(
+                condition=models.Q(("status__in", ["AGENDADA", "CONFIRMADA"])),
+                expressions=[("professional", "="), ("periodo", "&&")],
+                name="consulta_sem_sobreposicao",
+            ),
+        ),
+    ]
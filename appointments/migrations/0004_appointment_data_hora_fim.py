@@ -0,0 +1,30 @@
+# Generated by Django 6.0 on 2026-10-17 07:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("appointments", "0003_periodo_exclusion_constraint"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="appointment",
+            name="data_hora_fim",
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.RunSQL(
+            """
+            UPDATE appointments_appointment
+            SET data_hora_fim = data_hora + duracao_minutos * interval '1 minute'
+            """,
+            migrations.RunSQL.noop,
+        ),
+        migrations.AlterField(
+            model_name="appointment",
+            name="data_hora_fim",
+            field=models.DateTimeField(editable=False),
+        ),
+    ]
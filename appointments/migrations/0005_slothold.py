@@ -0,0 +1,75 @@
+# Generated by Django 6.0 on 2026-10-17 08:09
+
+import django.contrib.postgres.constraints
+import django.contrib.postgres.fields.ranges
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("appointments", "0004_appointment_data_hora_fim"),
+        ("professionals", "0002_professional_schedule"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SlotHold",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("data_hora", models.DateTimeField()),
+                ("duracao_minutos", models.PositiveIntegerField(default=60)),
+                ("data_hora_fim", models.DateTimeField(editable=False)),
+                (
+                    "periodo",
+                    django.contrib.postgres.fields.ranges.DateTimeRangeField(
+                        editable=False
+                    ),
+                ),
+                ("expira_em", models.DateTimeField()),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "professional",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="holds",
+                        to="professionals.professional",
+                    ),
+                ),
+                (
+                    "usuario",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="slot_holds",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["professional", "expira_em"],
+                        name="reserva_prof_expira_idx",
+                    )
+                ],
+                "constraints": [
+                    django.contrib.postgres.constraints.ExclusionConstraint(
+                        expressions=[("professional", "="), ("periodo", "&&")],
+                        name="reserva_sem_sobreposicao",
+                    )
+                ],
+            },
+        ),
+    ]
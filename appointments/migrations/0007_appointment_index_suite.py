@@ -0,0 +1,47 @@
+# Generated by Django 6.0 on 2026-10-17 08:30
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY não roda dentro de transação
+    atomic = False
+
+    dependencies = [
+        ("appointments", "0006_appointment_trgm_indexes"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="appointment",
+            index=models.Index(
+                fields=["data_hora", "id"],
+                include=("professional", "duracao_minutos", "status", "paciente_nome"),
+                name="appointment_lista_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="appointment",
+            index=models.Index(
+                condition=models.Q(("status__in", ["AGENDADA", "CONFIRMADA"])),
+                fields=["data_hora", "id"],
+                name="appointment_ativa_data_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="appointment",
+            index=models.Index(
+                condition=models.Q(("status__in", ["AGENDADA", "CONFIRMADA"])),
+                fields=["professional", "data_hora_fim", "data_hora"],
+                name="appointment_ativa_prof_fim_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="appointment",
+            index=django.contrib.postgres.indexes.BrinIndex(
+                fields=["created_at"], name="appointment_created_brin"
+            ),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 6.0 on 2026-10-17 09:20
+
+from django.db import migrations, models
+
+
+def check_durations(apps, schema_editor):
+    """Impede a criação das constraints se já houver registros acima de 4 horas."""
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT 'consulta', id::text, professional_id, duracao_minutos
+            FROM appointments_appointment
+            WHERE duracao_minutos > 240
+            UNION ALL
+            SELECT 'reserva', id::text, professional_id, duracao_minutos
+            FROM appointments_slothold
+            WHERE duracao_minutos > 240
+            ORDER BY 1, 3, 2
+            LIMIT 20
+            """
+        )
+        rows = cursor.fetchall()
+
+    if rows:
+        listed = ", ".join(
+            f"{kind} {pk} ({minutes} min, profissional {professional_id})"
+            for kind, pk, professional_id, minutes in rows
+        )
+        raise RuntimeError(
+            f"Existem registros com duração acima de 240 minutos: {listed}. "
+            "Divida ou encurte esses registros antes de aplicar esta migração; "
+            "AgendaQuerySet.overlapping depende desse limite."
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("appointments", "0007_appointment_index_suite"),
+    ]
+
+    operations = [
+        migrations.RunPython(check_durations, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="appointment",
+            constraint=models.CheckConstraint(
+                condition=models.Q(("duracao_minutos__lte", 240)),
+                name="duracao_maxima_4h",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="slothold",
+            constraint=models.CheckConstraint(
+                condition=models.Q(("duracao_minutos__lte", 240)),
+                name="reserva_duracao_maxima_4h",
+            ),
+        ),
+    ]
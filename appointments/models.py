@@ -1,6 +1,74 @@
-from django.db import models
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.postgres.constraints import ExclusionConstraint
+from django.contrib.postgres.fields import DateTimeRangeField, RangeOperators
+from django.contrib.postgres.indexes import BrinIndex, GinIndex, OpClass
+from django.db import models, transaction
+from django.db.models import BooleanField, Case, CharField, ExpressionWrapper, F, Q, Value, When
+from django.db.models.functions import Cast, Concat, LPad, Mod, Upper
+from django.db.backends.postgresql.psycopg_any import DateTimeTZRange
+from django.utils import timezone
 from professionals.models import Professional
 
+from .slots import MAX_DURACAO_MINUTOS
+
+# Nenhum registro dura mais que isso (constraints duracao_maxima_*)
+MAX_DURACAO = timedelta(minutes=MAX_DURACAO_MINUTOS)
+
+
+class AgendaQuerySet(models.QuerySet):
+    def overlapping(self, start, end):
+        """
+        Registros que se sobrepõem a ``[start, end)``.
+
+        Comparação exata nos dois lados (``data_hora < end`` e
+        ``data_hora_fim > start``). Como a duração é limitada por constraint,
+        ``data_hora > start - MAX_DURACAO`` também vale e fecha a faixa de
+        ``data_hora`` lida no índice ``(professional, data_hora_fim, data_hora)``
+        (ou em ``data_hora``, sem filtro de profissional).
+        """
+        return self.filter(
+            data_hora__lt=end,
+            data_hora__gt=start - MAX_DURACAO,
+            data_hora_fim__gt=start,
+        )
+
+
+class AppointmentQuerySet(AgendaQuerySet):
+    def active(self):
+        """Consultas que ocupam a agenda"""
+        return self.filter(status__in=Appointment.ACTIVE_STATUSES)
+
+    def with_derived(self, now=None):
+        """
+        Anota ``is_past``, ``can_cancel`` e ``duracao_horas`` no banco.
+
+        Todas as linhas usam o mesmo ``now``; os valores são os mesmos de
+        ``Appointment.format_duracao`` e das regras de cancelamento.
+        """
+        now = now or timezone.now()
+        horas = Cast(F('duracao_minutos') / 60, CharField())
+        minutos = Mod('duracao_minutos', 60)
+        return self.alias(duracao_resto=minutos).annotate(
+            is_past=ExpressionWrapper(Q(data_hora__lt=now), output_field=BooleanField()),
+            can_cancel=ExpressionWrapper(
+                ~Q(status__in=Appointment.FINAL_STATUSES)
+                & Q(data_hora__gt=now + Appointment.PRAZO_CANCELAMENTO),
+                output_field=BooleanField(),
+            ),
+            duracao_horas=Case(
+                When(duracao_minutos__lt=60, then=Concat(Cast(minutos, CharField()), Value('min'))),
+                When(duracao_resto=0, then=Concat(horas, Value('h'))),
+                default=Concat(
+                    horas, Value('h'), LPad(Cast(minutos, CharField()), 2, Value('0')), Value('min')
+                ),
+                output_field=CharField(),
+            ),
+        )
+
+
 class Appointment(models.Model):
     STATUS_CHOICES = [
         ('AGENDADA', 'Agendada'),
@@ -9,6 +77,16 @@ class Appointment(models.Model):
         ('CANCELADA', 'Cancelada'),
     ]
 
+    # Status que ocupam a agenda do profissional
+    ACTIVE_STATUSES = ('AGENDADA', 'CONFIRMADA')
+    # Status sem volta (não podem mais ser cancelados)
+    FINAL_STATUSES = ('REALIZADA', 'CANCELADA')
+    # Antecedência mínima para cancelar
+    PRAZO_CANCELAMENTO = timedelta(hours=24)
+
+    # Constraint que impede consultas ativas sobrepostas do mesmo profissional
+    OVERLAP_CONSTRAINT = 'consulta_sem_sobreposicao'
+
     professional = models.ForeignKey(
         Professional,
         on_delete=models.PROTECT,
@@ -16,6 +94,10 @@ class Appointment(models.Model):
     )
     data_hora = models.DateTimeField()
     duracao_minutos = models.PositiveIntegerField(default=60)
+    # Fim da consulta (data_hora + duracao_minutos), calculado em save()
+    data_hora_fim = models.DateTimeField(editable=False)
+    # [data_hora, data_hora_fim), calculado em save()
+    periodo = DateTimeRangeField(editable=False)
     status = models.CharField(
         max_length=20,
         choices=STATUS_CHOICES,
@@ -37,13 +119,222 @@ class Appointment(models.Model):
         indexes = [
             models.Index(fields=['professional', 'data_hora']),
             models.Index(fields=['status']),
+            # Listagem (ordem e cursor em data_hora, id) com as colunas do
+            # AppointmentListSerializer: index-only scan
+            models.Index(
+                fields=['data_hora', 'id'],
+                include=['professional', 'duracao_minutos', 'status', 'paciente_nome'],
+                name='appointment_lista_idx'
+            ),
+            # upcoming: consultas ativas por data
+            models.Index(
+                fields=['data_hora', 'id'],
+                condition=models.Q(status__in=['AGENDADA', 'CONFIRMADA']),
+                name='appointment_ativa_data_idx'
+            ),
+            # Ocupação e conflitos (active().overlapping()) de um profissional
+            models.Index(
+                fields=['professional', 'data_hora_fim', 'data_hora'],
+                condition=models.Q(status__in=['AGENDADA', 'CONFIRMADA']),
+                name='appointment_ativa_prof_fim_idx'
+            ),
+            BrinIndex(fields=['created_at'], name='appointment_created_brin'),
+            # icontains (UPPER(...) LIKE) dos filtros e da busca
+            GinIndex(OpClass(Upper('paciente_nome'), name='gin_trgm_ops'), name='appointment_paciente_trgm'),
+            GinIndex(OpClass(Upper('paciente_email'), name='gin_trgm_ops'), name='appointment_email_trgm'),
         ]
         constraints = [
             models.CheckConstraint(
                 condition=models.Q(duracao_minutos__gte=15),
                 name='duracao_minima_15min'
+            ),
+            models.CheckConstraint(
+                condition=models.Q(duracao_minutos__lte=MAX_DURACAO_MINUTOS),
+                name='duracao_maxima_4h'
+            ),
+            ExclusionConstraint(
+                name='consulta_sem_sobreposicao',
+                expressions=[
+                    ('professional', RangeOperators.EQUAL),
+                    ('periodo', RangeOperators.OVERLAPS),
+                ],
+                condition=models.Q(status__in=['AGENDADA', 'CONFIRMADA']),
+            ),
+        ]
+
+    objects = AppointmentQuerySet.as_manager()
+
+    # Campos que determinam a ocupação da agenda
+    AGENDA_FIELDS = ('professional', 'professional_id', 'data_hora', 'duracao_minutos', 'status')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._agenda_original = instance._agenda_snapshot()
+        return instance
+
+    def _agenda_snapshot(self):
+        """Valores que definem a ocupação, ou None se algum campo foi adiado"""
+        try:
+            return tuple(
+                self.__dict__[field]
+                for field in ('professional_id', 'data_hora', 'duracao_minutos', 'status')
             )
+        except KeyError:
+            return None
+
+    @staticmethod
+    def format_duracao(minutos):
+        """Duração legível: 45min, 1h, 1h30min"""
+        hours, minutes = divmod(minutos, 60)
+        if hours > 0:
+            return f"{hours}h{minutes:02d}min" if minutes else f"{hours}h"
+        return f"{minutes}min"
+
+    def compute_fim(self):
+        """Fim da consulta"""
+        return self.data_hora + timedelta(minutes=self.duracao_minutos)
+
+    def set_periodo(self):
+        """Atualiza ``data_hora_fim`` e ``periodo`` (também usado antes de bulk_create)"""
+        self.data_hora_fim = self.compute_fim()
+        self.periodo = DateTimeTZRange(self.data_hora, self.data_hora_fim, '[)')
+
+    def save(self, *args, **kwargs):
+        """Salva e atualiza a ocupação diária na mesma transação"""
+        from .availability import sync_day_occupancies
+
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and not set(update_fields) & set(self.AGENDA_FIELDS):
+            return super().save(*args, **kwargs)
+
+        self.set_periodo()
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'data_hora_fim', 'periodo'}
+
+        original = getattr(self, '_agenda_original', None)
+        with transaction.atomic():
+            if original is None and not self._state.adding and self.pk:
+                original = Appointment.objects.filter(pk=self.pk).values_list(
+                    'professional_id', 'data_hora', 'duracao_minutos', 'status'
+                ).first()
+            super().save(*args, **kwargs)
+            current = self._agenda_snapshot()
+            if current != original:
+                sync_day_occupancies(
+                    span[:3] for span in (original, current) if span is not None
+                )
+        self._agenda_original = current
+
+    def delete(self, *args, **kwargs):
+        """Remove e atualiza a ocupação diária na mesma transação"""
+        from .availability import sync_day_occupancies
+
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            sync_day_occupancies([(self.professional_id, self.data_hora, self.duracao_minutos)])
+        return result
+
+    def __str__(self):
+        return f"Consulta com {self.professional.nome_social} em {self.data_hora.strftime('%Y-%m-%d %H:%M')} - {self.paciente_nome}"
+
+
+class SlotHoldQuerySet(AgendaQuerySet):
+    def active(self, now=None):
+        """Reservas ainda não expiradas"""
+        return self.filter(expira_em__gt=now or timezone.now())
+
+    def expired(self, now=None):
+        return self.filter(expira_em__lte=now or timezone.now())
+
+
+class SlotHold(models.Model):
+    """
+    Reserva temporária de um horário enquanto o paciente preenche o agendamento.
+
+    Enquanto não expira, a reserva conta como ocupada na disponibilidade e na
+    verificação de conflitos, e pode ser convertida em ``Appointment`` por
+    quem a criou. Reservas expiradas são ignoradas nas leituras e removidas
+    sob demanda (por profissional, ao criar uma nova reserva), sem varredura
+    da tabela inteira.
+    """
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    professional = models.ForeignKey(
+        Professional,
+        on_delete=models.CASCADE,
+        related_name='holds'
+    )
+    usuario = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='slot_holds'
+    )
+    data_hora = models.DateTimeField()
+    duracao_minutos = models.PositiveIntegerField(default=60)
+    data_hora_fim = models.DateTimeField(editable=False)
+    periodo = DateTimeRangeField(editable=False)
+    expira_em = models.DateTimeField()
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = SlotHoldQuerySet.as_manager()
+
+    # Constraint que impede reservas sobrepostas do mesmo profissional
+    OVERLAP_CONSTRAINT = 'reserva_sem_sobreposicao'
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['professional', 'expira_em'], name='reserva_prof_expira_idx'),
         ]
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(duracao_minutos__lte=MAX_DURACAO_MINUTOS),
+                name='reserva_duracao_maxima_4h'
+            ),
+            ExclusionConstraint(
+                name='reserva_sem_sobreposicao',
+                expressions=[
+                    ('professional', RangeOperators.EQUAL),
+                    ('periodo', RangeOperators.OVERLAPS),
+                ],
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.data_hora_fim = self.data_hora + timedelta(minutes=self.duracao_minutos)
+        self.periodo = DateTimeTZRange(self.data_hora, self.data_hora_fim, '[)')
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"Reserva de {self.professional_id} em {self.data_hora:%Y-%m-%d %H:%M} até {self.expira_em:%H:%M}"
+
+
+class ProfessionalDayOccupancy(models.Model):
+    """
+    Ocupação desnormalizada de um profissional em um dia.
+
+    Guarda o bitset de blocos de 15 minutos ocupados por consultas ativas
+    (ver ``appointments.slots``), mantido por ``Appointment.save``/``delete``
+    na mesma transação da consulta. Dias sem consultas ativas não têm linha.
+    ``exato`` é False quando alguma consulta do dia não está alinhada à grade
+    de 15 minutos; nesses dias a leitura exata recorre à tabela de consultas.
+
+    Reconstrução/verificação: ``python manage.py rebuild_occupancy [--verify]``
+    """
+
+    pk = models.CompositePrimaryKey('professional', 'dia')
+    professional = models.ForeignKey(
+        Professional,
+        on_delete=models.CASCADE,
+        related_name='day_occupancies'
+    )
+    dia = models.DateField()
+    bitmap = models.BinaryField(max_length=12)
+    exato = models.BooleanField(default=True)
+
+    class Meta:
+        db_table = 'professional_day_occupancy'
 
     def __str__(self):
-        return f"Consulta com {self.professional.nome_social} em {self.data_hora.strftime('%Y-%m-%d %H:%M')} - {self.paciente_nome}"
\ No newline at end of file
+        return f"Ocupação de {self.professional_id} em {self.dia:%Y-%m-%d}"
@@ -1,68 +1,67 @@
 from rest_framework import serializers
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
 from django.utils import timezone
 from datetime import timedelta
-from .models import Appointment
+from .models import Appointment, SlotHold
+from .availability import is_slot_free
+from professionals.models import Professional
+from professionals.schedules import get_compiled_schedule
 from professionals.serializers import ProfessionalSerializer
+from core.fieldsets import MemoizedNestedField, SparseFieldsetSerializerMixin
 from core.validators import sanitize_html, validate_no_sql_injection
 
 
-class AppointmentSerializer(serializers.ModelSerializer):
-    """Serializer completo para consultas"""
+CONFLITO_HORARIO = "Profissional já possui consulta neste horário"
+
+
+def is_overlap_violation(exc, constraint=Appointment.OVERLAP_CONSTRAINT):
+    """Verifica se o IntegrityError veio da constraint de sobreposição"""
+    diag = getattr(exc.__cause__, 'diag', None)
+    return getattr(diag, 'constraint_name', None) == constraint
+
+
+class OverlapConstraintMixin:
+    """
+    Converte violações da constraint de sobreposição em erro de validação.
     
-    professional_details = ProfessionalSerializer(
-        source='professional',
-        read_only=True
-    )
+    A verificação em validate() é apenas uma antecipação amigável: sob
+    concorrência, quem garante a ausência de conflitos é a constraint de
+    exclusão no banco.
+    """
     
-    # Campos calculados
-    duracao_horas = serializers.SerializerMethodField()
-    status_display = serializers.CharField(
-        source='get_status_display',
-        read_only=True
-    )
-    is_past = serializers.SerializerMethodField()
-    can_cancel = serializers.SerializerMethodField()
+    def create(self, validated_data):
+        try:
+            return super().create(validated_data)
+        except IntegrityError as exc:
+            if not is_overlap_violation(exc):
+                raise
+            raise serializers.ValidationError(CONFLITO_HORARIO)
     
-    class Meta:
-        model = Appointment
-        fields = [
-            'id',
-            'professional',
-            'professional_details',
-            'data_hora',
-            'duracao_minutos',
-            'duracao_horas',
-            'status',
-            'status_display',
-            'paciente_nome',
-            'paciente_email',
-            'paciente_telefone',
-            'observacoes',
-            'is_past',
-            'can_cancel',
-            'created_at',
-            'updated_at',
-        ]
-        read_only_fields = ('id', 'created_at', 'updated_at')
-    
-    def get_duracao_horas(self, obj):
-        """Retorna duração em formato legível"""
-        hours = obj.duracao_minutos // 60
-        minutes = obj.duracao_minutos % 60
-        if hours > 0:
-            return f"{hours}h{minutes:02d}min" if minutes else f"{hours}h"
-        return f"{minutes}min"
+    def update(self, instance, validated_data):
+        try:
+            return super().update(instance, validated_data)
+        except IntegrityError as exc:
+            if not is_overlap_violation(exc):
+                raise
+            raise serializers.ValidationError(CONFLITO_HORARIO)
+
+
+class AppointmentValidationMixin:
+    """
+    Validações compartilhadas pelos serializers de escrita de consultas.
     
-    def get_is_past(self, obj):
-        """Verifica se a consulta já passou"""
-        return obj.data_hora < timezone.now()
+    Cada validador de campo (incluindo a sanitização) e a verificação de
+    expediente/conflito rodam uma única vez por requisição, e os valores
+    sanitizados seguem em ``validated_data`` até o ``save()``.
+    """
     
-    def get_can_cancel(self, obj):
-        """Verifica se pode cancelar (até 24h antes)"""
-        if obj.status in ['CANCELADA', 'REALIZADA']:
-            return False
-        time_until = obj.data_hora - timezone.now()
-        return time_until > timedelta(hours=24)
+    def validate_professional(self, value):
+        """Não permite agendar com profissional inativo"""
+        if not value.ativo:
+            raise serializers.ValidationError("Profissional inativo")
+        return value
     
     def validate_data_hora(self, value):
         """Valida se a data/hora é futura"""
@@ -71,18 +70,8 @@ class AppointmentSerializer(serializers.ModelSerializer):
                 "Não é possível agendar consulta no passado"
             )
         
-        # Validar horário comercial (8h às 18h)
-        if value.hour < 8 or value.hour >= 18:
-            raise serializers.ValidationError(
-                "Horário deve ser entre 8h e 18h"
-            )
-        
-        # Validar dias úteis (segunda a sexta)
-        if value.weekday() >= 5:  # 5=sábado, 6=domingo
-            raise serializers.ValidationError(
-                "Consultas apenas em dias úteis"
-            )
-        
+        # Expediente (dias e horários) depende do profissional e é
+        # validado em validate()
         return value
     
     def validate_duracao_minutos(self, value):
@@ -141,27 +130,119 @@ class AppointmentSerializer(serializers.ModelSerializer):
             # Calcular fim da consulta
             fim_consulta = data_hora + timedelta(minutes=duracao)
             
-            # Buscar consultas conflitantes
-            conflicting = Appointment.objects.filter(
-                professional=professional,
-                data_hora__lt=fim_consulta,
-                data_hora__gte=data_hora - timedelta(minutes=duracao),
-                status__in=['AGENDADA', 'CONFIRMADA']
-            )
-            
-            # Excluir a própria consulta se for update
-            if self.instance:
-                conflicting = conflicting.exclude(pk=self.instance.pk)
-            
-            if conflicting.exists():
+            # Validar expediente do profissional (fuso, pausas e exceções);
+            # em lotes os expedientes já vêm carregados no contexto
+            schedule = self.context.get('schedules', {}).get(professional.pk)
+            if schedule is None:
+                schedule = get_compiled_schedule(professional.pk)
+            if not schedule.contains(data_hora, fim_consulta):
                 raise serializers.ValidationError(
-                    "Profissional já possui consulta neste horário"
+                    {'data_hora': "Horário fora do expediente do profissional"}
                 )
+            
+            # Em lotes, o conflito é verificado de uma vez pela view
+            if self.context.get('defer_conflict_check'):
+                return data
+            
+            # Consultar a ocupação persistida dos dias tocados (chave
+            # primária); excluir a própria consulta se for update
+            is_free = is_slot_free(
+                professional.pk,
+                data_hora,
+                fim_consulta,
+                exclude_pk=self.instance.pk if self.instance else None,
+                exclude_hold=self.context.get('hold_id')
+            )
+            if not is_free:
+                raise serializers.ValidationError(CONFLITO_HORARIO)
         
         return data
 
 
-class AppointmentCreateSerializer(serializers.ModelSerializer):
+class AppointmentSerializer(
+    SparseFieldsetSerializerMixin,
+    AppointmentValidationMixin,
+    OverlapConstraintMixin,
+    serializers.ModelSerializer,
+):
+    """Serializer completo para consultas"""
+    
+    # Colunas lidas pelos campos calculados (sparse fieldsets)
+    field_columns = {
+        'duracao_horas': ['duracao_minutos'],
+        'is_past': ['data_hora'],
+        'can_cancel': ['status', 'data_hora'],
+    }
+    
+    # Só com ?expand=professional; cada profissional é serializado uma vez
+    # por resposta, por mais consultas dele que a página tenha
+    expandable_fields = {'professional': 'professional_details'}
+    
+    professional_details = MemoizedNestedField(
+        ProfessionalSerializer(),
+        source='professional'
+    )
+    
+    # Campos calculados
+    duracao_horas = serializers.SerializerMethodField()
+    status_display = serializers.CharField(
+        source='get_status_display',
+        read_only=True
+    )
+    is_past = serializers.SerializerMethodField()
+    can_cancel = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = Appointment
+        fields = [
+            'id',
+            'professional',
+            'professional_details',
+            'data_hora',
+            'duracao_minutos',
+            'duracao_horas',
+            'status',
+            'status_display',
+            'paciente_nome',
+            'paciente_email',
+            'paciente_telefone',
+            'observacoes',
+            'is_past',
+            'can_cancel',
+            'created_at',
+            'updated_at',
+        ]
+        read_only_fields = ('id', 'created_at', 'updated_at')
+    
+    @property
+    def now(self):
+        """"Agora" único por resposta (``context['now']``, definido pela view)"""
+        return self.context.setdefault('now', timezone.now())
+    
+    # Os valores vêm anotados por ``Appointment.objects.with_derived()``;
+    # sem a anotação (ex.: instância recém-salva) são calculados aqui
+    def get_duracao_horas(self, obj):
+        """Retorna duração em formato legível"""
+        if hasattr(obj, 'duracao_horas'):
+            return obj.duracao_horas
+        return Appointment.format_duracao(obj.duracao_minutos)
+    
+    def get_is_past(self, obj):
+        """Verifica se a consulta já passou"""
+        if hasattr(obj, 'is_past'):
+            return obj.is_past
+        return obj.data_hora < self.now
+    
+    def get_can_cancel(self, obj):
+        """Verifica se pode cancelar (até 24h antes)"""
+        if hasattr(obj, 'can_cancel'):
+            return obj.can_cancel
+        if obj.status in Appointment.FINAL_STATUSES:
+            return False
+        return obj.data_hora - self.now > Appointment.PRAZO_CANCELAMENTO
+
+
+class AppointmentCreateSerializer(AppointmentValidationMixin, OverlapConstraintMixin, serializers.ModelSerializer):
     """Serializer simplificado para criação"""
     
     class Meta:
@@ -175,15 +256,32 @@ class AppointmentCreateSerializer(serializers.ModelSerializer):
             'paciente_telefone',
             'observacoes',
         ]
+
+
+class PreloadedProfessionalField(serializers.PrimaryKeyRelatedField):
+    """Resolve o profissional a partir de ``context['professionals']`` (sem query por item)"""
     
-    def validate(self, data):
-        # Reutilizar validações do serializer principal
-        serializer = AppointmentSerializer(data=data)
-        serializer.is_valid(raise_exception=True)
-        return data
+    def to_internal_value(self, data):
+        if isinstance(data, bool) or not isinstance(data, (int, str)):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            return self.context['professionals'][int(data)]
+        except (KeyError, ValueError):
+            self.fail('does_not_exist', pk_value=data)
 
 
-class AppointmentUpdateSerializer(serializers.ModelSerializer):
+class AppointmentBulkItemSerializer(AppointmentCreateSerializer):
+    """
+    Item de criação em lote.
+    
+    Profissionais vêm pré-carregados no contexto e o conflito de horário é
+    verificado pela view para o lote inteiro (``find_batch_conflicts``).
+    """
+    
+    professional = PreloadedProfessionalField(queryset=Professional.objects.all())
+
+
+class AppointmentUpdateSerializer(OverlapConstraintMixin, serializers.ModelSerializer):
     """Serializer para atualização (campos limitados)"""
     
     class Meta:
@@ -218,8 +316,13 @@ class AppointmentUpdateSerializer(serializers.ModelSerializer):
         return value
 
 
-class AppointmentListSerializer(serializers.ModelSerializer):
-    """Serializer otimizado para listagens"""
+class AppointmentListSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
+    """
+    Serializer otimizado para listagens
+    
+    As colunas dos campos (ver ``columns_for``) são cobertas por
+    appointment_lista_idx.
+    """
     
     professional_name = serializers.CharField(
         source='professional.nome_social',
@@ -277,3 +380,59 @@ class AppointmentCancelSerializer(serializers.Serializer):
             )
         
         return data
+
+
+class SlotHoldSerializer(AppointmentValidationMixin, serializers.ModelSerializer):
+    """
+    Reserva temporária de horário.
+    
+    Passa pelas mesmas validações de expediente e conflito de uma consulta;
+    o início precisa estar na grade de 15 minutos.
+    """
+    
+    class Meta:
+        model = SlotHold
+        fields = [
+            'id',
+            'professional',
+            'data_hora',
+            'duracao_minutos',
+            'expira_em',
+        ]
+        read_only_fields = ('id', 'expira_em')
+    
+    def validate_data_hora(self, value):
+        value = super().validate_data_hora(value)
+        if value.minute % 15 or value.second or value.microsecond:
+            raise serializers.ValidationError(
+                "Reservas devem começar em múltiplos de 15 minutos"
+            )
+        return value
+    
+    def create(self, validated_data):
+        professional = validated_data['professional']
+        now = timezone.now()
+        
+        # Limpeza sob demanda: reservas expiradas deste profissional
+        SlotHold.objects.filter(professional=professional).expired(now).delete()
+        
+        usuario = validated_data['usuario']
+        try:
+            with transaction.atomic():
+                # Trava o usuário: reservas simultâneas dele não furam o limite
+                get_user_model().objects.select_for_update().get(pk=usuario.pk)
+                ativas = SlotHold.objects.active(now).filter(usuario=usuario).count()
+                if ativas >= settings.SLOT_HOLD_MAX_ACTIVE_PER_USER:
+                    raise serializers.ValidationError(
+                        f"Limite de {settings.SLOT_HOLD_MAX_ACTIVE_PER_USER} reserva(s) "
+                        "ativa(s) por usuário atingido"
+                    )
+                return SlotHold.objects.create(
+                    expira_em=now + timedelta(seconds=settings.SLOT_HOLD_TTL_SECONDS),
+                    **validated_data
+                )
+        except IntegrityError as exc:
+            if not is_overlap_violation(exc, SlotHold.OVERLAP_CONSTRAINT):
+                raise
+            raise serializers.ValidationError("Horário já reservado por outro paciente")
+
@@ -0,0 +1,230 @@
+"""
+Motor de disponibilidade baseado em bitsets.
+
+A agenda de um profissional é representada como uma sequência de blocos de
+15 minutos a partir de uma origem (normalmente a meia-noite do dia). O bit
+``i`` do bitset indica que o bloco ``i`` está ocupado por alguma consulta.
+Verificar se um intervalo está livre passa a ser um ``AND`` entre o bitset e
+uma máscara, e a disponibilidade para qualquer duração (30, 45, 60...
+minutos) é obtida com deslocamentos de bits, sem percorrer as consultas.
+
+Consultas cujo início/fim não caem exatamente na grade de 15 minutos são
+marcadas de forma conservadora no bitset (o bloco parcial conta como
+ocupado). Nesses casos o motor guarda os intervalos originais e usa uma
+comparação exata como desempate, então o resultado nunca diverge da
+verificação de sobreposição tradicional.
+"""
+
+from datetime import datetime, time, timedelta
+from datetime import timezone as dt_timezone
+
+from django.utils import timezone
+
+
+SLOT_MINUTES = 15
+SLOT = timedelta(minutes=SLOT_MINUTES)
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+
+# Duração máxima aceita por AppointmentSerializer.validate_duracao_minutos
+# (e garantida no banco pelas constraints duracao_maxima_*)
+MAX_DURACAO_MINUTOS = 240
+
+# Passo da grade de horários oferecidos em available_slots
+INTERVALO_GRADE_MINUTOS = 30
+
+
+def day_start(day, tz=None):
+    """
+    Retorna a meia-noite de ``day`` (fuso atual por padrão) como datetime aware em UTC.
+
+    Em UTC, a diferença entre duas meias-noites é a duração real do dia
+    (23 ou 25 horas na mudança de horário de verão).
+    """
+    return timezone.make_aware(datetime.combine(day, time.min), tz).astimezone(dt_timezone.utc)
+
+
+class Occupancy:
+    """
+    Ocupação de uma janela de tempo em blocos de 15 minutos.
+
+    - ``origin``: início da janela (datetime aware)
+    - ``size``: quantidade de blocos na janela
+    - ``bits``: bitset de blocos ocupados
+    - ``exact``: True quando todos os intervalos adicionados estão alinhados
+      à grade, ou seja, o bitset sozinho responde de forma exata
+    - ``intervals``: intervalos originais ``(inicio, fim)``, usados como
+      desempate quando ``exact`` é False. É None quando a ocupação foi
+      reconstruída de um bitmap persistido (os intervalos não são
+      conhecidos); nesse caso respostas não exatas são tratadas de forma
+      conservadora (ocupado).
+    """
+
+    __slots__ = ('origin', 'size', 'bits', 'exact', 'intervals')
+
+    def __init__(self, origin, size=SLOTS_PER_DAY, bits=0, exact=True, intervals=None):
+        self.origin = origin
+        self.size = size
+        self.bits = bits
+        self.exact = exact
+        self.intervals = [] if intervals is None else intervals
+
+    @classmethod
+    def for_day(cls, day, rows=(), tz=None):
+        """Cria a ocupação de um dia inteiro a partir de linhas ``(data_hora, duracao_minutos)``."""
+        occupancy = cls(day_start(day, tz))
+        occupancy.add_rows(rows)
+        return occupancy
+
+    @classmethod
+    def for_window(cls, start, end, rows=()):
+        """Cria a ocupação de uma janela arbitrária ``[start, end)``."""
+        size = -((start - end) // SLOT)  # ceil((end - start) / SLOT)
+        occupancy = cls(start, max(size, 0))
+        occupancy.add_rows(rows)
+        return occupancy
+
+    @classmethod
+    def from_bitmap(cls, day, bitmap, exact=True, tz=None):
+        """Reconstrói a ocupação de um dia a partir de ``to_bitmap``."""
+        occupancy = cls(day_start(day, tz), bits=int.from_bytes(bytes(bitmap), 'little'), exact=exact)
+        occupancy.intervals = None
+        return occupancy
+
+    @classmethod
+    def combine(cls, origin, end, parts):
+        """
+        Projeta ocupações (ex.: dias do servidor) em uma nova janela ``[origin, end)``.
+
+        Usado para montar o dia local de um profissional em outro fuso a
+        partir dos dias armazenados. Se algum deslocamento não for múltiplo de
+        15 minutos, os blocos são cobertos de forma conservadora.
+        """
+        combined = cls.for_window(origin, end)
+        for part in parts:
+            shift, remainder = divmod(part.origin - origin, SLOT)
+            bits = part.bits
+            if remainder:
+                bits |= bits << 1
+                combined.exact = False
+                if bits and not part.intervals:
+                    # Bitmap persistido sem intervalos: não há como desempatar
+                    combined.intervals = None
+            combined.bits |= bits << shift if shift >= 0 else bits >> -shift
+            combined.exact = combined.exact and part.exact
+            if part.intervals is None:
+                combined.intervals = None
+            elif combined.intervals is not None:
+                combined.intervals.extend(part.intervals)
+        combined.bits &= (1 << combined.size) - 1
+        return combined
+
+    def to_bitmap(self):
+        """Serializa o bitset de um dia em bytes (12 bytes para 96 blocos)."""
+        return self.bits.to_bytes(-(-self.size // 8), 'little')
+
+    def __repr__(self):
+        return f"<Occupancy origin={self.origin.isoformat()} size={self.size} bits={self.bits:#x}>"
+
+    # ------------------------------------------------------------------
+    # Construção
+    # ------------------------------------------------------------------
+
+    def _span(self, start, end):
+        """Converte ``[start, end)`` em índices de blocos ``[first, last)`` recortados à janela."""
+        offset_start = start - self.origin
+        offset_end = end - self.origin
+
+        first = offset_start // SLOT
+        last = -(-offset_end // SLOT)  # arredonda para cima
+        aligned = not (offset_start % SLOT) and not (offset_end % SLOT)
+
+        first = min(max(first, 0), self.size)
+        last = min(max(last, 0), self.size)
+        return first, last, aligned
+
+    @staticmethod
+    def _mask(first, last):
+        if last <= first:
+            return 0
+        return ((1 << (last - first)) - 1) << first
+
+    def add(self, start, end):
+        """Marca ``[start, end)`` como ocupado."""
+        first, last, aligned = self._span(start, end)
+        if last <= first:
+            return
+        self.bits |= self._mask(first, last)
+        if not aligned:
+            self.exact = False
+        if self.intervals is not None:
+            self.intervals.append((start, end))
+
+    def add_rows(self, rows):
+        """Adiciona linhas ``(data_hora, duracao_minutos)``."""
+        for data_hora, duracao_minutos in rows:
+            self.add(data_hora, data_hora + timedelta(minutes=duracao_minutos))
+
+    # ------------------------------------------------------------------
+    # Consultas
+    # ------------------------------------------------------------------
+
+    def _overlaps_interval(self, start, end):
+        if self.intervals is None:
+            return True
+        return any(s < end and start < e for s, e in self.intervals)
+
+    def quick_check(self, start, end):
+        """
+        Responde apenas com o bitset.
+
+        Retorna True (livre), False (ocupado) ou None quando o bitset sozinho
+        não é conclusivo e é preciso comparar os intervalos exatos.
+        """
+        first, last, _ = self._span(start, end)
+        if not self.bits & self._mask(first, last):
+            return True
+        # Com ocupação exata, todo bloco marcado está inteiramente ocupado:
+        # tocar um deles já é sobreposição real
+        if self.exact:
+            return False
+        return None
+
+    def is_free(self, start, end):
+        """Verifica se ``[start, end)`` não se sobrepõe a nenhum intervalo ocupado."""
+        result = self.quick_check(start, end)
+        if result is not None:
+            return result
+        return not self._overlaps_interval(start, end)
+
+    def free_runs(self, length):
+        """
+        Bitset dos índices onde começam ``length`` blocos livres consecutivos.
+
+        Blocos além do fim da janela contam como ocupados.
+        """
+        free = ~self.bits & ((1 << self.size) - 1)
+        runs = free
+        for shift in range(1, length):
+            runs &= free >> shift
+        return runs
+
+    def available(self, starts, duration_minutes):
+        """
+        Disponibilidade de cada início em ``starts`` para a duração informada.
+
+        Retorna uma lista de booleanos na mesma ordem de ``starts``.
+        """
+        duration = timedelta(minutes=duration_minutes)
+        length = -(-duration // SLOT)
+        runs = self.free_runs(length)
+
+        result = []
+        for start in starts:
+            first, _, aligned = self._span(start, start + duration)
+            if aligned and (runs >> first) & 1:
+                result.append(True)
+            elif self.exact and aligned:
+                result.append(False)
+            else:
+                result.append(self.is_free(start, start + duration))
+        return result
@@ -1,28 +1,62 @@
-from rest_framework import viewsets, status, filters
+from rest_framework import mixins, viewsets, status, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import SAFE_METHODS, IsAuthenticated, IsAdminUser
 from django_filters.rest_framework import DjangoFilterBackend
 from django.utils import timezone
-from datetime import timedelta, datetime, time
+from django.utils.functional import cached_property
+from datetime import timedelta, datetime
+from django.db import IntegrityError, transaction
 from django.db.models import Q
 import logging
 
-from .models import Appointment
+from core.fastpath import ValuesListMixin
+from core.fieldsets import SparseFieldsetViewMixin
+from core.pagination import HybridPagination
+from core.streaming import PaginatedOrStreamedMixin
+
+from professionals.models import Professional
+from professionals.schedules import get_compiled_schedules
+from .models import Appointment, SlotHold
 from .serializers import (
+    CONFLITO_HORARIO,
     AppointmentSerializer,
+    AppointmentBulkItemSerializer,
     AppointmentCreateSerializer,
     AppointmentUpdateSerializer,
     AppointmentListSerializer,
     AppointmentCancelSerializer,
+    SlotHoldSerializer,
+    is_overlap_violation,
 )
-from .filters import AppointmentFilter
+from .filters import AppointmentFilter, AppointmentSearchFilter
 from .permissions import IsAppointmentOwnerOrReadOnly
+from .audit import cancel_overlaps, find_overlaps
+from .availability import (
+    cache_stats,
+    day_slots,
+    find_batch_conflicts,
+    iter_days,
+    load_availability,
+    parse_duration,
+    sync_day_occupancies,
+)
 
 logger = logging.getLogger(__name__)
 
+# Limite de dias por chamada de available_slots_range (visão mensal + folga)
+MAX_DIAS_INTERVALO = 62
+
+# Limite de consultas por chamada de bulk
+MAX_ITENS_LOTE = 500
 
-class AppointmentViewSet(viewsets.ModelViewSet):
+
+class AppointmentViewSet(
+    ValuesListMixin,
+    SparseFieldsetViewMixin,
+    PaginatedOrStreamedMixin,
+    viewsets.ModelViewSet,
+):
     """
     ViewSet completo para gerenciamento de consultas
     
@@ -34,24 +68,30 @@ class AppointmentViewSet(viewsets.ModelViewSet):
     destroy: Deletar consulta
     
     Ações customizadas:
-    - upcoming: Consultas futuras
-    - past: Consultas passadas
+    - upcoming: Consultas futuras (paginado; ?all=true em streaming)
+    - past: Consultas passadas (paginado; ?all=true em streaming)
     - by_professional: Consultas por profissional
+    - bulk: Criar várias consultas de uma vez
     - cancel: Cancelar consulta
     - confirm: Confirmar consulta
     - complete: Marcar como realizada
     - statistics: Estatísticas
     - available_slots: Horários disponíveis
+    - available_slots_range: Horários disponíveis em vários dias
+    - availability_cache: Contadores do cache de disponibilidade (admin)
     """
     
     queryset = Appointment.objects.select_related('professional').all()
     serializer_class = AppointmentSerializer
     permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, AppointmentSearchFilter, filters.OrderingFilter]
     filterset_class = AppointmentFilter
     search_fields = ['paciente_nome', 'paciente_email', 'professional__nome_social']
     ordering_fields = ['data_hora', 'created_at', 'status']
     ordering = ['-data_hora']
+    pagination_class = HybridPagination
+    # list serializa direto de .values(); id e data_hora são as chaves do cursor
+    values_extra_columns = ('id', 'data_hora')
     
     def get_queryset(self):
         """Otimizar queries com select_related"""
@@ -78,7 +118,25 @@ class AppointmentViewSet(viewsets.ModelViewSet):
         if end_date:
             queryset = queryset.filter(data_hora__lte=end_date)
         
-        return queryset
+        # Campos derivados calculados no banco, com o mesmo "agora" da resposta
+        if self.request.method in SAFE_METHODS and issubclass(
+            self.get_serializer_class(), AppointmentSerializer
+        ):
+            queryset = queryset.with_derived(self.now)
+        
+        # Só as colunas dos campos serializados (?fields=/?omit=); na listagem
+        # padrão são as de appointment_lista_idx (index-only scan)
+        return self.sparse_queryset(queryset)
+    
+    @cached_property
+    def now(self):
+        """Instante de referência da requisição"""
+        return timezone.now()
+    
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['now'] = self.now
+        return context
     
     def get_serializer_class(self):
         """Retornar serializer apropriado por ação"""
@@ -126,27 +184,115 @@ class AppointmentViewSet(viewsets.ModelViewSet):
         
         logger.warning(f"Consulta deletada: ID={instance.id}")
     
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """
+        Criar várias consultas de uma vez
+        
+        POST /api/v1/appointments/bulk/
+        {"appointments": [{...}, {...}]}
+        
+        Cada item é validado como no POST individual. Conflitos entre itens
+        do lote e com consultas existentes são verificados de uma vez e os
+        itens válidos são inseridos com bulk_create. A resposta traz o
+        resultado de cada item, na ordem enviada.
+        """
+        items = request.data.get('appointments') if isinstance(request.data, dict) else request.data
+        if not isinstance(items, list) or not items:
+            return Response(
+                {'error': 'Envie uma lista não vazia em appointments'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(items) > MAX_ITENS_LOTE:
+            return Response(
+                {'error': f'Máximo de {MAX_ITENS_LOTE} consultas por lote'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # Pré-carregar profissionais e expedientes do lote
+        professional_ids = set()
+        for item in items:
+            try:
+                professional_ids.add(int(item.get('professional')))
+            except (AttributeError, TypeError, ValueError):
+                continue
+        professionals = Professional.objects.in_bulk(professional_ids)
+        
+        context = {
+            **self.get_serializer_context(),
+            'professionals': professionals,
+            'schedules': get_compiled_schedules(professionals.keys()),
+            'defer_conflict_check': True,
+        }
+        results = [None] * len(items)
+        candidates = {}
+        for index, item in enumerate(items):
+            serializer = AppointmentBulkItemSerializer(data=item, context=context)
+            if serializer.is_valid():
+                candidates[index] = Appointment(**serializer.validated_data)
+            else:
+                results[index] = {'index': index, 'status': 'error', 'errors': serializer.errors}
+        
+        rejected = find_batch_conflicts([
+            (index, appointment.professional_id, appointment.data_hora, appointment.compute_fim())
+            for index, appointment in candidates.items()
+        ])
+        for index in rejected:
+            results[index] = {
+                'index': index,
+                'status': 'error',
+                'errors': {'non_field_errors': [CONFLITO_HORARIO]}
+            }
+        
+        accepted = [(index, appointment) for index, appointment in candidates.items() if index not in rejected]
+        for _, appointment in accepted:
+            appointment.set_periodo()
+        spans = [
+            (appointment.professional_id, appointment.data_hora, appointment.duracao_minutos)
+            for _, appointment in accepted
+        ]
+        
+        try:
+            with transaction.atomic():
+                Appointment.objects.bulk_create([appointment for _, appointment in accepted])
+                sync_day_occupancies(spans)
+        except IntegrityError as exc:
+            if not is_overlap_violation(exc):
+                raise
+            # Outra requisição reservou um dos horários entre a verificação e a inserção
+            return Response(
+                {'error': 'Conflito com agendamento concorrente. Reenvie o lote.'},
+                status=status.HTTP_409_CONFLICT
+            )
+        
+        for index, appointment in accepted:
+            results[index] = {'index': index, 'status': 'created', 'id': appointment.id}
+        
+        created = len(accepted)
+        logger.info(f"Lote de consultas: {created} criada(s), {len(items) - created} rejeitada(s)")
+        
+        return Response(
+            {'created': created, 'failed': len(items) - created, 'results': results},
+            status=status.HTTP_201_CREATED if created == len(items) else status.HTTP_207_MULTI_STATUS
+        )
+    
     @action(detail=False, methods=['get'])
     def upcoming(self, request):
         """Retornar consultas futuras"""
         appointments = self.get_queryset().filter(
-            data_hora__gte=timezone.now(),
+            data_hora__gte=self.now,
             status__in=['AGENDADA', 'CONFIRMADA']
         ).order_by('data_hora')
-        
-        serializer = self.get_serializer(appointments, many=True)
-        return Response(serializer.data)
+        return self.paginated_or_streamed(appointments)
     
     @action(detail=False, methods=['get'])
     def past(self, request):
         """Retornar consultas passadas"""
         appointments = self.get_queryset().filter(
-            Q(data_hora__lt=timezone.now()) |
+            Q(data_hora__lt=self.now) |
             Q(status__in=['REALIZADA', 'CANCELADA'])
         ).order_by('-data_hora')
-        
-        serializer = self.get_serializer(appointments, many=True)
-        return Response(serializer.data)
+        return self.paginated_or_streamed(appointments)
     
     @action(detail=False, methods=['get'], url_path='by-professional/(?P<professional_id>[0-9]+)')
     def by_professional(self, request, professional_id=None):
@@ -287,6 +433,9 @@ class AppointmentViewSet(viewsets.ModelViewSet):
                 data_hora__gte=timezone.now(),
                 status__in=['AGENDADA', 'CONFIRMADA']
             ).count(),
+            'in_progress': queryset.active().overlapping(
+                timezone.now(), timezone.now()
+            ).count(),
             'past_7_days': queryset.filter(
                 data_hora__gte=timezone.now() - timedelta(days=7),
                 data_hora__lte=timezone.now()
@@ -305,6 +454,7 @@ class AppointmentViewSet(viewsets.ModelViewSet):
         Retornar horários disponíveis para um profissional
         
         GET /api/v1/appointments/available-slots/?professional_id=123&date=2024-01-15
+        GET /api/v1/appointments/available-slots/?professional_id=123&date=2024-01-15&duration=60
         """
         professional_id = request.query_params.get('professional_id')
         date_str = request.query_params.get('date')
@@ -323,39 +473,248 @@ class AppointmentViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Buscar consultas já agendadas neste dia
-        existing_appointments = Appointment.objects.filter(
-            professional_id=professional_id,
-            data_hora__date=target_date,
-            status__in=['AGENDADA', 'CONFIRMADA']
-        ).values_list('data_hora', 'duracao_minutos')
-        
-        # Gerar slots disponíveis (8h às 18h, intervalos de 30min)
-        slots = []
-        current_time = datetime.combine(target_date, time(8, 0))
-        end_time = datetime.combine(target_date, time(18, 0))
-        
-        while current_time < end_time:
-            # Verificar se slot está livre
-            is_available = True
-            for appt_time, duration in existing_appointments:
-                appt_end = appt_time + timedelta(minutes=duration)
-                slot_end = current_time + timedelta(minutes=30)
-                
-                # Verificar sobreposição
-                if (current_time < appt_end and slot_end > appt_time):
-                    is_available = False
-                    break
-            
-            slots.append({
-                'time': current_time.strftime('%H:%M'),
-                'available': is_available
-            })
-            
-            current_time += timedelta(minutes=30)
+        duration = self._parse_duration(request)
+        if duration is None:
+            return Response(
+                {'error': 'duration deve ser um múltiplo de 15 entre 15 e 240'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            professional_id = int(professional_id)
+        except ValueError:
+            return Response(
+                {'error': 'professional_id inválido'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # Carregar expediente e ocupação do dia (inclui consultas iniciadas
+        # no dia anterior que ainda invadem este dia)
+        schedules, occupancies = load_availability([professional_id], target_date, target_date)
+        tz = schedules[professional_id].tz
+        
+        # Gerar slots do expediente do profissional (padrão: 8h às 18h, de 30 em 30min)
+        slots = [
+            {'time': timezone.localtime(start, tz).strftime('%H:%M'), 'available': is_available}
+            for start, is_available in day_slots(
+                schedules, occupancies, professional_id, target_date, duration
+            )
+        ]
         
         return Response({
             'date': date_str,
             'professional_id': professional_id,
+            'timezone': schedules[professional_id].tz_name,
+            'duration': duration,
             'slots': slots
         })
+    
+    @action(detail=False, methods=['get'])
+    def available_slots_range(self, request):
+        """
+        Retornar horários disponíveis de um profissional em vários dias
+        
+        GET /api/v1/appointments/available_slots_range/?professional_id=123&start=2024-01-15&end=2024-01-31
+        GET /api/v1/appointments/available_slots_range/?professional_id=123&start=2024-01-15&end=2024-01-31&duration=60
+        
+        Todas as consultas do período são carregadas com uma única consulta ao
+        banco. Cada dia lista apenas os horários livres do expediente do
+        profissional, no fuso do expediente.
+        """
+        professional_id = request.query_params.get('professional_id')
+        start_str = request.query_params.get('start')
+        end_str = request.query_params.get('end')
+        
+        if not professional_id or not start_str or not end_str:
+            return Response(
+                {'error': 'professional_id, start e end são obrigatórios'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            professional_id = int(professional_id)
+        except ValueError:
+            return Response(
+                {'error': 'professional_id inválido'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            start_date = datetime.strptime(start_str, '%Y-%m-%d').date()
+            end_date = datetime.strptime(end_str, '%Y-%m-%d').date()
+        except ValueError:
+            return Response(
+                {'error': 'Formato de data inválido. Use YYYY-MM-DD'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if end_date < start_date:
+            return Response(
+                {'error': 'end deve ser maior ou igual a start'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if (end_date - start_date).days + 1 > MAX_DIAS_INTERVALO:
+            return Response(
+                {'error': f'Intervalo máximo de {MAX_DIAS_INTERVALO} dias'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        duration = self._parse_duration(request)
+        if duration is None:
+            return Response(
+                {'error': 'duration deve ser um múltiplo de 15 entre 15 e 240'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        schedules, occupancies = load_availability([professional_id], start_date, end_date)
+        tz = schedules[professional_id].tz
+        
+        days = []
+        for day in iter_days(start_date, end_date):
+            days.append({
+                'date': day.isoformat(),
+                'available': [
+                    timezone.localtime(start, tz).strftime('%H:%M')
+                    for start, is_available in day_slots(
+                        schedules, occupancies, professional_id, day, duration
+                    )
+                    if is_available
+                ],
+            })
+        
+        return Response({
+            'professional_id': professional_id,
+            'timezone': schedules[professional_id].tz_name,
+            'start': start_date.isoformat(),
+            'end': end_date.isoformat(),
+            'duration': duration,
+            'days': days
+        })
+    
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminUser])
+    def availability_cache(self, request):
+        """
+        Contadores de hit/miss do cache de disponibilidade
+        
+        GET /api/v1/appointments/availability_cache/
+        """
+        return Response(cache_stats())
+    
+    @action(detail=False, methods=['get', 'post'], permission_classes=[IsAdminUser])
+    def overbooking(self, request):
+        """
+        Auditoria de consultas ativas sobrepostas
+        
+        GET  /api/v1/appointments/overbooking/?professional_id=1  # relatório
+        POST /api/v1/appointments/overbooking/                    # cancela os conflitos
+        """
+        professional_id = request.query_params.get('professional_id')
+        if professional_id is not None and not professional_id.isdigit():
+            return Response(
+                {'error': 'professional_id deve ser um número inteiro'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        professional_id = int(professional_id) if professional_id else None
+        
+        if request.method == 'POST':
+            overlaps = cancel_overlaps(professional_id)
+        else:
+            overlaps = find_overlaps(professional_id)
+        
+        return Response({
+            'fixed': request.method == 'POST',
+            'count': len(overlaps),
+            'overlaps': [
+                {
+                    'professional_id': overlap.professional_id,
+                    'appointment_id': overlap.appointment_id,
+                    'data_hora': overlap.data_hora,
+                    'conflita_com': overlap.conflita_com,
+                    'conflita_ate': overlap.conflita_ate,
+                }
+                for overlap in overlaps
+            ],
+        })
+    
+    @staticmethod
+    def _parse_duration(request):
+        """Lê ?duration= (minutos); retorna None se inválido"""
+        return parse_duration(request.query_params.get('duration'))
+
+
+class SlotHoldViewSet(
+    mixins.CreateModelMixin,
+    mixins.RetrieveModelMixin,
+    mixins.DestroyModelMixin,
+    viewsets.GenericViewSet
+):
+    """
+    Reservas temporárias de horário (agendamento em duas etapas)
+    
+    - POST /api/v1/holds/ - Reserva um horário por SLOT_HOLD_TTL_SECONDS
+    - GET /api/v1/holds/{id}/ - Detalha a reserva
+    - DELETE /api/v1/holds/{id}/ - Libera a reserva
+    - POST /api/v1/holds/{id}/book/ - Converte a reserva em consulta
+    
+    Cada usuário só enxerga as próprias reservas vigentes.
+    """
+    
+    serializer_class = SlotHoldSerializer
+    permission_classes = [IsAuthenticated]
+    
+    # Dados do paciente aceitos na conversão
+    CAMPOS_PACIENTE = ('paciente_nome', 'paciente_email', 'paciente_telefone', 'observacoes')
+    
+    def get_queryset(self):
+        return SlotHold.objects.active().filter(usuario=self.request.user)
+    
+    def perform_create(self, serializer):
+        hold = serializer.save(usuario=self.request.user)
+        logger.info(
+            f"Reserva criada: ID={hold.id}, Profissional={hold.professional_id}, "
+            f"Data={hold.data_hora}, Expira={hold.expira_em}"
+        )
+    
+    @action(detail=True, methods=['post'])
+    def book(self, request, pk=None):
+        """
+        Converter a reserva em consulta
+        
+        POST /api/v1/holds/{id}/book/
+        {
+            "paciente_nome": "...",
+            "paciente_email": "...",
+            "paciente_telefone": "..."
+        }
+        """
+        hold = self.get_object()
+        
+        data = {field: request.data[field] for field in self.CAMPOS_PACIENTE if field in request.data}
+        data.update({
+            'professional': hold.professional_id,
+            'data_hora': hold.data_hora,
+            'duracao_minutos': hold.duracao_minutos,
+        })
+        serializer = AppointmentCreateSerializer(
+            data=data,
+            context={**self.get_serializer_context(), 'hold_id': hold.pk}
+        )
+        serializer.is_valid(raise_exception=True)
+        
+        with transaction.atomic():
+            # Consome a reserva; falha se expirou ou já foi convertida
+            deleted, _ = SlotHold.objects.active().filter(pk=hold.pk).delete()
+            if not deleted:
+                return Response(
+                    {'error': 'Reserva expirada'},
+                    status=status.HTTP_410_GONE
+                )
+            appointment = serializer.save()
+        
+        logger.info(f"Reserva convertida: ID={hold.id} -> Consulta ID={appointment.id}")
+        
+        return Response(
+            AppointmentSerializer(appointment, context=self.get_serializer_context()).data,
+            status=status.HTTP_201_CREATED
+        )
@@ -39,6 +39,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     
     # Third party
     'rest_framework',
@@ -173,6 +174,39 @@ REST_FRAMEWORK = {
     }
 }
 
+# Cache padrão (por processo) e cache das agendas (ver core/cache.py): o de
+# agendas é invalidado a cada escrita e por isso só fica ligado com um
+# backend compartilhado entre os workers (Redis, requer o pacote ``redis``)
+REDIS_URL = config('REDIS_URL', default='')
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'agenda': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+        'KEY_PREFIX': 'agenda',
+    } if REDIS_URL else {
+        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+    },
+}
+
+# Cache de disponibilidade de agendas (segundos)
+AVAILABILITY_CACHE_TIMEOUT = config('AVAILABILITY_CACHE_TIMEOUT', default=300, cast=int)
+
+# Horizonte máximo (dias) da busca do próximo horário livre
+NEXT_AVAILABLE_HORIZON_DAYS = config('NEXT_AVAILABLE_HORIZON_DAYS', default=90, cast=int)
+
+# Validade (segundos) das reservas temporárias de horário
+SLOT_HOLD_TTL_SECONDS = config('SLOT_HOLD_TTL_SECONDS', default=300, cast=int)
+
+# Reservas temporárias vigentes permitidas por usuário
+SLOT_HOLD_MAX_ACTIVE_PER_USER = config('SLOT_HOLD_MAX_ACTIVE_PER_USER', default=2, cast=int)
+
+# Acima desta estimativa de linhas a paginação usa o estimador do PostgreSQL
+# em vez de COUNT(*)
+PAGINATION_EXACT_COUNT_THRESHOLD = config('PAGINATION_EXACT_COUNT_THRESHOLD', default=10000, cast=int)
+
 # JWT Configuration
 from datetime import timedelta
 
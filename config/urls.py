@@ -24,12 +24,13 @@ from rest_framework_simplejwt.views import (
     TokenVerifyView,
 )
 from professionals.views import ProfessionalViewSet
-from appointments.views import AppointmentViewSet
+from appointments.views import AppointmentViewSet, SlotHoldViewSet
 from core.views import health_check
 
 router = DefaultRouter()
 router.register('professionals', ProfessionalViewSet)
 router.register('appointments', AppointmentViewSet)
+router.register('holds', SlotHoldViewSet, basename='hold')
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -0,0 +1,22 @@
+"""
+Cache das agendas (disponibilidade diária e expedientes compilados).
+
+As entradas são invalidadas a cada escrita, então o backend precisa ser
+compartilhado entre os workers do gunicorn: ``CACHES['agenda']`` aponta para
+o Redis quando ``REDIS_URL`` está definido e, sem ele, é um ``DummyCache``
+(cache desligado). Um cache em memória por processo serviria dados antigos
+nos workers que não atenderam a escrita.
+"""
+
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.utils.connection import ConnectionProxy
+
+AGENDA_CACHE_ALIAS = 'agenda'
+
+agenda_cache = ConnectionProxy(caches, AGENDA_CACHE_ALIAS)
+
+
+def agenda_cache_enabled():
+    """False quando o cache de agendas está desligado (sem backend compartilhado)"""
+    return not isinstance(caches[AGENDA_CACHE_ALIAS], DummyCache)
@@ -0,0 +1,116 @@
+"""
+Serialização de listagens direto de ``.values()``.
+
+``compile_values_serializer`` transforma um serializer de campos planos numa
+lista de conversores pré-calculados (display de choices, ``to_representation``
+dos campos) aplicados aos dicts de ``queryset.values()``: sem construir
+instâncias do modelo e sem o ``get_attribute`` campo a campo do DRF. A saída
+é a mesma do serializer original.
+
+Campos sem coluna correspondente (``SerializerMethodField``, propriedades,
+serializers aninhados) tornam o serializer não compilável; nesse caso a view
+segue pelo caminho normal.
+"""
+
+from django.utils.encoding import force_str
+from rest_framework import serializers
+from rest_framework.response import Response
+
+from .fieldsets import DISPLAY_METHOD, column_path
+
+
+def _skip_none(convert):
+    # Como no Serializer.to_representation: None não passa pelo campo
+    return lambda value: None if value is None else convert(value)
+
+
+def _display_converter(model, path, field):
+    """Conversor de ``get_<campo>_display`` sobre o valor bruto da coluna"""
+    model_field = model._meta.get_field(path.split('__')[0])
+    for part in path.split('__')[1:]:
+        model_field = model_field.related_model._meta.get_field(part)
+    # Traduções resolvidas na compilação (idioma ativo da requisição)
+    choices = {key: force_str(label, strings_only=True) for key, label in model_field.flatchoices}
+    convert = _skip_none(field.to_representation)
+    return lambda value: convert(choices.get(value, value))
+
+
+def compile_field(model, field):
+    """``(coluna, conversor)`` de um campo, ou None se não for compilável"""
+    if isinstance(field, (serializers.SerializerMethodField, serializers.BaseSerializer)):
+        return None
+    if isinstance(field, serializers.ManyRelatedField):
+        return None
+
+    path = column_path(model, field.source)
+    if path is None:
+        return None
+
+    if DISPLAY_METHOD.fullmatch(field.source.split('.')[-1]):
+        return path, _display_converter(model, path, field)
+    if isinstance(field, serializers.PrimaryKeyRelatedField):
+        # values() já traz o id da chave estrangeira
+        if field.pk_field is not None:
+            return path, _skip_none(field.pk_field.to_representation)
+        return path, lambda value: value
+    if isinstance(field, serializers.RelatedField):
+        return None
+    return path, _skip_none(field.to_representation)
+
+
+class ValuesSerializer:
+    """Serializer compilado: ``columns`` para ``.values()`` e ``to_representation`` por linha"""
+
+    def __init__(self, compiled):
+        self.compiled = compiled
+        self.columns = list(dict.fromkeys(column for _, column, _ in compiled))
+
+    def values(self, queryset, extra_columns=()):
+        """Queryset de dicts com as colunas dos campos (mais ``extra_columns``)"""
+        return queryset.values(*dict.fromkeys([*self.columns, *extra_columns]))
+
+    def to_representation(self, row):
+        return {name: convert(row[column]) for name, column, convert in self.compiled}
+
+    def many(self, rows):
+        return [self.to_representation(row) for row in rows]
+
+
+def compile_values_serializer(serializer):
+    """``ValuesSerializer`` equivalente a ``serializer`` (já com contexto), ou None"""
+    model = serializer.Meta.model
+    compiled = []
+    for field in serializer._readable_fields:
+        result = compile_field(model, field)
+        if result is None:
+            return None
+        column, convert = result
+        compiled.append((field.field_name, column, convert))
+    return ValuesSerializer(compiled)
+
+
+class ValuesListMixin:
+    """
+    Para ViewSets: a ação ``list`` usa o serializer compilado quando possível.
+
+    ``values_extra_columns`` são colunas lidas além das dos campos (ex.: as
+    chaves da paginação por cursor).
+    """
+
+    values_extra_columns = ()
+
+    def get_values_serializer(self):
+        return compile_values_serializer(self.get_serializer())
+
+    def list(self, request, *args, **kwargs):
+        values_serializer = self.get_values_serializer()
+        if values_serializer is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = values_serializer.values(
+            self.filter_queryset(self.get_queryset()), self.values_extra_columns
+        )
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(values_serializer.many(page))
+        return Response(values_serializer.many(queryset))
@@ -0,0 +1,226 @@
+"""
+Sparse fieldsets: ``?fields=a,b`` e ``?omit=c`` nas respostas de leitura.
+
+O serializer (``SparseFieldsetSerializerMixin``) remove os campos não pedidos
+e sabe quais colunas do modelo cada campo lê; a view
+(``SparseFieldsetViewMixin``) valida os nomes, repassa a seleção no contexto
+e aplica ``.only()`` no queryset, de modo que colunas não usadas (ex.:
+``observacoes``) nem são buscadas.
+
+Relações aninhadas declaradas em ``expandable_fields`` só aparecem com
+``?expand=<nome>`` e são serializadas uma vez por resposta
+(``MemoizedNestedField``), não uma vez por registro.
+"""
+
+import re
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS
+
+FIELDS_PARAM = 'fields'
+OMIT_PARAM = 'omit'
+EXPAND_PARAM = 'expand'
+
+DISPLAY_METHOD = re.compile(r'get_(\w+)_display')
+
+
+def parse_field_list(value):
+    """'a, b,,c' -> ['a', 'b', 'c']"""
+    return [name.strip() for name in (value or '').split(',') if name.strip()]
+
+
+def column_path(model, source):
+    """
+    Caminho ``a__b`` para ``.only()`` a partir do ``source`` de um campo.
+
+    Entende ``get_<campo>_display`` e relações para um; retorna None quando
+    o source não corresponde a colunas (``*``, propriedades, reversas).
+    """
+    path = []
+    for part in source.split('.'):
+        if model is None or part == '*':
+            return None
+        try:
+            field = model._meta.get_field(part)
+        except FieldDoesNotExist:
+            match = DISPLAY_METHOD.fullmatch(part)
+            if not match:
+                return None
+            try:
+                field = model._meta.get_field(match.group(1))
+            except FieldDoesNotExist:
+                return None
+        if field.many_to_many or field.one_to_many:
+            return None
+        path.append(field.name)
+        model = field.related_model if field.is_relation else None
+    return '__'.join(path)
+
+
+class MemoizedNestedField(serializers.Field):
+    """
+    Relação aninhada serializada uma vez por resposta.
+
+    A representação de cada objeto relacionado fica em
+    ``context['expanded']`` e é reaproveitada pelos demais registros (e
+    pelos demais blocos de um streaming, que compartilham o contexto).
+    """
+
+    def __init__(self, serializer, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+        self.serializer = serializer
+
+    def bind(self, field_name, parent):
+        super().bind(field_name, parent)
+        self.serializer.bind(field_name, self)
+
+    def to_representation(self, value):
+        cache = self.context.setdefault('expanded', {})
+        key = (type(self.serializer), value.pk)
+        if key not in cache:
+            cache[key] = self.serializer.to_representation(value)
+        return cache[key]
+
+
+class SparseFieldsetSerializerMixin:
+    """
+    Mixin de ModelSerializer para sparse fieldsets.
+
+    ``field_columns`` declara as colunas lidas por campos calculados
+    (``SerializerMethodField`` e afins), que não têm ``source`` mapeável.
+    ``expandable_fields`` mapeia o nome aceito em ``?expand=`` para o campo
+    que ele inclui na resposta.
+    """
+
+    field_columns = {}
+    expandable_fields = {}
+
+    def get_fields(self):
+        fields = super().get_fields()
+        # Só o serializer raiz é podado; aninhados seguem completos
+        if not self._is_sparse_root():
+            return fields
+
+        expanded = self.context.get('expand', ())
+        hidden = {
+            field_name for name, field_name in self.expandable_fields.items() if name not in expanded
+        }
+        selected = self.context.get('sparse_fields')
+        return {
+            name: field for name, field in fields.items()
+            if name not in hidden and (selected is None or name in selected)
+        }
+
+    def _is_sparse_root(self):
+        parent = self.parent
+        return parent is None or (isinstance(parent, serializers.ListSerializer) and parent.parent is None)
+
+    @classmethod
+    def columns_for(cls, names=None):
+        """
+        Colunas (para ``.only()``) dos campos ``names`` (padrão: todos); None
+        se alguma for desconhecida.
+
+        Relações aninhadas entram com as colunas do serializer delas
+        (``professional__nome_social``); a chave estrangeira sozinha
+        (``professional``) não exige JOIN.
+        """
+        fields = cls(context={'expand': cls.expandable_fields}).fields
+        model = cls.Meta.model
+        columns = set()
+        for name in (fields if names is None else names):
+            if name in cls.field_columns:
+                columns.update(cls.field_columns[name])
+                continue
+            path = column_path(model, fields[name].source)
+            if path is None:
+                return None
+            nested = getattr(fields[name], 'serializer', fields[name])
+            if not isinstance(nested, serializers.BaseSerializer):
+                columns.add(path)
+                continue
+            nested_columns = (
+                nested.columns_for() if isinstance(nested, SparseFieldsetSerializerMixin) else None
+            )
+            if nested_columns is None:
+                return None
+            columns.update(f'{path}__{column}' for column in nested_columns)
+        return columns
+
+
+class SparseFieldsetViewMixin:
+    """Mixin de ViewSet: lê ``?fields=``/``?omit=``/``?expand=`` e aplica ``.only()``"""
+
+    def get_expand(self):
+        """Relações pedidas em ``?expand=``, validadas contra o serializer"""
+        if not hasattr(self, '_expand'):
+            serializer_class = self.get_serializer_class()
+            query_params = getattr(self.request, 'query_params', {})
+            requested = parse_field_list(query_params.get(EXPAND_PARAM))
+            expandable = getattr(serializer_class, 'expandable_fields', {})
+            unknown = [name for name in requested if name not in expandable]
+            if unknown:
+                raise ValidationError({EXPAND_PARAM: f"Relações desconhecidas: {', '.join(unknown)}"})
+            self._expand = set(requested)
+        return self._expand
+
+    def get_sparse_fields(self):
+        """
+        Campos a serializar nesta requisição, ou None sem suporte.
+
+        Só em leituras e com serializer que use SparseFieldsetSerializerMixin;
+        sem ``?fields=``/``?omit=`` são todos os campos do serializer.
+        """
+        if not hasattr(self, '_sparse_fields'):
+            self._sparse_fields = self._resolve_sparse_fields()
+        return self._sparse_fields
+
+    def _resolve_sparse_fields(self):
+        serializer_class = self.get_serializer_class()
+        if self.request.method not in SAFE_METHODS or not issubclass(
+            serializer_class, SparseFieldsetSerializerMixin
+        ):
+            return None
+
+        requested = parse_field_list(self.request.query_params.get(FIELDS_PARAM))
+        omitted = parse_field_list(self.request.query_params.get(OMIT_PARAM))
+        available = list(serializer_class(context={'expand': self.get_expand()}).fields)
+        unknown = [name for name in requested + omitted if name not in available]
+        if unknown:
+            raise ValidationError({FIELDS_PARAM: f"Campos desconhecidos: {', '.join(unknown)}"})
+
+        return [name for name in (requested or available) if name not in omitted]
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['expand'] = self.get_expand()
+        query_params = getattr(self.request, 'query_params', {})
+        if FIELDS_PARAM in query_params or OMIT_PARAM in query_params:
+            context['sparse_fields'] = self.get_sparse_fields()
+        return context
+
+    def get_queryset(self):
+        return self.sparse_queryset(super().get_queryset())
+
+    def sparse_queryset(self, queryset):
+        """Restringe o queryset às colunas dos campos serializados"""
+        selected = self.get_sparse_fields()
+        if selected is None:
+            return queryset
+        columns = self.get_serializer_class().columns_for(selected)
+        if columns is None:
+            return queryset
+
+        # select_related só para as relações ainda usadas (com a FK carregada)
+        if isinstance(queryset.query.select_related, dict):
+            joined = set(queryset.query.select_related)
+            needed = {column.split('__')[0] for column in columns if '__' in column} & joined
+            columns |= needed
+            queryset = queryset.select_related(None)
+            if needed:
+                queryset = queryset.select_related(*needed)
+
+        return queryset.only(*columns)
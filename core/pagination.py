@@ -0,0 +1,328 @@
+"""
+Paginação compartilhada pelas listagens da API.
+
+``HybridPagination`` mantém o modo por número de página (``?page=``) como
+padrão e oferece paginação por cursor (keyset) em ``?cursor=`` ou
+``?pagination=cursor``. No modo cursor a posição é o par
+``(campo de ordenação, id)``: cada página é um ``WHERE`` sobre o índice em
+vez de um ``OFFSET``, e inserções não deslocam as páginas seguintes.
+
+No modo por página o ``count`` vem da estimativa do planner do PostgreSQL
+quando ela passa de ``PAGINATION_EXACT_COUNT_THRESHOLD``; abaixo disso é um
+``COUNT(*)`` exato. A resposta indica qual dos dois em ``count_is_exact``.
+"""
+
+import json
+from base64 import b64decode, b64encode
+from binascii import Error as BinasciiError
+from collections import OrderedDict
+from urllib import parse
+
+from django.conf import settings
+from django.core.exceptions import EmptyResultSet
+from django.core.paginator import EmptyPage, Page, PageNotAnInteger, Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class BoundedPageNumberPagination(PageNumberPagination):
+    """PageNumberPagination com ``?page_size=`` limitado"""
+
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+def estimate_count(queryset):
+    """Linhas estimadas pelo planner (EXPLAIN), ou None fora do PostgreSQL"""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    try:
+        sql, params = queryset.order_by().query.sql_with_params()
+    except EmptyResultSet:
+        # .none() ou filtro sem resultado possível: não há SQL para explicar
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class EstimatedPage(Page):
+    """Página cujo ``has_next`` vem da leitura de uma linha extra"""
+
+    def __init__(self, object_list, number, paginator, has_next):
+        super().__init__(object_list, number, paginator)
+        self._has_next = has_next
+
+    def has_next(self):
+        return self._has_next
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator com ``count`` exato só abaixo do limite configurado.
+
+    Com contagem estimada o número de páginas é aproximado: as páginas não
+    são limitadas por ``num_pages`` e ``has_next`` é decidido lendo uma linha
+    a mais, não pela contagem.
+    """
+
+    @cached_property
+    def _count(self):
+        """``(count, exato)``"""
+        estimate = estimate_count(self.object_list) if hasattr(self.object_list, 'query') else None
+        if estimate is None or estimate < settings.PAGINATION_EXACT_COUNT_THRESHOLD:
+            return super().count, True
+        return estimate, False
+
+    @property
+    def count(self):
+        return self._count[0]
+
+    @property
+    def count_is_exact(self):
+        return self._count[1]
+
+    def validate_number(self, number):
+        if self.count_is_exact:
+            return super().validate_number(number)
+        # Com estimativa só o formato é validado; o fim real é descoberto na leitura
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger(self.error_messages['invalid_page'])
+        if number < 1:
+            raise EmptyPage(self.error_messages['min_page'])
+        return number
+
+    def page(self, number):
+        number = self.validate_number(number)
+        if self.count_is_exact:
+            return super().page(number)
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not rows and number > 1:
+            raise EmptyPage(self.error_messages['no_results'])
+        return EstimatedPage(rows[:self.per_page], number, self, has_next=len(rows) > self.per_page)
+
+
+class EstimatedCountPagination(BoundedPageNumberPagination):
+    """Por página, com ``count`` estimado em listagens grandes e ``count_is_exact``"""
+
+    django_paginator_class = EstimatedCountPaginator
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('count', self.page.paginator.count),
+            ('count_is_exact', self.page.paginator.count_is_exact),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties']['count_is_exact'] = {'type': 'boolean'}
+        return response_schema
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginação por cursor sobre ``(ordering_field, id)``.
+
+    A direção vem da ordenação do queryset (``campo`` ou ``-campo``); o id
+    desempata registros com o mesmo valor. O cursor é opaco para o cliente
+    (base64 de ``p=<valor>&i=<id>&r=<0|1>``).
+    """
+
+    ordering_field = 'data_hora'
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    page_size = 20
+    max_page_size = 100
+    invalid_cursor_message = 'Cursor inválido'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.descending = self._is_descending(queryset)
+
+        position, reverse = self.decode_cursor(request)
+        order = self._order_by(reverse)
+        queryset = queryset.order_by(*order)
+        if position is not None:
+            queryset = queryset.filter(self._after(position, reverse))
+
+        # Um registro a mais indica se existe página seguinte
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+
+        if reverse:
+            self.has_next = position is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+
+        self.first = self._position(results[0]) if results else None
+        self.last = self._position(results[-1]) if results else None
+        # Página vazia ao voltar: o próximo link parte da posição recebida
+        if not results and position is not None:
+            self.first = self.last = position
+        return results
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('page_size', self.page_size),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'page_size': {'type': 'integer'},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def get_next_link(self):
+        if not self.has_next or self.last is None:
+            return None
+        return self.encode_cursor(self.last, reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or self.first is None:
+            return None
+        return self.encode_cursor(self.first, reverse=True)
+
+    def decode_cursor(self, request):
+        """Retorna ``((valor, id), reverse)`` ou ``(None, False)`` na primeira página"""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            tokens = parse.parse_qs(b64decode(encoded.encode('ascii')).decode('ascii'), strict_parsing=True)
+            value = parse_datetime(tokens['p'][0])
+            pk = int(tokens['i'][0])
+            reverse = tokens.get('r', ['0'])[0] == '1'
+        except (BinasciiError, KeyError, TypeError, ValueError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if value is None:
+            raise NotFound(self.invalid_cursor_message)
+        return (value, pk), reverse
+
+    def encode_cursor(self, position, reverse):
+        value, pk = position
+        tokens = {'p': value.isoformat(), 'i': pk}
+        if reverse:
+            tokens['r'] = '1'
+        encoded = b64encode(parse.urlencode(tokens).encode('ascii')).decode('ascii')
+        url = remove_query_param(self.base_url, 'page')
+        return replace_query_param(url, self.cursor_query_param, encoded)
+
+    def _is_descending(self, queryset):
+        """Direção da ordenação atual; só ``ordering_field`` é aceito como chave"""
+        ordering = queryset.query.order_by or queryset.model._meta.ordering
+        first = ordering[0] if ordering else self.ordering_field
+        if not isinstance(first, str) or first.lstrip('-') != self.ordering_field:
+            raise ValidationError({
+                'ordering': f'A paginação por cursor só suporta ordenação por {self.ordering_field}'
+            })
+        return first.startswith('-')
+
+    def _order_by(self, reverse):
+        descending = self.descending != reverse
+        prefix = '-' if descending else ''
+        return (f'{prefix}{self.ordering_field}', f'{prefix}id')
+
+    def _after(self, position, reverse):
+        """Registros estritamente depois de ``position`` na direção de leitura"""
+        value, pk = position
+        op = 'lt' if self.descending != reverse else 'gt'
+        # O filtro por campo <=/>= delimita o intervalo do índice; o OR desempata
+        return Q(**{f'{self.ordering_field}__{op}e': value}) & (
+            Q(**{f'{self.ordering_field}__{op}': value}) | Q(**{f'id__{op}': pk})
+        )
+
+    def _position(self, instance):
+        # Instância do modelo ou linha de .values() (ver core.fastpath)
+        if isinstance(instance, dict):
+            return instance[self.ordering_field], instance['id']
+        return getattr(instance, self.ordering_field), instance.pk
+
+
+class HybridPagination(BasePagination):
+    """
+    Número de página por padrão; cursor quando o cliente pede.
+
+    ``?cursor=...`` ou ``?pagination=cursor`` ativam o modo cursor. Os dois
+    modos aceitam ``?page_size=`` (limitado a ``max_page_size``); o modo por
+    página usa contagem estimada em listagens grandes.
+    """
+
+    mode_query_param = 'pagination'
+    page_number_class = EstimatedCountPagination
+    cursor_class = KeysetPagination
+
+    def __init__(self):
+        self.page_number = self.page_number_class()
+        self.cursor = self.cursor_class()
+        self.active = self.page_number
+
+    @classmethod
+    def uses_cursor(cls, request):
+        return (
+            cls.cursor_class.cursor_query_param in request.query_params
+            or request.query_params.get(cls.mode_query_param) == 'cursor'
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.active = self.cursor if self.uses_cursor(request) else self.page_number
+        return self.active.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.active.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        return self.page_number.get_paginated_response_schema(schema)
+
+    def get_schema_operation_parameters(self, view):
+        return self.page_number.get_schema_operation_parameters(view)
+
+    @property
+    def display_page_controls(self):
+        return getattr(self.active, 'display_page_controls', False)
+
+    def get_results(self, data):
+        return data['results']
+
+    def to_html(self):
+        return self.active.to_html()
@@ -0,0 +1,77 @@
+"""
+Listagens completas em JSON com memória limitada.
+
+Em vez de serializar o queryset inteiro numa lista, ``stream_json_list``
+lê em blocos com ``queryset.iterator(chunk_size=...)`` e emite o array JSON
+bloco a bloco; só um bloco de instâncias fica em memória por vez.
+"""
+
+import json
+
+from django.http import StreamingHttpResponse
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+# Registros lidos e serializados por bloco
+STREAM_CHUNK_SIZE = 500
+
+
+def iter_json_list(queryset, serializer_class, context=None, chunk_size=STREAM_CHUNK_SIZE):
+    """Gera os pedaços de um array JSON com os registros serializados"""
+    def serialize(instances):
+        # Mesmo formato do JSONRenderer padrão (compacto, UTF-8)
+        return ','.join(
+            json.dumps(item, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':'))
+            for item in serializer_class(instances, many=True, context=context).data
+        )
+
+    yield '['
+    separator = ''
+    chunk = []
+    for instance in queryset.iterator(chunk_size=chunk_size):
+        chunk.append(instance)
+        if len(chunk) >= chunk_size:
+            yield separator + serialize(chunk)
+            separator = ','
+            chunk = []
+    if chunk:
+        yield separator + serialize(chunk)
+    yield ']'
+
+
+def stream_json_list(queryset, serializer_class, context=None, chunk_size=STREAM_CHUNK_SIZE):
+    """StreamingHttpResponse com o array JSON de ``queryset``"""
+    return StreamingHttpResponse(
+        iter_json_list(queryset, serializer_class, context, chunk_size),
+        content_type='application/json',
+    )
+
+
+class PaginatedOrStreamedMixin:
+    """
+    Para ações de listagem de um ViewSet: paginado por padrão e
+    streaming completo quando o cliente pede ``?all=true``.
+    """
+
+    stream_query_param = 'all'
+    stream_chunk_size = STREAM_CHUNK_SIZE
+
+    def wants_stream(self):
+        return self.request.query_params.get(self.stream_query_param, '').lower() in ('true', '1')
+
+    def paginated_or_streamed(self, queryset):
+        if self.wants_stream():
+            return stream_json_list(
+                queryset,
+                self.get_serializer_class(),
+                self.get_serializer_context(),
+                self.stream_chunk_size,
+            )
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data)
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Professional
+from .models import Professional, ProfessionalSchedule, ScheduleException, ScheduleInterval
 
 @admin.register(Professional)
 class ProfessionalAdmin(admin.ModelAdmin):
@@ -23,3 +23,24 @@ class ProfessionalAdmin(admin.ModelAdmin):
             'fields': ('ativo',)
         }),
     )
+
+
+class ScheduleIntervalInline(admin.TabularInline):
+    model = ScheduleInterval
+    extra = 0
+    ordering = ('dia_semana', 'inicio')
+
+
+class ScheduleExceptionInline(admin.TabularInline):
+    model = ScheduleException
+    extra = 0
+    ordering = ('-data_inicio',)
+
+
+@admin.register(ProfessionalSchedule)
+class ProfessionalScheduleAdmin(admin.ModelAdmin):
+    list_display = ('professional', 'fuso_horario', 'updated_at')
+    search_fields = ('professional__nome_social',)
+    list_select_related = ('professional',)
+    autocomplete_fields = ('professional',)
+    inlines = [ScheduleIntervalInline, ScheduleExceptionInline]
@@ -1,5 +1,13 @@
 from django.apps import AppConfig
+from django.core.signals import request_finished, request_started
 
 
 class ProfessionalsConfig(AppConfig):
     name = "professionals"
+
+    def ready(self):
+        from .schedules import end_request_memo, start_request_memo
+
+        # Expedientes compilados são reaproveitados dentro de cada requisição
+        request_started.connect(start_request_memo, dispatch_uid="schedules_request_memo_start")
+        request_finished.connect(end_request_memo, dispatch_uid="schedules_request_memo_end")
@@ -0,0 +1,79 @@
+"""
+Busca textual de profissionais.
+
+``?search=`` consulta o ``search_vector`` (tsvector mantido por trigger, com
+índice GIN) usando a configuração ``pt_unaccent``: "Jose" encontra "José" e
+o último termo casa por prefixo ("ana sil" encontra "Ana Silva"). Sem
+``?ordering=`` explícito os resultados vêm por relevância.
+
+O tsvector só casa palavras inteiras ou prefixos; trechos do meio de
+``email`` e ``registro_profissional`` ("123" em "CRM-SP-123456") continuam
+encontrados pelo ILIKE de antes, servido por índices de trigramas (termos
+com 3+ caracteres).
+"""
+
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connections
+from django.db.models import F, Q
+from rest_framework.filters import OrderingFilter, SearchFilter
+
+from .models import Professional
+
+
+# Campos ainda buscados por trecho (ILIKE), como no SearchFilter padrão
+CAMPOS_TRECHO = ('email', 'registro_profissional')
+
+# Abaixo disso o índice de trigramas não é usado
+MIN_TRECHO = 3
+
+
+def substring_condition(terms):
+    """Cada termo (AND) em algum campo de ``CAMPOS_TRECHO``; None se nenhum termo servir"""
+    terms = [term for term in terms if len(term) >= MIN_TRECHO]
+    if not terms:
+        return None
+    condition = Q()
+    for term in terms:
+        term_condition = Q()
+        for field in CAMPOS_TRECHO:
+            term_condition |= Q(**{f'{field}__icontains': term})
+        condition &= term_condition
+    return condition
+
+
+def build_search_query(term):
+    """SearchQuery com todos os termos (AND) e o último por prefixo; None se vazio"""
+    # Mantém e-mails e registros (joao@x.com, CRM-SP-123) inteiros
+    words = re.findall(r'[\w@.\-]+', term)
+    if not words:
+        return None
+    # Operadores do tsquery (& | ! ( ) : * < >) nunca chegam ao modo raw
+    raw = ' & '.join(words[:-1] + [f'{words[-1]}:*'])
+    return SearchQuery(raw, config=Professional.SEARCH_CONFIG, search_type='raw')
+
+
+class ProfessionalSearchFilter(SearchFilter):
+    """SearchFilter sobre o tsvector; fora do PostgreSQL usa o ILIKE padrão"""
+
+    def filter_queryset(self, request, queryset, view):
+        if connections[queryset.db].vendor != 'postgresql':
+            return super().filter_queryset(request, queryset, view)
+
+        terms = self.get_search_terms(request)
+        query = build_search_query(' '.join(terms))
+        if query is None:
+            return queryset
+
+        condition = Q(search_vector=query)
+        substring = substring_condition(terms)
+        if substring is not None:
+            condition |= substring
+
+        queryset = queryset.filter(condition).annotate(
+            search_rank=SearchRank(F('search_vector'), query)
+        )
+        if OrderingFilter.ordering_param in request.query_params:
+            return queryset
+        return queryset.order_by('-search_rank', *queryset.query.order_by)
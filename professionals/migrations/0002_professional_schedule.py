@@ -0,0 +1,152 @@
+# Generated by Django 6.0 on 2026-10-17 07:44
+
+import django.db.models.deletion
+import professionals.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("professionals", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProfessionalSchedule",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "fuso_horario",
+                    models.CharField(
+                        default="America/Sao_Paulo",
+                        max_length=64,
+                        validators=[professionals.models.validate_fuso_horario],
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "professional",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="schedule",
+                        to="professionals.professional",
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="ScheduleException",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("data_inicio", models.DateField()),
+                ("data_fim", models.DateField()),
+                ("inicio", models.TimeField(blank=True, null=True)),
+                ("fim", models.TimeField(blank=True, null=True)),
+                ("motivo", models.CharField(blank=True, max_length=200)),
+                (
+                    "schedule",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="exceptions",
+                        to="professionals.professionalschedule",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["data_inicio"],
+                "indexes": [
+                    models.Index(
+                        fields=["schedule", "data_fim"],
+                        name="professiona_schedul_75a0f1_idx",
+                    )
+                ],
+                "constraints": [
+                    models.CheckConstraint(
+                        condition=models.Q(("data_fim__gte", models.F("data_inicio"))),
+                        name="excecao_data_fim_apos_inicio",
+                    ),
+                    models.CheckConstraint(
+                        condition=models.Q(
+                            models.Q(("fim__isnull", True), ("inicio__isnull", True)),
+                            ("fim__gt", models.F("inicio")),
+                            _connector="OR",
+                        ),
+                        name="excecao_horario_valido",
+                    ),
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="ScheduleInterval",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "dia_semana",
+                    models.PositiveSmallIntegerField(
+                        choices=[
+                            (0, "Segunda-feira"),
+                            (1, "Terça-feira"),
+                            (2, "Quarta-feira"),
+                            (3, "Quinta-feira"),
+                            (4, "Sexta-feira"),
+                            (5, "Sábado"),
+                            (6, "Domingo"),
+                        ]
+                    ),
+                ),
+                ("inicio", models.TimeField()),
+                ("fim", models.TimeField()),
+                (
+                    "tipo",
+                    models.CharField(
+                        choices=[("EXPEDIENTE", "Expediente"), ("PAUSA", "Pausa")],
+                        default="EXPEDIENTE",
+                        max_length=20,
+                    ),
+                ),
+                (
+                    "schedule",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="intervals",
+                        to="professionals.professionalschedule",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["dia_semana", "inicio"],
+                "constraints": [
+                    models.CheckConstraint(
+                        condition=models.Q(("fim__gt", models.F("inicio"))),
+                        name="intervalo_fim_apos_inicio",
+                    )
+                ],
+            },
+        ),
+    ]
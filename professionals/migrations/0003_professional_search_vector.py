@@ -0,0 +1,63 @@
+# Generated by Django 6.0 on 2026-10-17 08:23
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import UnaccentExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("professionals", "0002_professional_schedule"),
+    ]
+
+    operations = [
+        UnaccentExtension(),
+        migrations.RunSQL(
+            """
+            CREATE TEXT SEARCH CONFIGURATION pt_unaccent (COPY = portuguese);
+            ALTER TEXT SEARCH CONFIGURATION pt_unaccent
+                ALTER MAPPING FOR hword, hword_part, word
+                WITH unaccent, portuguese_stem;
+            """,
+            "DROP TEXT SEARCH CONFIGURATION pt_unaccent;",
+        ),
+        migrations.AddField(
+            model_name="professional",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.RunSQL(
+            """
+            CREATE FUNCTION professionals_search_vector_trigger() RETURNS trigger AS $$
+            BEGIN
+                NEW.search_vector :=
+                    setweight(to_tsvector('pt_unaccent', coalesce(NEW.nome_social, '')), 'A')
+                    || setweight(to_tsvector('pt_unaccent', coalesce(NEW.registro_profissional, '')), 'B')
+                    || setweight(to_tsvector('pt_unaccent', coalesce(NEW.email, '')), 'C');
+                RETURN NEW;
+            END
+            $$ LANGUAGE plpgsql;
+
+            CREATE TRIGGER professionals_search_vector_update
+                BEFORE INSERT OR UPDATE OF nome_social, registro_profissional, email
+                ON professionals_professional
+                FOR EACH ROW EXECUTE FUNCTION professionals_search_vector_trigger();
+
+            UPDATE professionals_professional SET nome_social = nome_social;
+            """,
+            """
+            DROP TRIGGER professionals_search_vector_update ON professionals_professional;
+            DROP FUNCTION professionals_search_vector_trigger();
+            """,
+        ),
+        migrations.AddIndex(
+            model_name="professional",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["search_vector"], name="professional_search_gin"
+            ),
+        ),
+    ]
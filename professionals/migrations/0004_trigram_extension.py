@@ -0,0 +1,15 @@
+# Generated by Django 6.0 on 2026-10-17 08:26
+
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("professionals", "0003_professional_search_vector"),
+    ]
+
+    operations = [
+        TrigramExtension(),
+    ]
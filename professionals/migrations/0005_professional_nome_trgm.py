@@ -0,0 +1,28 @@
+# Generated by Django 6.0 on 2026-10-17 08:26
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY não roda dentro de transação
+    atomic = False
+
+    dependencies = [
+        ("professionals", "0004_trigram_extension"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="professional",
+            index=django.contrib.postgres.indexes.GinIndex(
+                django.contrib.postgres.indexes.OpClass(
+                    django.db.models.functions.text.Upper("nome_social"),
+                    name="gin_trgm_ops",
+                ),
+                name="professional_nome_trgm",
+            ),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 6.0 on 2026-10-17 08:30
+
+from django.contrib.postgres.operations import (
+    AddIndexConcurrently,
+    RemoveIndexConcurrently,
+)
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # CREATE/DROP INDEX CONCURRENTLY não roda dentro de transação
+    atomic = False
+
+    dependencies = [
+        ("professionals", "0005_professional_nome_trgm"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="professional",
+            index=models.Index(
+                condition=models.Q(("ativo", True)),
+                fields=["nome_social"],
+                name="professional_ativo_nome_idx",
+            ),
+        ),
+        # Redundantes com os índices das constraints unique
+        RemoveIndexConcurrently(
+            model_name="professional",
+            name="professiona_email_a8dc70_idx",
+        ),
+        RemoveIndexConcurrently(
+            model_name="professional",
+            name="professiona_registr_8c4b46_idx",
+        ),
+    ]
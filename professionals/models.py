@@ -1,4 +1,10 @@
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.db.models.functions import Upper
+from django.core.exceptions import ValidationError
 from django.core.validators import RegexValidator
 
 class Professional(models.Model):
@@ -31,12 +37,188 @@ class Professional(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Mantido por trigger no banco (nome_social, registro_profissional, email)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    # Configuração de busca textual: português sem acentos (migração 0003)
+    SEARCH_CONFIG = 'pt_unaccent'
+
     class Meta:
         ordering = ['nome_social']
         indexes = [
-            models.Index(fields=['email']),
-            models.Index(fields=['registro_profissional']),
+            # Listagem padrão: ativos por nome (email e registro já têm índice único)
+            models.Index(
+                fields=['nome_social'],
+                condition=models.Q(ativo=True),
+                name='professional_ativo_nome_idx'
+            ),
+            GinIndex(fields=['search_vector'], name='professional_search_gin'),
+            # icontains (UPPER(...) LIKE) em professional__nome_social
+            GinIndex(OpClass(Upper('nome_social'), name='gin_trgm_ops'), name='professional_nome_trgm'),
+            # ?search= por trecho de email e registro (ver filters.py)
+            GinIndex(OpClass(Upper('email'), name='gin_trgm_ops'), name='professional_email_trgm'),
+            GinIndex(
+                OpClass(Upper('registro_profissional'), name='gin_trgm_ops'),
+                name='professional_registro_trgm'
+            ),
         ]
     
     def __str__(self):
-        return f"{self.nome_social} - {self.get_profissao_display()} ({self.registro_profissional})"
\ No newline at end of file
+        return f"{self.nome_social} - {self.get_profissao_display()} ({self.registro_profissional})"
+
+
+def validate_fuso_horario(value):
+    """Valida nome de fuso horário IANA (ex.: America/Sao_Paulo)"""
+    try:
+        ZoneInfo(value)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValidationError(f"Fuso horário inválido: {value}")
+
+
+class ProfessionalSchedule(models.Model):
+    """
+    Modelo semanal de expediente de um profissional.
+
+    Profissionais sem modelo seguem o expediente padrão (segunda a sexta,
+    8h às 18h no fuso do servidor). O modelo é compilado em
+    ``professionals.schedules`` e mantido em cache até ser alterado.
+    """
+
+    professional = models.OneToOneField(
+        Professional,
+        on_delete=models.CASCADE,
+        related_name='schedule'
+    )
+    fuso_horario = models.CharField(
+        max_length=64,
+        default='America/Sao_Paulo',
+        validators=[validate_fuso_horario]
+    )
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def save(self, *args, **kwargs):
+        from .schedules import invalidate_compiled_schedule
+
+        super().save(*args, **kwargs)
+        invalidate_compiled_schedule(self.professional_id)
+
+    def delete(self, *args, **kwargs):
+        from .schedules import invalidate_compiled_schedule
+
+        result = super().delete(*args, **kwargs)
+        invalidate_compiled_schedule(self.professional_id)
+        return result
+
+    def __str__(self):
+        return f"Expediente de {self.professional.nome_social} ({self.fuso_horario})"
+
+
+class ScheduleInterval(models.Model):
+    """Intervalo semanal de expediente ou pausa (horário local do profissional)"""
+
+    DIA_SEMANA_CHOICES = [
+        (0, 'Segunda-feira'),
+        (1, 'Terça-feira'),
+        (2, 'Quarta-feira'),
+        (3, 'Quinta-feira'),
+        (4, 'Sexta-feira'),
+        (5, 'Sábado'),
+        (6, 'Domingo'),
+    ]
+    TIPO_CHOICES = [
+        ('EXPEDIENTE', 'Expediente'),
+        ('PAUSA', 'Pausa'),
+    ]
+
+    schedule = models.ForeignKey(
+        ProfessionalSchedule,
+        on_delete=models.CASCADE,
+        related_name='intervals'
+    )
+    dia_semana = models.PositiveSmallIntegerField(choices=DIA_SEMANA_CHOICES)
+    inicio = models.TimeField()
+    fim = models.TimeField()
+    tipo = models.CharField(max_length=20, choices=TIPO_CHOICES, default='EXPEDIENTE')
+
+    class Meta:
+        ordering = ['dia_semana', 'inicio']
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(fim__gt=models.F('inicio')),
+                name='intervalo_fim_apos_inicio'
+            )
+        ]
+
+    def save(self, *args, **kwargs):
+        from .schedules import invalidate_compiled_schedule
+
+        super().save(*args, **kwargs)
+        invalidate_compiled_schedule(self.schedule.professional_id)
+
+    def delete(self, *args, **kwargs):
+        from .schedules import invalidate_compiled_schedule
+
+        result = super().delete(*args, **kwargs)
+        invalidate_compiled_schedule(self.schedule.professional_id)
+        return result
+
+    def __str__(self):
+        return f"{self.get_dia_semana_display()} {self.inicio:%H:%M}-{self.fim:%H:%M} ({self.get_tipo_display()})"
+
+
+class ScheduleException(models.Model):
+    """
+    Exceção de datas (férias, feriados, horário especial).
+
+    Sem ``inicio``/``fim`` o período fica fechado. Com horários, os dias do
+    período passam a abrir apenas nesses horários, substituindo o modelo
+    semanal.
+    """
+
+    schedule = models.ForeignKey(
+        ProfessionalSchedule,
+        on_delete=models.CASCADE,
+        related_name='exceptions'
+    )
+    data_inicio = models.DateField()
+    data_fim = models.DateField()
+    inicio = models.TimeField(null=True, blank=True)
+    fim = models.TimeField(null=True, blank=True)
+    motivo = models.CharField(max_length=200, blank=True)
+
+    class Meta:
+        ordering = ['data_inicio']
+        indexes = [
+            models.Index(fields=['schedule', 'data_fim']),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(data_fim__gte=models.F('data_inicio')),
+                name='excecao_data_fim_apos_inicio'
+            ),
+            models.CheckConstraint(
+                condition=(
+                    models.Q(inicio__isnull=True, fim__isnull=True)
+                    | models.Q(fim__gt=models.F('inicio'))
+                ),
+                name='excecao_horario_valido'
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        from .schedules import invalidate_compiled_schedule
+
+        super().save(*args, **kwargs)
+        invalidate_compiled_schedule(self.schedule.professional_id)
+
+    def delete(self, *args, **kwargs):
+        from .schedules import invalidate_compiled_schedule
+
+        result = super().delete(*args, **kwargs)
+        invalidate_compiled_schedule(self.schedule.professional_id)
+        return result
+
+    def __str__(self):
+        return f"{self.data_inicio:%d/%m/%Y}-{self.data_fim:%d/%m/%Y} {self.motivo}".strip()
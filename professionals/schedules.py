@@ -0,0 +1,276 @@
+"""
+Compilação dos modelos de expediente em conjuntos de intervalos.
+
+As regras de ``ProfessionalSchedule`` (expediente semanal, pausas e exceções
+de datas) são avaliadas uma única vez e compiladas em um
+``CompiledSchedule``: para cada dia da semana uma tupla de intervalos abertos
+em minutos locais, já descontadas as pausas, e um mapa de datas com exceção.
+O resultado fica no cache de agendas por profissional (só com backend
+compartilhado; ver ``core.cache``) e, dentro de uma requisição, também em
+memória, de modo que cada expediente é compilado no máximo uma vez por
+requisição mesmo sem Redis. Ambos são invalidados sempre que o modelo, seus
+intervalos ou suas exceções são salvos/removidos.
+
+Geração de horários e validação de consultas apenas intersectam com esses
+intervalos, sem reavaliar regras a cada slot.
+"""
+
+from datetime import datetime, time, timedelta
+from datetime import timezone as dt_timezone
+from threading import local
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.db.models import Prefetch
+from django.utils import timezone
+
+from core.cache import agenda_cache as cache
+
+from .models import ProfessionalSchedule, ScheduleException
+
+
+CACHE_PREFIX = 'schedule'
+CACHE_TIMEOUT = 60 * 60 * 24
+
+# Expediente padrão para profissionais sem modelo (segunda a sexta, 8h às 18h)
+HORARIO_INICIO = time(8, 0)
+HORARIO_FIM = time(18, 0)
+DIAS_UTEIS = range(0, 5)
+
+
+def _minutes(value):
+    return value.hour * 60 + value.minute
+
+
+def _merge(intervals):
+    """Ordena e une intervalos ``(inicio, fim)`` sobrepostos ou adjacentes."""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _subtract(intervals, cuts):
+    """Remove ``cuts`` de ``intervals`` (ambos em minutos, já unidos)."""
+    result = []
+    for start, end in intervals:
+        pieces = [(start, end)]
+        for cut_start, cut_end in cuts:
+            next_pieces = []
+            for piece_start, piece_end in pieces:
+                if cut_end <= piece_start or cut_start >= piece_end:
+                    next_pieces.append((piece_start, piece_end))
+                    continue
+                if piece_start < cut_start:
+                    next_pieces.append((piece_start, cut_start))
+                if cut_end < piece_end:
+                    next_pieces.append((cut_end, piece_end))
+            pieces = next_pieces
+        result.extend(pieces)
+    return result
+
+
+class CompiledSchedule:
+    """
+    Expediente compilado de um profissional.
+
+    - ``tz_name``: fuso horário IANA do expediente
+    - ``weekly``: 7 tuplas (segunda a domingo) de intervalos abertos em
+      minutos desde a meia-noite local
+    - ``exceptions``: ``{data: intervalos}``; tupla vazia = dia fechado
+    """
+
+    __slots__ = ('tz_name', 'weekly', 'exceptions', '_tz')
+
+    def __init__(self, tz_name, weekly, exceptions=None):
+        self.tz_name = tz_name
+        self.weekly = tuple(tuple(day) for day in weekly)
+        self.exceptions = exceptions or {}
+        self._tz = None
+
+    def __getstate__(self):
+        return self.tz_name, self.weekly, self.exceptions
+
+    def __setstate__(self, state):
+        self.tz_name, self.weekly, self.exceptions = state
+        self._tz = None
+
+    @property
+    def tz(self):
+        if self._tz is None:
+            self._tz = ZoneInfo(self.tz_name)
+        return self._tz
+
+    def windows(self, day):
+        """Intervalos abertos de uma data local, em minutos."""
+        if day in self.exceptions:
+            return self.exceptions[day]
+        return self.weekly[day.weekday()]
+
+    def _at(self, day, minutes):
+        # Hora de parede local convertida para UTC: entre datetimes com o
+        # mesmo ZoneInfo a subtração ignora a mudança de horário de verão
+        local = datetime.combine(day, time.min) + timedelta(minutes=minutes)
+        return local.replace(tzinfo=self.tz).astimezone(dt_timezone.utc)
+
+    def day_start(self, day):
+        """Meia-noite local da data, como datetime aware em UTC."""
+        return self._at(day, 0)
+
+    def local_date(self, value):
+        """Data local de um datetime aware."""
+        return value.astimezone(self.tz).date()
+
+    def open_intervals(self, day):
+        """Intervalos abertos de uma data local, como datetimes aware (UTC)."""
+        return [(self._at(day, start), self._at(day, end)) for start, end in self.windows(day)]
+
+    def slot_starts(self, day, duration_minutes, step_minutes):
+        """
+        Inícios de slots de ``duration_minutes`` que cabem no expediente.
+
+        A grade de cada intervalo começa no seu início e avança de
+        ``step_minutes`` em ``step_minutes``.
+        """
+        starts = []
+        for start, end in self.windows(day):
+            current = start
+            while current + duration_minutes <= end:
+                starts.append(self._at(day, current))
+                current += step_minutes
+        return starts
+
+    def contains(self, start, end):
+        """Verifica se ``[start, end)`` cabe inteiramente em um intervalo aberto."""
+        day = self.local_date(start)
+        return any(
+            open_start <= start and end <= open_end
+            for open_start, open_end in self.open_intervals(day)
+        )
+
+
+def default_schedule():
+    """Expediente padrão (legado): dias úteis, 8h às 18h, fuso do servidor."""
+    window = ((_minutes(HORARIO_INICIO), _minutes(HORARIO_FIM)),)
+    return CompiledSchedule(
+        settings.TIME_ZONE,
+        [window if weekday in DIAS_UTEIS else () for weekday in range(7)],
+    )
+
+
+def compile_schedule(schedule):
+    """Compila um ``ProfessionalSchedule`` (com intervalos e exceções pré-carregados)."""
+    opening = [[] for _ in range(7)]
+    breaks = [[] for _ in range(7)]
+    for interval in schedule.intervals.all():
+        target = opening if interval.tipo == 'EXPEDIENTE' else breaks
+        target[interval.dia_semana].append((_minutes(interval.inicio), _minutes(interval.fim)))
+
+    weekly = [
+        _subtract(_merge(opening[weekday]), _merge(breaks[weekday]))
+        for weekday in range(7)
+    ]
+
+    special = {}
+    closed = set()
+    for exception in schedule.exceptions.all():
+        day = exception.data_inicio
+        while day <= exception.data_fim:
+            if exception.inicio is None:
+                closed.add(day)
+            else:
+                special.setdefault(day, []).append(
+                    (_minutes(exception.inicio), _minutes(exception.fim))
+                )
+            day += timedelta(days=1)
+
+    exceptions = {day: tuple(_merge(windows)) for day, windows in special.items()}
+    exceptions.update({day: () for day in closed})
+
+    return CompiledSchedule(schedule.fuso_horario, weekly, exceptions)
+
+
+# Expedientes compilados na requisição atual; None fora de requisições
+_request_state = local()
+
+
+def start_request_memo(**kwargs):
+    """Receptor de ``request_started``: abre a memória da requisição."""
+    _request_state.schedules = {}
+
+
+def end_request_memo(**kwargs):
+    """Receptor de ``request_finished``: descarta a memória da requisição."""
+    _request_state.schedules = None
+
+
+def _request_memo():
+    return getattr(_request_state, 'schedules', None)
+
+
+def _cache_key(professional_id):
+    return f'{CACHE_PREFIX}:{professional_id}'
+
+
+def invalidate_compiled_schedule(professional_id):
+    """Descarta o expediente compilado de um profissional."""
+    cache.delete(_cache_key(professional_id))
+    memo = _request_memo()
+    if memo is not None:
+        memo.pop(professional_id, None)
+
+
+def get_compiled_schedules(professional_ids):
+    """
+    Expedientes compilados de vários profissionais: ``{professional_id: CompiledSchedule}``.
+
+    Os ausentes do cache são carregados juntos (modelo + intervalos +
+    exceções vigentes) e compilados uma única vez.
+    """
+    professional_ids = list(professional_ids)
+    memo = _request_memo()
+    compiled = {}
+    if memo is not None:
+        compiled = {
+            professional_id: memo[professional_id]
+            for professional_id in professional_ids if professional_id in memo
+        }
+    keys = {
+        _cache_key(professional_id): professional_id
+        for professional_id in professional_ids if professional_id not in compiled
+    }
+    if keys:
+        cached = cache.get_many(keys.keys())
+        compiled.update({keys[key]: schedule for key, schedule in cached.items()})
+
+    missing = [professional_id for professional_id in professional_ids if professional_id not in compiled]
+    if missing:
+        yesterday = timezone.localdate() - timedelta(days=1)
+        schedules = ProfessionalSchedule.objects.filter(
+            professional_id__in=missing
+        ).prefetch_related(
+            'intervals',
+            Prefetch(
+                'exceptions',
+                queryset=ScheduleException.objects.filter(data_fim__gte=yesterday)
+            ),
+        )
+        loaded = {schedule.professional_id: compile_schedule(schedule) for schedule in schedules}
+
+        to_cache = {}
+        for professional_id in missing:
+            compiled[professional_id] = loaded.get(professional_id) or default_schedule()
+            to_cache[_cache_key(professional_id)] = compiled[professional_id]
+        cache.set_many(to_cache, timeout=CACHE_TIMEOUT)
+
+    if memo is not None:
+        memo.update(compiled)
+    return compiled
+
+
+def get_compiled_schedule(professional_id):
+    """Expediente compilado de um profissional."""
+    return get_compiled_schedules([professional_id])[professional_id]
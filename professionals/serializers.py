@@ -1,11 +1,12 @@
 from rest_framework import serializers
 from .models import Professional
+from core.fieldsets import SparseFieldsetSerializerMixin
 from core.validators import sanitize_html, validate_no_sql_injection
 
-class ProfessionalSerializer(serializers.ModelSerializer):
+class ProfessionalSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Professional
-        fields = '__all__'
+        exclude = ('search_vector',)
         read_only_fields = ('id', 'created_at', 'updated_at')
 
     def validate_nome_social(self, value):
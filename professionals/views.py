@@ -2,12 +2,31 @@ from django.shortcuts import render
 from rest_framework import viewsets, filters, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
+from django.utils import timezone
+from datetime import datetime
+from django.conf import settings
+from appointments.availability import (
+    availability_matrix,
+    earliest_free_slots,
+    next_free_slot,
+    parse_duration,
+)
+from core.fieldsets import SparseFieldsetViewMixin
+from core.streaming import PaginatedOrStreamedMixin
+from .filters import ProfessionalSearchFilter
 from .models import Professional
 from .serializers import ProfessionalSerializer
 
-class ProfessionalViewSet(viewsets.ModelViewSet):
+# Limites da busca de horários livres entre profissionais
+MAX_DIAS_BUSCA = 31
+MAX_RESULTADOS_BUSCA = 50
+# A ocupação de todos os candidatos é carregada antes do merge
+FILTROS_BUSCA = ('profissao', 'cidade', 'estado')
+MAX_CANDIDATOS_BUSCA = 200
+
+class ProfessionalViewSet(SparseFieldsetViewMixin, PaginatedOrStreamedMixin, viewsets.ModelViewSet):
     """
     ViewSet para gerenciar profissionais de saúde.
     
@@ -18,11 +37,16 @@ class ProfessionalViewSet(viewsets.ModelViewSet):
     - PUT /api/v1/professionals/{id}/ - Atualiza um profissional
     - PATCH /api/v1/professionals/{id}/ - Atualiza parcialmente um profissional
     - DELETE /api/v1/professionals/{id}/ - Desativa um profissional (soft delete)
+    - GET /api/v1/professionals/inativos/ - Profissionais inativos (paginado; ?all=true em streaming)
+    - GET /api/v1/professionals/free_slots/ - Primeiros horários livres entre profissionais
+    - GET /api/v1/professionals/{id}/next-available/ - Próximo horário livre do profissional
+    - GET /api/v1/professionals/availability_heatmap/ - Capacidade livre profissionais × dias (admin)
     """
     queryset = Professional.objects.filter(ativo=True)
     serializer_class = ProfessionalSerializer
     permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    # Busca depois da ordenação: sem ?ordering= o resultado vem por relevância
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, ProfessionalSearchFilter]
     filterset_fields = ['profissao', 'cidade', 'estado']
     search_fields = ['nome_social', 'email', 'registro_profissional']
     ordering_fields = ['nome_social', 'profissao', 'created_at']
@@ -36,9 +60,10 @@ class ProfessionalViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def inativos(self, request):
         """Retorna profissionais inativos"""
-        queryset = Professional.objects.filter(ativo=False)
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        queryset = self.sparse_queryset(
+            Professional.objects.filter(ativo=False).order_by('nome_social', 'id')
+        )
+        return self.paginated_or_streamed(queryset)
     
     @action(detail=True, methods=['post'])
     def reativar(self, request, pk=None):
@@ -47,4 +72,209 @@ class ProfessionalViewSet(viewsets.ModelViewSet):
         professional.ativo = True
         professional.save()
         serializer = self.get_serializer(professional)
-        return Response(serializer.data)
\ No newline at end of file
+        return Response(serializer.data)
+    
+    @action(detail=False, methods=['get'])
+    def free_slots(self, request):
+        """
+        Buscar os primeiros horários livres entre profissionais ativos
+        
+        GET /api/v1/professionals/free_slots/?profissao=PSICOLOGO&cidade=São Paulo&start=2024-01-15&end=2024-01-20&duration=60
+        
+        Aceita os mesmos filtros da listagem (profissao, cidade, estado); ao
+        menos um é obrigatório e a busca aceita até MAX_CANDIDATOS_BUSCA
+        profissionais. As consultas de todos os candidatos são carregadas em
+        uma única query e os horários são combinados em ordem cronológica.
+        """
+        missing = self._require_filters(request)
+        if missing is not None:
+            return missing
+        
+        period = self._parse_period(request)
+        if isinstance(period, Response):
+            return period
+        start_date, end_date = period
+        
+        duration = parse_duration(request.query_params.get('duration'))
+        if duration is None:
+            return Response(
+                {'error': 'duration deve ser um múltiplo de 15 entre 15 e 240'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            limit = min(int(request.query_params.get('limit', 10)), MAX_RESULTADOS_BUSCA)
+        except ValueError:
+            return Response(
+                {'error': 'limit inválido'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        professionals = self._load_candidates(request, 'nome_social', 'profissao', 'cidade', 'estado')
+        if isinstance(professionals, Response):
+            return professionals
+        candidates = {professional.id: professional for professional in professionals}
+        
+        slots = earliest_free_slots(
+            candidates.keys(),
+            start_date,
+            end_date,
+            duration,
+            max(limit, 0),
+            not_before=timezone.now()
+        )
+        
+        results = []
+        for start, professional_id in slots:
+            professional = candidates[professional_id]
+            results.append({
+                'professional_id': professional_id,
+                'nome_social': professional.nome_social,
+                'profissao': professional.profissao,
+                'cidade': professional.cidade,
+                'estado': professional.estado,
+                'data_hora': start,
+            })
+        
+        return Response({
+            'duration': duration,
+            'results': results
+        })
+    
+    @action(detail=True, methods=['get'], url_path='next-available')
+    def next_available(self, request, pk=None):
+        """
+        Próximo horário livre do profissional
+        
+        GET /api/v1/professionals/{id}/next-available/?duration=60
+        
+        Percorre a agenda em lotes de dias a partir de agora e para no
+        primeiro horário livre, até NEXT_AVAILABLE_HORIZON_DAYS dias.
+        """
+        professional = self.get_object()
+        
+        duration = parse_duration(request.query_params.get('duration'))
+        if duration is None:
+            return Response(
+                {'error': 'duration deve ser um múltiplo de 15 entre 15 e 240'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        horizon_days = settings.NEXT_AVAILABLE_HORIZON_DAYS
+        start = next_free_slot(professional.id, duration, timezone.now(), horizon_days)
+        
+        return Response({
+            'professional_id': professional.id,
+            'duration': duration,
+            'horizon_days': horizon_days,
+            'data_hora': start,
+        })
+    
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminUser])
+    def availability_heatmap(self, request):
+        """
+        Matriz de capacidade livre: profissionais × dias
+        
+        GET /api/v1/professionals/availability_heatmap/?cidade=São Paulo&start=2024-01-15&end=2024-02-13&duration=60
+        
+        Aceita os mesmos filtros da listagem, com as mesmas exigências de
+        free_slots (ao menos um filtro, até MAX_CANDIDATOS_BUSCA
+        profissionais). ``free[i][j]`` é a quantidade de horários livres do
+        profissional ``professionals[i]`` no dia ``days[j]`` e ``open[i][j]``
+        o total de horários do expediente.
+        """
+        missing = self._require_filters(request)
+        if missing is not None:
+            return missing
+        
+        period = self._parse_period(request)
+        if isinstance(period, Response):
+            return period
+        start_date, end_date = period
+        
+        duration = parse_duration(request.query_params.get('duration'))
+        if duration is None:
+            return Response(
+                {'error': 'duration deve ser um múltiplo de 15 entre 15 e 240'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        professionals = self._load_candidates(request, 'nome_social')
+        if isinstance(professionals, Response):
+            return professionals
+        
+        days, matrix = availability_matrix(
+            [professional.id for professional in professionals],
+            start_date,
+            end_date,
+            duration,
+            not_before=timezone.now()
+        )
+        
+        return Response({
+            'duration': duration,
+            'days': [day.isoformat() for day in days],
+            'professionals': [
+                {'id': professional.id, 'nome_social': professional.nome_social}
+                for professional in professionals
+            ],
+            'free': [[free for free, _ in matrix[professional.id]] for professional in professionals],
+            'open': [[total for _, total in matrix[professional.id]] for professional in professionals],
+        })
+    
+    @staticmethod
+    def _require_filters(request):
+        """Exige ao menos um de FILTROS_BUSCA; retorna Response em caso de erro"""
+        if not any(request.query_params.get(name) for name in FILTROS_BUSCA):
+            return Response(
+                {'error': 'Informe ao menos um filtro: profissao, cidade ou estado'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return None
+    
+    def _load_candidates(self, request, *fields):
+        """Profissionais filtrados (até MAX_CANDIDATOS_BUSCA); retorna Response se passar do limite"""
+        professionals = list(
+            self.filter_queryset(self.get_queryset()).only('id', *fields)[:MAX_CANDIDATOS_BUSCA + 1]
+        )
+        if len(professionals) > MAX_CANDIDATOS_BUSCA:
+            return Response(
+                {'error': f'Mais de {MAX_CANDIDATOS_BUSCA} profissionais encontrados; refine os filtros'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return professionals
+    
+    @staticmethod
+    def _parse_period(request):
+        """Lê ?start= e ?end= (até MAX_DIAS_BUSCA dias); retorna Response em caso de erro"""
+        start_str = request.query_params.get('start')
+        end_str = request.query_params.get('end')
+        
+        if not start_str or not end_str:
+            return Response(
+                {'error': 'start e end são obrigatórios'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            start_date = datetime.strptime(start_str, '%Y-%m-%d').date()
+            end_date = datetime.strptime(end_str, '%Y-%m-%d').date()
+        except ValueError:
+            return Response(
+                {'error': 'Formato de data inválido. Use YYYY-MM-DD'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if end_date < start_date:
+            return Response(
+                {'error': 'end deve ser maior ou igual a start'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if (end_date - start_date).days + 1 > MAX_DIAS_BUSCA:
+            return Response(
+                {'error': f'Intervalo máximo de {MAX_DIAS_BUSCA} dias'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        return start_date, end_date
@@ -246,6 +246,53 @@ def cancelled_appointment(db, sample_professional):
     )
 
 
+class AppointmentFactory:
+    """Consultas de teste com dados de paciente padrão (sobrescrevíveis)."""
+    
+    defaults = {
+        'duracao_minutos': 60,
+        'paciente_nome': "Paciente Teste",
+        'paciente_email': "paciente.teste@test.com",
+        'paciente_telefone': "(11) 98888-0000",
+    }
+    
+    def __init__(self, professional):
+        self.professional = professional
+    
+    @staticmethod
+    def at(day, hour, minute=0):
+        """Horário do dia no fuso local (aware)."""
+        from django.utils import timezone
+        return timezone.make_aware(datetime.combine(day, datetime.min.time()) + timedelta(hours=hour, minutes=minute))
+    
+    def __call__(self, day=None, hour=9, minute=0, **fields):
+        """Cria a consulta em ``day`` às ``hour:minute``, ou no ``data_hora=`` informado."""
+        fields.setdefault('professional', self.professional)
+        if 'data_hora' not in fields:
+            fields['data_hora'] = self.at(day, hour, minute)
+        return Appointment.objects.create(**{**self.defaults, **fields})
+    
+    def payload(self, day, hour, minute=0, professional=None, **fields):
+        """Corpo equivalente para a API."""
+        return {
+            'professional': (professional or self.professional).id,
+            'data_hora': self.at(day, hour, minute).isoformat(),
+            **self.defaults,
+            **fields,
+        }
+
+
+@pytest.fixture
+def appointment_factory(db, sample_professional):
+    """
+    Fábrica de consultas: ``appointment_factory(day, 9, 30, status=...)``.
+    
+    O profissional padrão é ``sample_professional``; ``.at()`` monta só o
+    horário e ``.payload()`` o corpo para os endpoints.
+    """
+    return AppointmentFactory(sample_professional)
+
+
 @pytest.fixture
 def multiple_appointments(db, sample_professional, sample_psychologist):
     """Cria múltiplas consultas para diferentes profissionais."""
@@ -331,6 +378,13 @@ def valid_appointment_data(sample_professional):
     }
 
 
+@pytest.fixture
+def future_weekday():
+    """Primeira segunda-feira a partir de 30 dias (dentro do expediente padrão)."""
+    day = (datetime.now() + timedelta(days=30)).date()
+    return day + timedelta(days=(7 - day.weekday()) % 7)
+
+
 @pytest.fixture
 def invalid_appointment_data():
     """Dados inválidos para criar uma consulta."""
@@ -364,6 +418,19 @@ def clear_cache():
     cache.clear()
 
 
+@pytest.fixture
+def agenda_cache(settings):
+    """Cache de agendas em memória (nos testes não há Redis), limpo."""
+    from core.cache import agenda_cache
+    settings.CACHES = {
+        **settings.CACHES,
+        'agenda': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'agenda'},
+    }
+    agenda_cache.clear()
+    yield agenda_cache
+    agenda_cache.clear()
+
+
 @pytest.fixture
 def mock_datetime_now():
     """Mock para datetime.now() em testes."""
@@ -132,6 +132,161 @@ class TestAppointmentListAPI:
         # Deve incluir a consulta passada
         ids = [a['id'] for a in response.data['results']]
         assert past_appointment.id in ids
+    
+    def test_cursor_pagination_walks_ties(self, authenticated_client, appointment_factory):
+        """Testa que o cursor percorre tudo, sem repetir, com horários empatados."""
+        from django.utils import timezone
+        base = timezone.now().replace(microsecond=0) + timedelta(days=3)
+        # Canceladas: a constraint de sobreposição não se aplica
+        created = [
+            appointment_factory(data_hora=start, status='CANCELADA')
+            for start in [base] * 4 + [base + timedelta(hours=1)] * 3
+        ]
+        expected = [a.id for a in sorted(created, key=lambda a: (a.data_hora, a.id), reverse=True)]
+        
+        seen, pages = [], []
+        url = '/api/v1/appointments/?pagination=cursor&page_size=3'
+        while url:
+            response = authenticated_client.get(url)
+            assert response.status_code == status.HTTP_200_OK
+            assert 'count' not in response.data
+            pages.append(response.data)
+            seen.extend(a['id'] for a in response.data['results'])
+            url = response.data['next']
+        assert seen == expected
+        assert len(pages) == 3
+        
+        # Voltando a partir da última página
+        response = authenticated_client.get(pages[-1]['previous'])
+        assert [a['id'] for a in response.data['results']] == expected[3:6]
+    
+    def test_cursor_page_size_bounded_and_ordering_checked(self, authenticated_client, sample_appointment):
+        """Testa o limite de page_size e a recusa de ordenação incompatível."""
+        response = authenticated_client.get('/api/v1/appointments/?pagination=cursor&page_size=1000')
+        assert response.data['page_size'] == 100
+        
+        response = authenticated_client.get('/api/v1/appointments/?pagination=cursor&ordering=status')
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        
+        response = authenticated_client.get('/api/v1/appointments/?cursor=invalido')
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+        
+        # Modo por página continua o padrão
+        response = authenticated_client.get('/api/v1/appointments/?page_size=1')
+        assert response.data['count'] >= 1
+        assert len(response.data['results']) == 1
+    
+    def test_upcoming_cursor_ascending(self, authenticated_client, appointment_factory):
+        """Testa upcoming em modo cursor, em ordem crescente."""
+        from django.utils import timezone
+        base = timezone.now().replace(microsecond=0) + timedelta(days=3)
+        created = [appointment_factory(data_hora=base + timedelta(hours=h)) for h in range(3)]
+        
+        response = authenticated_client.get('/api/v1/appointments/upcoming/?pagination=cursor&page_size=2')
+        assert [a['id'] for a in response.data['results']] == [created[0].id, created[1].id]
+        response = authenticated_client.get(response.data['next'])
+        assert [a['id'] for a in response.data['results']] == [created[2].id]
+        assert response.data['next'] is None
+    
+    def test_past_paginated_and_streamed_in_chunks(
+        self, authenticated_client, appointment_factory, monkeypatch
+    ):
+        """Testa past paginado por padrão e em streaming (blocos) com ?all=true."""
+        import json
+        from django.utils import timezone
+        from appointments.views import AppointmentViewSet
+        
+        base = timezone.now().replace(microsecond=0) + timedelta(days=3)
+        created = [
+            appointment_factory(data_hora=base + timedelta(hours=h), status='CANCELADA') for h in range(5)
+        ]
+        
+        response = authenticated_client.get('/api/v1/appointments/past/?page_size=2')
+        assert response.data['count'] == 5
+        assert len(response.data['results']) == 2
+        
+        monkeypatch.setattr(AppointmentViewSet, 'stream_chunk_size', 2)
+        response = authenticated_client.get('/api/v1/appointments/past/?all=true')
+        assert response.status_code == status.HTTP_200_OK
+        chunks = list(response.streaming_content)
+        # '[', três blocos (2 + 2 + 1) e ']'
+        assert len(chunks) == 5
+        items = json.loads(b''.join(chunks))
+        assert [item['id'] for item in items] == [a.id for a in reversed(created)]
+        
+        paged = authenticated_client.get('/api/v1/appointments/past/?page_size=5')
+        assert items == json.loads(json.dumps(paged.data['results']))
+    
+    def test_estimated_count_above_threshold(self, authenticated_client, appointment_factory, settings):
+        """Testa count estimado acima do limite, sem perder páginas."""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from django.utils import timezone
+        base = timezone.now().replace(microsecond=0) + timedelta(days=3)
+        for h in range(5):
+            appointment_factory(data_hora=base + timedelta(hours=h), status='CANCELADA')
+        
+        response = authenticated_client.get('/api/v1/appointments/?page_size=2')
+        assert response.data['count'] == 5
+        assert response.data['count_is_exact'] is True
+        
+        settings.PAGINATION_EXACT_COUNT_THRESHOLD = 0
+        seen = []
+        url = '/api/v1/appointments/?page_size=2'
+        with CaptureQueriesContext(connection) as queries:
+            while url:
+                response = authenticated_client.get(url)
+                assert response.status_code == status.HTTP_200_OK
+                assert response.data['count_is_exact'] is False
+                seen.extend(a['id'] for a in response.data['results'])
+                url = response.data['next']
+        assert len(seen) == 5
+        assert not any('COUNT(' in query['sql'].upper() for query in queries.captured_queries)
+    
+    def test_estimated_count_on_empty_queryset(self, settings):
+        """Testa a contagem de um queryset .none(), que não gera SQL para estimar."""
+        from core.pagination import EstimatedCountPaginator, estimate_count
+        
+        assert estimate_count(Appointment.objects.none()) == 0
+        settings.PAGINATION_EXACT_COUNT_THRESHOLD = 0
+        paginator = EstimatedCountPaginator(Appointment.objects.none().order_by('-data_hora'), 10)
+        assert paginator.count == 0
+        assert list(paginator.page(1)) == []
+    
+    def test_list_reads_only_covered_columns(self, authenticated_client, sample_appointment):
+        """Testa que a listagem só lê as colunas de appointment_lista_idx."""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        
+        with CaptureQueriesContext(connection) as queries:
+            response = authenticated_client.get('/api/v1/appointments/')
+        assert response.data['results'][0]['paciente_nome'] == sample_appointment.paciente_nome
+        select = next(q['sql'] for q in queries.captured_queries if 'ORDER BY' in q['sql'])
+        assert '"appointments_appointment"."paciente_nome"' in select
+        assert 'paciente_email' not in select and 'observacoes' not in select
+
+    def test_list_values_path_matches_serializer(self, authenticated_client, sample_appointment, appointment_factory):
+        """Testa que a listagem via .values() gera os mesmos bytes do serializer."""
+        from rest_framework.renderers import JSONRenderer
+        from appointments.serializers import AppointmentListSerializer
+
+        appointment_factory(
+            data_hora=sample_appointment.data_hora.replace(microsecond=123456),
+            status='CANCELADA',
+            paciente_nome="Zé Ação"
+        )
+
+        for query in ('', '?pagination=cursor', '?fields=id,status_display,professional_profession'):
+            response = authenticated_client.get(f'/api/v1/appointments/{query}')
+            assert response.status_code == status.HTTP_200_OK
+
+            fields = ['id', 'status_display', 'professional_profession'] if 'fields' in query else None
+            expected = AppointmentListSerializer(
+                Appointment.objects.order_by('-data_hora'),
+                many=True,
+                context={'sparse_fields': fields} if fields else {}
+            ).data
+            assert JSONRenderer().render(response.data['results']) == JSONRenderer().render(expected)
 
 
 @pytest.mark.django_db
@@ -194,7 +349,7 @@ class TestAppointmentCreateAPI:
         self, authenticated_client, inactive_professional, valid_appointment_data
     ):
         """Testa que não permite criar consulta com profissional inativo."""
-        valid_appointment_data['profissional'] = inactive_professional.id
+        valid_appointment_data['professional'] = inactive_professional.id
         
         response = authenticated_client.post(
             '/api/v1/appointments/',
@@ -203,6 +358,40 @@ class TestAppointmentCreateAPI:
         )
         
         assert response.status_code == status.HTTP_400_BAD_REQUEST
+    
+    def test_create_validates_once(
+        self, authenticated_client, valid_appointment_data, future_weekday, agenda_cache
+    ):
+        """Testa que validação, sanitização e conflito rodam uma única vez."""
+        from unittest.mock import patch
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from django.utils import timezone
+        from appointments import serializers as appointment_serializers
+        
+        valid_appointment_data['data_hora'] = timezone.make_aware(
+            datetime.combine(future_weekday, datetime.min.time()) + timedelta(hours=10)
+        ).isoformat()
+        valid_appointment_data['paciente_nome'] = '<b>Paciente</b> Novo'
+        
+        with patch.object(
+            appointment_serializers, 'sanitize_html', wraps=appointment_serializers.sanitize_html
+        ) as sanitize, patch.object(
+            appointment_serializers, 'is_slot_free', wraps=appointment_serializers.is_slot_free
+        ) as slot_check, CaptureQueriesContext(connection) as queries:
+            response = authenticated_client.post(
+                '/api/v1/appointments/',
+                valid_appointment_data,
+                format='json'
+            )
+        
+        assert response.status_code == status.HTTP_201_CREATED, response.data
+        assert sanitize.call_count == 2  # paciente_nome e observacoes
+        assert slot_check.call_count == 1
+        assert Appointment.objects.get().paciente_nome == 'Paciente Novo'
+        # profissional, expediente, ocupação do dia, savepoint, insert, lock,
+        # recálculo + upsert da ocupação, release e reservas vigentes
+        assert len(queries) == 10, [query['sql'] for query in queries.captured_queries]
 
 
 @pytest.mark.django_db
@@ -453,3 +642,879 @@ class TestAppointmentWorkflow:
         # Deve impedir ou permitir dependendo da implementação
         # Se validação de conflito existe, deve dar 400
         assert response2.status_code in [status.HTTP_201_CREATED, status.HTTP_400_BAD_REQUEST]
+
+
+class TestSlotEngine:
+    """Testes do motor de disponibilidade baseado em bitsets."""
+    
+    def _dt(self, hour, minute=0):
+        from django.utils import timezone
+        return timezone.make_aware(datetime(2030, 1, 7, hour, minute))
+    
+    def test_aligned_appointment_blocks_slots(self):
+        """Testa que consulta alinhada ocupa exatamente seus blocos."""
+        from appointments.slots import Occupancy
+        from datetime import date
+        
+        occupancy = Occupancy.for_day(date(2030, 1, 7), [(self._dt(9), 60)])
+        
+        assert occupancy.exact is True
+        assert occupancy.is_free(self._dt(8), self._dt(9))
+        assert not occupancy.is_free(self._dt(9, 30), self._dt(10))
+        assert occupancy.is_free(self._dt(10), self._dt(11))
+    
+    def test_available_for_multiple_durations(self):
+        """Testa disponibilidade para durações de 30, 45 e 60 minutos."""
+        from appointments.slots import Occupancy
+        from datetime import date
+        
+        occupancy = Occupancy.for_day(date(2030, 1, 7), [(self._dt(9), 30)])
+        starts = [self._dt(8), self._dt(8, 30)]
+        
+        assert occupancy.available(starts, 30) == [True, True]
+        assert occupancy.available(starts, 45) == [True, False]
+        assert occupancy.available(starts, 60) == [True, False]
+    
+    def test_unaligned_appointment_uses_exact_check(self):
+        """Testa que consultas fora da grade não geram falso conflito."""
+        from appointments.slots import Occupancy
+        from datetime import date
+        
+        occupancy = Occupancy.for_day(date(2030, 1, 7), [(self._dt(9, 50), 60)])
+        
+        assert occupancy.exact is False
+        assert occupancy.is_free(self._dt(10, 50), self._dt(11, 50))
+        assert not occupancy.is_free(self._dt(10, 45), self._dt(11, 45))
+    
+    def test_available_slots_with_duration(self, authenticated_client, sample_professional, future_weekday):
+        """Testa available_slots com duração customizada."""
+        target = future_weekday
+        response = authenticated_client.get(
+            f'/api/v1/appointments/available_slots/'
+            f'?professional_id={sample_professional.id}&date={target}&duration=60'
+        )
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['duration'] == 60
+        assert all(slot['available'] for slot in response.data['slots'])
+    
+    def test_available_slots_range(
+        self, authenticated_client, sample_professional, future_weekday, appointment_factory
+    ):
+        """Testa disponibilidade de vários dias em uma única requisição."""
+        start = future_weekday
+        end = start + timedelta(days=6)
+        appointment_factory(start, 9)
+        
+        response = authenticated_client.get(
+            f'/api/v1/appointments/available_slots_range/'
+            f'?professional_id={sample_professional.id}&start={start}&end={end}'
+        )
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.data['days']) == 7
+        first_day = response.data['days'][0]
+        assert '09:00' not in first_day['available']
+        assert '09:30' not in first_day['available']
+        assert '10:00' in first_day['available']
+        assert '09:00' in response.data['days'][1]['available']
+
+
+class TestAvailabilityCache:
+    """Testes do cache de disponibilidade."""
+    
+    def _url(self, professional, day):
+        return f'/api/v1/appointments/available_slots/?professional_id={professional.id}&date={day}'
+    
+    def test_second_call_is_cache_hit(self, authenticated_client, sample_professional, agenda_cache, future_weekday):
+        """Testa que a segunda consulta do mesmo dia vem do cache."""
+        from appointments.availability import cache_stats
+        
+        day = future_weekday
+        authenticated_client.get(self._url(sample_professional, day))
+        authenticated_client.get(self._url(sample_professional, day))
+        
+        stats = cache_stats()
+        assert stats['misses'] == 1
+        assert stats['hits'] == 1
+    
+    def test_cache_off_without_shared_backend(self, authenticated_client, sample_professional, future_weekday):
+        """Testa que sem Redis (cache por processo) a disponibilidade não é cacheada."""
+        from appointments.availability import cache_stats
+        
+        authenticated_client.get(self._url(sample_professional, future_weekday))
+        authenticated_client.get(self._url(sample_professional, future_weekday))
+        
+        stats = cache_stats()
+        assert stats['enabled'] is False
+        assert stats['hits'] == 0
+    
+    def test_cancel_invalidates_day(
+        self, authenticated_client, sample_professional, agenda_cache, future_weekday,
+        appointment_factory, django_capture_on_commit_callbacks
+    ):
+        """Testa que cancelar consulta invalida a disponibilidade do dia (no commit)."""
+        day = future_weekday
+        appointment = appointment_factory(day, 10, duracao_minutos=30)
+        
+        response = authenticated_client.get(self._url(sample_professional, day))
+        assert {'time': '10:00', 'available': False} in response.data['slots']
+        
+        with django_capture_on_commit_callbacks(execute=True):
+            response = authenticated_client.post(f'/api/v1/appointments/{appointment.id}/cancel/', format='json')
+        assert response.status_code == status.HTTP_200_OK
+        
+        response = authenticated_client.get(self._url(sample_professional, day))
+        assert {'time': '10:00', 'available': True} in response.data['slots']
+    
+    def test_cache_stats_admin_only(self, authenticated_client, admin_client):
+        """Testa que os contadores são restritos a administradores."""
+        response = authenticated_client.get('/api/v1/appointments/availability_cache/')
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+        
+        response = admin_client.get('/api/v1/appointments/availability_cache/')
+        assert response.status_code == status.HTTP_200_OK
+        assert 'hit_rate' in response.data
+
+
+class TestDayOccupancyTable:
+    """Testes da tabela desnormalizada professional_day_occupancy."""
+    
+    def test_save_maintains_occupancy_row(self, sample_professional, appointment_factory):
+        """Testa que salvar/cancelar consulta atualiza a linha do dia."""
+        from appointments.models import ProfessionalDayOccupancy
+        
+        day = (datetime.now() + timedelta(days=30)).date()
+        appointment = appointment_factory(day, 9)
+        
+        row = ProfessionalDayOccupancy.objects.get(pk=(sample_professional.id, day))
+        assert row.exato is True
+        assert int.from_bytes(bytes(row.bitmap), 'little') == 0b1111 << 36
+        
+        appointment.status = 'CANCELADA'
+        appointment.save()
+        assert not ProfessionalDayOccupancy.objects.filter(pk=(sample_professional.id, day)).exists()
+    
+    def test_is_slot_free_uses_occupancy(self, sample_professional, appointment_factory):
+        """Testa a verificação de conflito pela tabela de ocupação."""
+        from django.utils import timezone
+        from appointments.availability import is_slot_free
+        
+        day = (datetime.now() + timedelta(days=30)).date()
+        appointment = appointment_factory(day, 9)
+        start = appointment.data_hora
+        
+        assert not is_slot_free(sample_professional.id, start, start + timedelta(minutes=30))
+        assert is_slot_free(sample_professional.id, start, start + timedelta(minutes=30), exclude_pk=appointment.pk)
+        assert is_slot_free(sample_professional.id, start + timedelta(hours=1), start + timedelta(hours=2))
+    
+    def test_rebuild_and_verify_command(self, sample_psychologist, appointment_factory):
+        """Testa o comando de reconstrução e verificação."""
+        from io import StringIO
+        from django.core.management import call_command
+        from django.core.management.base import CommandError
+        from appointments.models import ProfessionalDayOccupancy
+        
+        day = (datetime.now() + timedelta(days=30)).date()
+        appointment_factory(day, 9)
+        call_command('rebuild_occupancy', '--verify')
+        
+        ProfessionalDayOccupancy.objects.all().delete()
+        with pytest.raises(CommandError):
+            call_command('rebuild_occupancy', '--verify')
+        
+        call_command('rebuild_occupancy')
+        call_command('rebuild_occupancy', '--verify')
+        
+        # Linha de um profissional sem consultas ativas
+        ProfessionalDayOccupancy.objects.create(
+            professional=sample_psychologist, dia=day, bitmap=bytes(12), exato=True
+        )
+        out = StringIO()
+        with pytest.raises(CommandError):
+            call_command('rebuild_occupancy', '--verify', stdout=out)
+        assert f'Sobrando: profissional {sample_psychologist.id} em {day}' in out.getvalue()
+    
+    def test_rebuild_locks_each_batch(
+        self, sample_professional, sample_psychologist, monkeypatch, appointment_factory
+    ):
+        """Testa que o rebuild trava cada lote de profissionais antes de ler."""
+        from unittest.mock import patch
+        from django.core.management import call_command
+        from appointments.management.commands import rebuild_occupancy
+        
+        day = (datetime.now() + timedelta(days=30)).date()
+        appointment_factory(day, 9)
+        appointment_factory(day, 10, professional=sample_psychologist)
+        monkeypatch.setattr(rebuild_occupancy, 'PROFISSIONAIS_POR_LOTE', 1)
+        
+        with patch.object(
+            rebuild_occupancy, 'lock_professionals', wraps=rebuild_occupancy.lock_professionals
+        ) as lock:
+            call_command('rebuild_occupancy')
+        
+        assert [call.args[0] for call in lock.call_args_list] == [
+            [sample_professional.id], [sample_psychologist.id]
+        ]
+        call_command('rebuild_occupancy', '--verify')
+    
+    @pytest.mark.django_db(transaction=True)
+    def test_concurrent_writes_keep_both_appointments(
+        self, sample_professional, future_weekday, appointment_factory
+    ):
+        """Testa duas transações gravando no mesmo dia: nenhuma ocupação se perde."""
+        import threading
+        import time
+        from django.db import connection, transaction
+        from appointments.models import ProfessionalDayOccupancy
+        
+        first_written = threading.Event()
+        errors = []
+        
+        def first_transaction():
+            try:
+                with transaction.atomic():
+                    appointment_factory(future_weekday, 9)
+                    first_written.set()
+                    # Segura o commit enquanto a segunda transação grava
+                    time.sleep(0.5)
+            except Exception as exc:  # pragma: no cover - repassado ao teste
+                errors.append(exc)
+                first_written.set()
+            finally:
+                connection.close()
+        
+        thread = threading.Thread(target=first_transaction)
+        thread.start()
+        first_written.wait(timeout=5)
+        with transaction.atomic():
+            appointment_factory(future_weekday, 11)
+        thread.join()
+        
+        assert not errors
+        row = ProfessionalDayOccupancy.objects.get(pk=(sample_professional.id, future_weekday))
+        assert int.from_bytes(bytes(row.bitmap), 'little') == (0b1111 << 36) | (0b1111 << 44)
+
+
+class TestOverlapConstraint:
+    """Testes da constraint de exclusão contra consultas sobrepostas."""
+    
+    def test_database_rejects_overlap(self, sample_psychologist, future_weekday, appointment_factory):
+        """Testa que o banco rejeita sobreposição apenas entre consultas ativas."""
+        from django.db import IntegrityError, transaction
+        
+        first = appointment_factory(future_weekday, 9)
+        assert first.periodo.lower == first.data_hora
+        assert first.periodo.upper == first.data_hora + timedelta(minutes=60)
+        
+        with pytest.raises(IntegrityError), transaction.atomic():
+            appointment_factory(future_weekday, 9, 30)
+        
+        # Encostadas, canceladas ou de outro profissional não conflitam
+        appointment_factory(future_weekday, 10)
+        appointment_factory(future_weekday, 9, 30, status='CANCELADA')
+        appointment_factory(future_weekday, 9, 30, professional=sample_psychologist)
+    
+    def test_serializer_translates_violation(self, sample_professional, future_weekday, appointment_factory):
+        """Testa que a violação vira o erro de conflito mesmo sem o pré-check."""
+        from unittest.mock import patch
+        from rest_framework.exceptions import ValidationError
+        from appointments.serializers import AppointmentSerializer
+        
+        appointment_factory(future_weekday, 9)
+        serializer = AppointmentSerializer(data={
+            'professional': sample_professional.id,
+            'data_hora': appointment_factory.at(future_weekday, 9, 30).isoformat(),
+            'duracao_minutos': 60,
+            'paciente_nome': 'Paciente Concorrente',
+            'paciente_email': 'concorrente@test.com',
+            'paciente_telefone': '(11) 98888-7777',
+        })
+        
+        # Simula duas requisições que passaram pelo pré-check ao mesmo tempo
+        with patch('appointments.serializers.is_slot_free', return_value=True):
+            assert serializer.is_valid(), serializer.errors
+            with pytest.raises(ValidationError) as excinfo:
+                serializer.save()
+        
+        assert "Profissional já possui consulta neste horário" in str(excinfo.value.detail)
+        assert Appointment.objects.filter(professional=sample_professional).count() == 1
+    
+    def test_end_time_kept_in_sync(self, future_weekday, appointment_factory):
+        """Testa que data_hora_fim acompanha data_hora e duracao_minutos."""
+        appointment = appointment_factory(future_weekday, 9)
+        assert appointment.data_hora_fim == appointment_factory.at(future_weekday, 10)
+        
+        appointment.duracao_minutos = 90
+        appointment.save(update_fields=['duracao_minutos'])
+        appointment.refresh_from_db()
+        assert appointment.data_hora_fim == appointment_factory.at(future_weekday, 10, 30)
+        assert appointment.periodo.upper == appointment.data_hora_fim
+    
+    def test_overlap_lookup_is_exact_for_long_appointments(
+        self, sample_professional, future_weekday, appointment_factory
+    ):
+        """Testa que consultas longas iniciadas bem antes da janela são encontradas."""
+        from appointments.availability import is_slot_free
+        
+        at = appointment_factory.at
+        appointment = appointment_factory(future_weekday, 9, 10)
+        appointment.duracao_minutos = 240
+        appointment.save()
+        window = (at(future_weekday, 13), at(future_weekday, 13, 30))
+        
+        assert Appointment.objects.active().overlapping(*window).filter(pk=appointment.pk).exists()
+        assert not Appointment.objects.overlapping(at(future_weekday, 13, 10), at(future_weekday, 14)).exists()
+        assert not is_slot_free(sample_professional.id, *window, exclude_pk=-1)
+    
+    def test_database_rejects_duration_above_max(self, future_weekday, appointment_factory):
+        """Testa o limite de duração em que se apoia o limite inferior de overlapping."""
+        from django.db import IntegrityError, transaction
+        
+        appointment = appointment_factory(future_weekday, 9)
+        appointment.duracao_minutos = 255
+        with pytest.raises(IntegrityError), transaction.atomic():
+            appointment.save()
+
+
+@pytest.mark.django_db
+@pytest.mark.api
+class TestAppointmentBulkAPI:
+    """Testes da criação de consultas em lote."""
+    
+    def test_bulk_reports_per_item_results(
+        self, authenticated_client, sample_professional, sample_psychologist, future_weekday, agenda_cache,
+        django_capture_on_commit_callbacks, appointment_factory
+    ):
+        """Testa conflitos no lote, com o banco e erros de validação por item."""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from appointments.availability import load_day_occupancies
+        
+        appointment_factory(future_weekday, 14)
+        load_day_occupancies([sample_professional.id], future_weekday, future_weekday)
+        
+        items = [
+            appointment_factory.payload(future_weekday, 9),
+            appointment_factory.payload(future_weekday, 9, 30),  # conflita com o item 0
+            appointment_factory.payload(future_weekday, 13, 30),  # conflita com o banco
+            appointment_factory.payload(future_weekday, 16, paciente_email='invalido'),
+            appointment_factory.payload(future_weekday, 10),
+            appointment_factory.payload(future_weekday, 9, 30, professional=sample_psychologist),
+        ]
+        with CaptureQueriesContext(connection) as queries, django_capture_on_commit_callbacks(execute=True):
+            response = authenticated_client.post(
+                '/api/v1/appointments/bulk/', {'appointments': items}, format='json'
+            )
+        
+        assert response.status_code == status.HTTP_207_MULTI_STATUS
+        assert response.data['created'] == 3
+        assert [result['status'] for result in response.data['results']] == [
+            'created', 'error', 'error', 'error', 'created', 'created'
+        ]
+        assert 'paciente_email' in response.data['results'][3]['errors']
+        assert len(queries) < len(items) * 2
+        
+        created = Appointment.objects.get(pk=response.data['results'][4]['id'])
+        assert created.data_hora_fim == created.data_hora + timedelta(minutes=60)
+        
+        # Ocupação persistida atualizada e cache invalidado
+        assert agenda_cache.get(f'availability:{sample_professional.id}:{future_weekday.isoformat()}') is None
+        occupancy = load_day_occupancies([sample_professional.id], future_weekday, future_weekday)
+        assert not occupancy[(sample_professional.id, future_weekday)].is_free(created.data_hora, created.data_hora_fim)
+    
+    def test_bulk_loads_schedules_once_without_cache(
+        self, authenticated_client, future_weekday, appointment_factory
+    ):
+        """Testa que o expediente é lido uma vez por lote, mesmo sem cache de agendas."""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        
+        items = [appointment_factory.payload(future_weekday, hour) for hour in range(8, 18)]
+        with CaptureQueriesContext(connection) as queries:
+            response = authenticated_client.post(
+                '/api/v1/appointments/bulk/', {'appointments': items}, format='json'
+            )
+        
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.data['created'] == len(items)
+        schedule_queries = [
+            query for query in queries.captured_queries
+            if 'FROM "professionals_professionalschedule"' in query['sql']
+        ]
+        assert len(schedule_queries) == 1
+    
+    def test_bulk_rejects_invalid_payload(self, authenticated_client):
+        """Testa que o corpo deve ser uma lista não vazia."""
+        response = authenticated_client.post('/api/v1/appointments/bulk/', {'appointments': []}, format='json')
+        
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+@pytest.mark.api
+class TestSlotHoldAPI:
+    """Testes das reservas temporárias de horário."""
+    
+    def _hold(self, client, professional, start, duration=60):
+        return client.post('/api/v1/holds/', {
+            'professional': professional.id,
+            'data_hora': start.isoformat(),
+            'duracao_minutos': duration,
+        }, format='json')
+    
+    def test_hold_blocks_slot_and_converts(
+        self, authenticated_client, sample_professional, future_weekday, agenda_cache, appointment_factory
+    ):
+        """Testa que a reserva ocupa o horário e vira consulta em uma chamada."""
+        start = appointment_factory.at(future_weekday, 10)
+        response = self._hold(authenticated_client, sample_professional, start)
+        assert response.status_code == status.HTTP_201_CREATED
+        hold_id = response.data['id']
+        
+        # Ocupado na disponibilidade e para novas reservas
+        response = authenticated_client.get(
+            f'/api/v1/appointments/available_slots/?professional_id={sample_professional.id}&date={future_weekday}'
+        )
+        assert {'time': '10:00', 'available': False} in response.data['slots']
+        response = self._hold(
+            authenticated_client, sample_professional, appointment_factory.at(future_weekday, 10, 30)
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        
+        response = authenticated_client.post(f'/api/v1/holds/{hold_id}/book/', {
+            'paciente_nome': 'Paciente Reserva',
+            'paciente_email': 'reserva@test.com',
+            'paciente_telefone': '(11) 98888-1212',
+        }, format='json')
+        assert response.status_code == status.HTTP_201_CREATED, response.data
+        assert response.data['data_hora'] == start.isoformat().replace('+00:00', 'Z')
+        
+        from appointments.models import SlotHold
+        assert not SlotHold.objects.filter(pk=hold_id).exists()
+        response = authenticated_client.post(f'/api/v1/holds/{hold_id}/book/', {}, format='json')
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+    
+    def test_expired_hold_is_ignored_and_purged(
+        self, authenticated_client, sample_professional, future_weekday, agenda_cache, appointment_factory
+    ):
+        """Testa que reservas expiradas não ocupam e são removidas sob demanda."""
+        from django.utils import timezone
+        from appointments.availability import is_slot_free
+        from appointments.models import SlotHold
+        
+        start = appointment_factory.at(future_weekday, 10)
+        response = self._hold(authenticated_client, sample_professional, start)
+        SlotHold.objects.filter(pk=response.data['id']).update(expira_em=timezone.now() - timedelta(seconds=1))
+        
+        assert is_slot_free(sample_professional.id, start, start + timedelta(hours=1))
+        response = self._hold(authenticated_client, sample_professional, start)
+        assert response.status_code == status.HTTP_201_CREATED
+        assert SlotHold.objects.count() == 1
+    
+    def test_active_holds_capped_per_user(
+        self, authenticated_client, sample_professional, future_weekday, settings, agenda_cache,
+        appointment_factory
+    ):
+        """Testa o limite de reservas vigentes por usuário (expiradas não contam)."""
+        from django.utils import timezone
+        from appointments.models import SlotHold
+        
+        at = appointment_factory.at
+        settings.SLOT_HOLD_MAX_ACTIVE_PER_USER = 2
+        for hour in (9, 10):
+            response = self._hold(authenticated_client, sample_professional, at(future_weekday, hour))
+            assert response.status_code == status.HTTP_201_CREATED
+        
+        response = self._hold(authenticated_client, sample_professional, at(future_weekday, 11))
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert 'Limite de 2 reserva(s)' in str(response.data)
+        
+        SlotHold.objects.filter(data_hora=at(future_weekday, 9)).update(
+            expira_em=timezone.now() - timedelta(seconds=1)
+        )
+        response = self._hold(authenticated_client, sample_professional, at(future_weekday, 11))
+        assert response.status_code == status.HTTP_201_CREATED
+
+
+@pytest.mark.django_db
+@pytest.mark.api
+class TestOverbookingAudit:
+    """Testes da auditoria de consultas sobrepostas."""
+    
+    @pytest.fixture
+    def legacy_overlaps(self, future_weekday, appointment_factory):
+        """Remove a constraint (na transação do teste) e grava sobreposições antigas."""
+        from django.db import connection
+        from django.utils import timezone
+        
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'ALTER TABLE appointments_appointment DROP CONSTRAINT {Appointment.OVERLAP_CONSTRAINT}'
+            )
+        base = timezone.make_aware(datetime.combine(future_weekday, datetime.min.time()))
+        created = {}
+        # A (9h–12h) cobre B e também C, que não é sua vizinha na ordenação
+        for name, hour, minutes in (('A', 9, 180), ('B', 10, 60), ('C', 10.75, 75), ('D', 13, 60)):
+            created[name] = appointment_factory(
+                data_hora=base + timedelta(hours=hour), duracao_minutos=minutes, paciente_nome=f"Paciente {name}"
+            )
+        return created
+    
+    def test_report_finds_non_adjacent_overlaps(self, legacy_overlaps, sample_psychologist):
+        """Testa que o relatório acha conflitos com consultas não vizinhas."""
+        from appointments.audit import find_overlaps
+        
+        overlaps = find_overlaps()
+        found = {(overlap.appointment_id, overlap.conflita_com) for overlap in overlaps}
+        a, b, c = legacy_overlaps['A'], legacy_overlaps['B'], legacy_overlaps['C']
+        assert found == {(b.id, a.id), (c.id, a.id)}
+        assert overlaps[0].conflita_ate == a.data_hora_fim
+        assert find_overlaps(professional_id=sample_psychologist.id) == []
+    
+    def test_fix_cancels_later_appointments(self, legacy_overlaps):
+        """Testa que --fix cancela os conflitos e mantém a primeira consulta."""
+        from io import StringIO
+        from django.core.management import call_command
+        from django.core.management.base import CommandError
+        
+        with pytest.raises(CommandError):
+            call_command('audit_overbooking', stdout=StringIO())
+        
+        call_command('audit_overbooking', '--fix', stdout=StringIO())
+        statuses = {
+            name: Appointment.objects.get(pk=appointment.pk).status
+            for name, appointment in legacy_overlaps.items()
+        }
+        assert statuses == {'A': 'AGENDADA', 'B': 'CANCELADA', 'C': 'CANCELADA', 'D': 'AGENDADA'}
+        call_command('audit_overbooking', stdout=StringIO())
+    
+    @pytest.mark.django_db(transaction=True)
+    def test_fix_on_schema_before_end_time(self, sample_professional, future_weekday):
+        """Testa --fix na base anterior à 0004 (sem data_hora_fim), antes da constraint."""
+        from io import StringIO
+        from django.core.management import call_command
+        from django.core.management.base import CommandError
+        from django.db import connection
+        from django.db.migrations.executor import MigrationExecutor
+        from django.utils import timezone
+        
+        executor = MigrationExecutor(connection)
+        latest = executor.loader.graph.leaf_nodes()
+        executor.migrate([('appointments', '0002_professionaldayoccupancy')])
+        try:
+            base = timezone.make_aware(datetime.combine(future_weekday, datetime.min.time()))
+            with connection.cursor() as cursor:
+                for hour, minutes in ((9, 120), (10, 60)):
+                    cursor.execute(
+                        """
+                        INSERT INTO appointments_appointment (
+                            professional_id, data_hora, duracao_minutos, status, paciente_nome,
+                            paciente_email, paciente_telefone, observacoes, created_at, updated_at
+                        ) VALUES (%s, %s, %s, 'AGENDADA', 'Paciente Legado', 'legado@test.com',
+                                  '(11) 98888-1010', '', now(), now())
+                        """,
+                        [sample_professional.id, base + timedelta(hours=hour), minutes],
+                    )
+            
+            out = StringIO()
+            call_command('audit_overbooking', '--fix', stdout=out)
+            assert '1 consulta(s) cancelada(s)' in out.getvalue()
+            assert 'rebuild_occupancy' in out.getvalue()
+        finally:
+            executor = MigrationExecutor(connection)
+            executor.migrate(latest)
+        
+        # A ocupação fica para o rebuild indicado ao operador
+        with pytest.raises(CommandError):
+            call_command('rebuild_occupancy', '--verify', stdout=StringIO())
+        call_command('rebuild_occupancy', stdout=StringIO())
+        call_command('rebuild_occupancy', '--verify', stdout=StringIO())
+    
+    def test_endpoint_admin_only(self, legacy_overlaps, authenticated_client, admin_client):
+        """Testa o endpoint de auditoria (relatório e correção)."""
+        response = authenticated_client.get('/api/v1/appointments/overbooking/')
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+        
+        response = admin_client.get('/api/v1/appointments/overbooking/')
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['count'] == 2
+        assert response.data['fixed'] is False
+        
+        response = admin_client.post('/api/v1/appointments/overbooking/')
+        assert response.data['count'] == 2
+        response = admin_client.get('/api/v1/appointments/overbooking/')
+        assert response.data['count'] == 0
+
+
+@pytest.mark.django_db
+@pytest.mark.api
+class TestAppointmentTextSearch:
+    """Testes dos filtros textuais (icontains e modo aproximado)."""
+    
+    @pytest.fixture
+    def silva(self, appointment_factory):
+        from django.utils import timezone
+        return appointment_factory(
+            data_hora=timezone.now() + timedelta(days=5),
+            paciente_nome="Maria da Silva",
+            paciente_email="maria@test.com"
+        )
+    
+    def test_fuzzy_is_opt_in(self, authenticated_client, silva):
+        """Testa que erros de digitação só casam com ?fuzzy=true."""
+        response = authenticated_client.get('/api/v1/appointments/', {'paciente_nome': 'silvaa'})
+        assert response.data['results'] == []
+        
+        response = authenticated_client.get('/api/v1/appointments/', {'paciente_nome': 'silvaa', 'fuzzy': 'true'})
+        assert [a['id'] for a in response.data['results']] == [silva.id]
+        
+        response = authenticated_client.get('/api/v1/appointments/', {'professional_name': 'joão silv'})
+        assert [a['id'] for a in response.data['results']] == [silva.id]
+    
+    def test_search_matches_patient_or_professional(self, authenticated_client, silva, sample_psychologist):
+        """Testa ?search= em paciente e profissional sem JOIN."""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        
+        for term, expected in (('MARIA@', [silva.id]), ('joão', [silva.id]), ('ninguém', [])):
+            with CaptureQueriesContext(connection) as queries:
+                response = authenticated_client.get('/api/v1/appointments/', {'search': term})
+            assert [a['id'] for a in response.data['results']] == expected, term
+            # O nome do profissional vira professional_id IN (SELECT ...), sem
+            # LIKE sobre o JOIN nem lista de ids montada no Python
+            where = [q['sql'].split('WHERE', 1)[-1] for q in queries.captured_queries if 'paciente_email' in q['sql']]
+            assert where and not any('"professionals_professional"."nome_social"' in sql for sql in where)
+            assert all('"professional_id" IN (SELECT' in sql for sql in where)
+    
+    def test_explain_command_runs(self, silva):
+        """Testa o comando de planos, inclusive o modo antes/depois."""
+        from io import StringIO
+        from django.core.management import call_command
+        
+        out = StringIO()
+        call_command('explain_appointment_search', '--term', 'silva', '--compare', stdout=out)
+        output = out.getvalue()
+        assert 'Com índices pg_trgm' in output and 'Sem índices pg_trgm' in output
+        
+        from django.db import connection
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_indexes WHERE indexname = 'appointment_paciente_trgm'")
+            assert cursor.fetchone() is not None
+
+
+@pytest.mark.django_db
+@pytest.mark.api
+class TestCalendarFilters:
+    """Testes dos filtros de calendário (intervalos em data_hora)."""
+    
+    @pytest.fixture
+    def appointments(self, appointment_factory):
+        """Consultas em bordas de mês/ano no fuso de São Paulo (UTC-3)."""
+        from datetime import timezone as dt_timezone
+        starts = {
+            # 31/12/2025 22:00 local = 01/01/2026 01:00 UTC
+            'virada': datetime(2026, 1, 1, 1, 0, tzinfo=dt_timezone.utc),
+            'marco_2026': datetime(2026, 3, 10, 15, 0, tzinfo=dt_timezone.utc),
+            'marco_2027': datetime(2027, 3, 2, 15, 0, tzinfo=dt_timezone.utc),
+        }
+        return {
+            name: appointment_factory(data_hora=start, status='REALIZADA').id
+            for name, start in starts.items()
+        }
+    
+    def _ids(self, client, **params):
+        response = client.get('/api/v1/appointments/', {'tz': 'America/Sao_Paulo', 'page_size': 100, **params})
+        assert response.status_code == status.HTTP_200_OK, response.data
+        return {a['id'] for a in response.data['results']}
+    
+    def test_month_year_and_day_in_local_time(self, authenticated_client, appointments):
+        """Testa mes/ano/data no fuso pedido."""
+        assert self._ids(authenticated_client, mes=12, ano=2025) == {appointments['virada']}
+        assert self._ids(authenticated_client, ano=2026) == {appointments['marco_2026']}
+        assert self._ids(authenticated_client, mes=3) == {appointments['marco_2026'], appointments['marco_2027']}
+        assert self._ids(authenticated_client, data='2025-12-31') == {appointments['virada']}
+        assert self._ids(authenticated_client, data='2026-01-01', tz='UTC') == {appointments['virada']}
+    
+    def test_iso_week(self, authenticated_client, appointments):
+        """Testa semana ISO, com e sem ano."""
+        # 10/03/2026 cai na semana 11; 02/03/2027 na semana 9
+        assert self._ids(authenticated_client, semana=11, ano=2026) == {appointments['marco_2026']}
+        assert self._ids(authenticated_client, semana=9) == {appointments['marco_2027']}
+        assert self._ids(authenticated_client, semana=53, ano=2026) == set()
+    
+    def test_week_and_month_intersect(self, authenticated_client, appointments):
+        """Testa que semana e mes juntos restringem um ao outro."""
+        # A semana 1 de 2026 vai de 29/12/2025 a 04/01/2026
+        assert self._ids(authenticated_client, semana=1, mes=12) == {appointments['virada']}
+        assert self._ids(authenticated_client, semana=1, mes=1) == set()
+        assert self._ids(authenticated_client, semana=11, mes=3, ano=2026) == {appointments['marco_2026']}
+        assert self._ids(authenticated_client, semana=9, mes=4) == set()
+    
+    def test_invalid_values_rejected(self, authenticated_client):
+        """Testa validação de mês e fuso."""
+        response = authenticated_client.get('/api/v1/appointments/', {'mes': 13})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        response = authenticated_client.get('/api/v1/appointments/', {'mes': 1, 'tz': 'Lua/Base'})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+    
+    def test_month_filter_uses_index(self, sample_professional, appointments):
+        """Testa que mes+ano vira Index Cond em data_hora (sem EXTRACT)."""
+        from django.db import connection
+        from appointments.filters import AppointmentFilter
+        
+        queryset = AppointmentFilter(
+            {'professional': sample_professional.id, 'mes': 3, 'ano': 2026, 'tz': 'America/Sao_Paulo'},
+            queryset=Appointment.objects.all()
+        ).qs
+        assert 'EXTRACT' not in str(queryset.query).upper()
+        
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            plan = queryset.explain()
+        index_conds = [line for line in plan.splitlines() if 'Index Cond' in line]
+        assert any('data_hora >=' in line and 'data_hora <' in line for line in index_conds), plan
+
+
+@pytest.mark.django_db
+@pytest.mark.api
+class TestSparseFieldsets:
+    """Testes de ?fields= e ?omit=."""
+    
+    def _select_sql(self, queries):
+        return next(q['sql'] for q in queries.captured_queries if 'FROM "appointments_appointment"' in q['sql'])
+    
+    def test_fields_prunes_response_and_columns(self, authenticated_client, sample_appointment):
+        """Testa que só os campos pedidos são serializados e buscados."""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        
+        with CaptureQueriesContext(connection) as queries:
+            response = authenticated_client.get(
+                f'/api/v1/appointments/{sample_appointment.id}/?fields=id,data_hora,status,can_cancel'
+            )
+        assert response.status_code == status.HTTP_200_OK
+        assert set(response.data) == {'id', 'data_hora', 'status', 'can_cancel'}
+        
+        sql = self._select_sql(queries)
+        assert 'observacoes' not in sql and 'paciente_email' not in sql
+        assert 'professionals_professional' not in sql
+    
+    def test_omit_and_nested(self, authenticated_client, sample_appointment, sample_professional):
+        """Testa ?omit= e campos aninhados completos."""
+        response = authenticated_client.get(
+            f'/api/v1/appointments/{sample_appointment.id}/?fields=id,professional_details&expand=professional'
+        )
+        assert response.data['professional_details']['nome_social'] == sample_professional.nome_social
+        
+        response = authenticated_client.get('/api/v1/appointments/?omit=paciente_nome,professional_name')
+        item = response.data['results'][0]
+        assert 'paciente_nome' not in item and 'professional_name' not in item
+        assert item['professional_profession'] == 'Médico'
+    
+    def test_unknown_field_rejected(self, authenticated_client, sample_appointment):
+        """Testa erro para campos desconhecidos."""
+        response = authenticated_client.get('/api/v1/appointments/?fields=id,senha')
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert 'senha' in str(response.data['fields'])
+    
+    def test_professionals_fields(self, authenticated_client, sample_professional):
+        """Testa sparse fieldsets nos profissionais."""
+        response = authenticated_client.get('/api/v1/professionals/?fields=id,nome_social')
+        assert response.data['results'][0] == {'id': sample_professional.id, 'nome_social': sample_professional.nome_social}
+
+
+@pytest.mark.django_db
+@pytest.mark.api
+class TestExpandProfessional:
+    """Testes de ?expand=professional."""
+    
+    def test_professional_details_is_opt_in(self, authenticated_client, sample_appointment):
+        """Testa que os dados aninhados só vêm com ?expand=professional."""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        
+        url = f'/api/v1/appointments/{sample_appointment.id}/'
+        with CaptureQueriesContext(connection) as queries:
+            response = authenticated_client.get(url)
+        assert 'professional_details' not in response.data
+        assert response.data['professional'] == sample_appointment.professional_id
+        assert not any('professionals_professional' in q['sql'] for q in queries.captured_queries)
+        
+        response = authenticated_client.get(f'{url}?expand=professional')
+        assert response.data['professional_details']['id'] == sample_appointment.professional_id
+    
+    def test_each_professional_serialized_once(self, authenticated_client, sample_professional, appointment_factory):
+        """Testa a memoização por resposta (paginado e em streaming)."""
+        import json
+        from unittest.mock import patch
+        from django.utils import timezone
+        from professionals.serializers import ProfessionalSerializer
+        
+        base = timezone.now().replace(hour=10, minute=0, second=0, microsecond=0) + timedelta(days=2)
+        for dia in range(3):
+            appointment_factory(data_hora=base + timedelta(days=dia))
+        
+        to_representation = ProfessionalSerializer.to_representation
+        with patch.object(
+            ProfessionalSerializer, 'to_representation', autospec=True, side_effect=to_representation
+        ) as spy:
+            response = authenticated_client.get('/api/v1/appointments/upcoming/?expand=professional')
+            assert len(response.data['results']) == 3
+            assert spy.call_count == 1
+            
+            response = authenticated_client.get('/api/v1/appointments/upcoming/?expand=professional&all=true')
+            items = json.loads(b''.join(response.streaming_content))
+            assert spy.call_count == 2
+        
+        assert {item['professional_details']['nome_social'] for item in items} == {sample_professional.nome_social}
+    
+    def test_unknown_expand_rejected(self, authenticated_client, sample_appointment):
+        """Testa erro para relações desconhecidas."""
+        response = authenticated_client.get(f'/api/v1/appointments/{sample_appointment.id}/?expand=paciente')
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert 'expand' in response.data
+
+
+@pytest.mark.django_db
+@pytest.mark.api
+class TestDerivedFields:
+    """Testes dos campos derivados calculados no banco."""
+    
+    def test_annotations_match_python(self, appointment_factory):
+        """Testa que as anotações coincidem com o cálculo em Python."""
+        from django.utils import timezone
+        from appointments.serializers import AppointmentSerializer
+        
+        now = timezone.now()
+        casos = [
+            (now - timedelta(hours=1), 15, 'AGENDADA'),
+            (now + timedelta(hours=2), 45, 'AGENDADA'),
+            (now + timedelta(days=3), 60, 'AGENDADA'),
+            (now + timedelta(days=4), 90, 'CANCELADA'),
+            (now + timedelta(days=5), 120, 'CONFIRMADA'),
+            (now + timedelta(days=6), 240, 'REALIZADA'),
+        ]
+        for data_hora, duracao, status_consulta in casos:
+            appointment_factory(data_hora=data_hora, duracao_minutos=duracao, status=status_consulta)
+        
+        campos = ('is_past', 'can_cancel', 'duracao_horas')
+        anotados = Appointment.objects.with_derived(now).order_by('data_hora')
+        for anotado, simples in zip(anotados, Appointment.objects.order_by('data_hora')):
+            esperado = AppointmentSerializer(simples, context={'now': now}).data
+            assert {campo: getattr(anotado, campo) for campo in campos} == {
+                campo: esperado[campo] for campo in campos
+            }
+        assert [a.duracao_horas for a in anotados] == ['15min', '45min', '1h', '1h30min', '2h', '4h']
+    
+    def test_api_reads_annotations(self, authenticated_client, sample_appointment):
+        """Testa que a resposta usa os valores calculados no banco."""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        
+        with CaptureQueriesContext(connection) as queries:
+            response = authenticated_client.get(f'/api/v1/appointments/{sample_appointment.id}/')
+        assert response.data['duracao_horas'] == '1h'
+        assert response.data['is_past'] is False
+        sql = next(q['sql'] for q in queries.captured_queries if 'FROM "appointments_appointment"' in q['sql'])
+        assert 'AS "can_cancel"' in sql
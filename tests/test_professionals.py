@@ -3,6 +3,7 @@ Testes para o app Professionals.
 """
 
 import pytest
+from datetime import datetime, timedelta
 from rest_framework import status
 from professionals.models import Professional
 
@@ -114,6 +115,57 @@ class TestProfessionalListAPI:
         
         assert response.status_code == status.HTTP_200_OK
         assert len(response.data['results']) >= 1
+    
+    def test_search_ignores_accents_and_matches_prefix(
+        self, authenticated_client, sample_professional, multiple_professionals
+    ):
+        """Testa busca sem acentos, por prefixo e por registro."""
+        for term in ('joao', 'JOÃO SILV', 'CRM-SP-123456', 'silva jo'):
+            response = authenticated_client.get('/api/v1/professionals/', {'search': term})
+            ids = [prof['id'] for prof in response.data['results']]
+            assert ids == [sample_professional.id], term
+        
+        response = authenticated_client.get('/api/v1/professionals/', {'search': 'Maria'})
+        assert response.data['results'] == []
+        assert 'search_vector' not in response.data
+    
+    def test_search_matches_substring_of_email_and_registro(
+        self, authenticated_client, sample_professional, multiple_professionals
+    ):
+        """Testa busca por trecho do meio do e-mail e do registro."""
+        for term in ('123456', 'SP-1234', 'silva@test', 'joao 123'):
+            response = authenticated_client.get('/api/v1/professionals/', {'search': term})
+            ids = [prof['id'] for prof in response.data['results']]
+            assert ids == [sample_professional.id], term
+        
+        # Trechos curtos demais não entram no ILIKE
+        response = authenticated_client.get('/api/v1/professionals/', {'search': '45'})
+        assert response.data['results'] == []
+    
+    def test_search_ranked_by_relevance(self, authenticated_client, sample_professional):
+        """Testa que o nome pesa mais que o e-mail na ordenação."""
+        by_email = Professional.objects.create(
+            nome_social="Dr. Ana Costa",
+            profissao="PSICOLOGO",
+            registro_profissional="CRP-06-111111",
+            cep="01310-100",
+            logradouro="Av. Paulista",
+            numero="200",
+            bairro="Bela Vista",
+            cidade="São Paulo",
+            estado="SP",
+            telefone="(11) 98765-1111",
+            email="silva.ana@test.com",
+        )
+        
+        response = authenticated_client.get('/api/v1/professionals/', {'search': 'silva'})
+        ids = [prof['id'] for prof in response.data['results']]
+        assert ids == [sample_professional.id, by_email.id]
+        assert 'search_vector' not in response.data['results'][0]
+        
+        # Ordenação explícita prevalece sobre a relevância
+        response = authenticated_client.get('/api/v1/professionals/', {'search': 'silva', 'ordering': 'nome_social'})
+        assert [prof['id'] for prof in response.data['results']] == [by_email.id, sample_professional.id]
 
 
 @pytest.mark.django_db
@@ -324,3 +376,292 @@ class TestProfessionalDeleteAPI:
         # Como usamos PROTECT no ForeignKey, deve dar erro se tentar deletar do banco
         # Mas como é soft delete, deve funcionar
         assert response.status_code in [status.HTTP_204_NO_CONTENT, status.HTTP_400_BAD_REQUEST]
+    
+    def test_list_inactive_paginated_and_streamed(
+        self, authenticated_client, inactive_professional, sample_professional
+    ):
+        """Testa inativos paginado por padrão e completo com ?all=true."""
+        import json
+        
+        response = authenticated_client.get('/api/v1/professionals/inativos/')
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['count'] == 1
+        assert response.data['results'][0]['id'] == inactive_professional.id
+        
+        response = authenticated_client.get('/api/v1/professionals/inativos/?all=true')
+        assert response.status_code == status.HTTP_200_OK
+        assert response.streaming
+        items = json.loads(b''.join(response.streaming_content))
+        assert [item['id'] for item in items] == [inactive_professional.id]
+
+
+@pytest.mark.django_db
+@pytest.mark.api
+class TestProfessionalFreeSlotsAPI:
+    """Testes da busca de horários livres entre profissionais."""
+    
+    def test_free_slots_merges_professionals(
+        self, authenticated_client, sample_professional, sample_psychologist, future_weekday, appointment_factory
+    ):
+        """Testa que o primeiro horário livre vem do profissional desocupado."""
+        day = future_weekday
+        appointment_factory(day, 8)
+        
+        response = authenticated_client.get(
+            f'/api/v1/professionals/free_slots/?cidade=São Paulo&start={day}&end={day}&duration=60&limit=3'
+        )
+        
+        assert response.status_code == status.HTTP_200_OK
+        results = response.data['results']
+        assert len(results) == 3
+        assert results[0]['professional_id'] == sample_psychologist.id
+        assert results[0]['data_hora'].hour == 8
+        assert [r['data_hora'] for r in results] == sorted(r['data_hora'] for r in results)
+    
+    def test_free_slots_requires_dates(self, authenticated_client):
+        """Testa que start e end são obrigatórios."""
+        response = authenticated_client.get('/api/v1/professionals/free_slots/?estado=SP')
+        
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+    
+    def test_free_slots_requires_bounded_candidates(
+        self, authenticated_client, sample_professional, sample_psychologist, future_weekday, monkeypatch
+    ):
+        """Testa que a busca exige filtro e limita o número de candidatos."""
+        from professionals import views
+        
+        period = f'start={future_weekday}&end={future_weekday}'
+        response = authenticated_client.get(f'/api/v1/professionals/free_slots/?{period}')
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert 'filtro' in response.data['error']
+        
+        monkeypatch.setattr(views, 'MAX_CANDIDATOS_BUSCA', 1)
+        response = authenticated_client.get(f'/api/v1/professionals/free_slots/?estado=SP&{period}')
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert 'refine' in response.data['error']
+    
+    def test_availability_heatmap(
+        self, admin_client, sample_professional, sample_psychologist, future_weekday, agenda_cache,
+        appointment_factory
+    ):
+        """Testa a matriz de capacidade livre contra a disponibilidade por dia."""
+        from appointments.availability import day_slots, load_availability
+        
+        appointment_factory(future_weekday, 9)
+        appointment_factory(future_weekday, 10, 10, professional=sample_psychologist)
+        end = future_weekday + timedelta(days=6)
+        
+        response = admin_client.get(
+            f'/api/v1/professionals/availability_heatmap/?cidade=São Paulo&start={future_weekday}&end={end}&duration=60'
+        )
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.data['days']) == 7
+        row = response.data['professionals'].index(
+            {'id': sample_professional.id, 'nome_social': sample_professional.nome_social}
+        )
+        assert response.data['open'][row][0] == 19
+        assert response.data['free'][row][0] == 16
+        assert response.data['open'][row][5] == 0
+        
+        ids = [professional['id'] for professional in response.data['professionals']]
+        schedules, occupancies = load_availability(ids, future_weekday, end)
+        for i, professional_id in enumerate(ids):
+            for j, day in enumerate(response.data['days']):
+                slots = day_slots(schedules, occupancies, professional_id, datetime.strptime(day, '%Y-%m-%d').date(), 60)
+                assert response.data['free'][i][j] == sum(available for _, available in slots)
+    
+    def test_availability_heatmap_requires_bounded_candidates(
+        self, admin_client, sample_professional, sample_psychologist, future_weekday, monkeypatch
+    ):
+        """Testa que a matriz exige filtro e limita o número de candidatos."""
+        from professionals import views
+        
+        period = f'start={future_weekday}&end={future_weekday}&duration=60'
+        response = admin_client.get(f'/api/v1/professionals/availability_heatmap/?{period}')
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert 'filtro' in response.data['error']
+        
+        monkeypatch.setattr(views, 'MAX_CANDIDATOS_BUSCA', 1)
+        response = admin_client.get(f'/api/v1/professionals/availability_heatmap/?estado=SP&{period}')
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert 'refine' in response.data['error']
+    
+    def test_availability_heatmap_admin_only(self, authenticated_client):
+        """Testa que a matriz é restrita a administradores."""
+        response = authenticated_client.get('/api/v1/professionals/availability_heatmap/')
+        
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+    
+    def test_next_available_returns_first_free_slot(
+        self, authenticated_client, sample_professional, agenda_cache, appointment_factory,
+        django_capture_on_commit_callbacks
+    ):
+        """Testa que o próximo horário livre pula os horários ocupados."""
+        from django.utils import timezone
+        
+        response = authenticated_client.get(
+            f'/api/v1/professionals/{sample_professional.id}/next-available/?duration=60'
+        )
+        assert response.status_code == status.HTTP_200_OK
+        first = response.data['data_hora']
+        assert first >= timezone.now()
+        
+        # O cache do dia é invalidado no commit, sem chamada explícita
+        with django_capture_on_commit_callbacks(execute=True):
+            appointment_factory(data_hora=first)
+        response = authenticated_client.get(
+            f'/api/v1/professionals/{sample_professional.id}/next-available/?duration=60'
+        )
+        assert response.data['data_hora'] > first
+    
+    def test_next_available_respects_horizon(self, authenticated_client, sample_professional, settings, agenda_cache):
+        """Testa que a busca para no horizonte configurado."""
+        from professionals.models import ProfessionalSchedule
+        
+        settings.NEXT_AVAILABLE_HORIZON_DAYS = 10
+        ProfessionalSchedule.objects.create(professional=sample_professional)
+        
+        response = authenticated_client.get(
+            f'/api/v1/professionals/{sample_professional.id}/next-available/'
+        )
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['data_hora'] is None
+        assert response.data['horizon_days'] == 10
+
+
+@pytest.mark.django_db
+class TestProfessionalSchedule:
+    """Testes dos modelos de expediente compilados."""
+    
+    def _schedule(self, professional, fuso_horario='America/Sao_Paulo'):
+        from datetime import time
+        from professionals.models import ProfessionalSchedule
+        
+        schedule = ProfessionalSchedule.objects.create(
+            professional=professional, fuso_horario=fuso_horario
+        )
+        schedule.intervals.create(dia_semana=0, inicio=time(9), fim=time(17))
+        schedule.intervals.create(dia_semana=0, inicio=time(12), fim=time(13), tipo='PAUSA')
+        return schedule
+    
+    def test_break_is_subtracted(self, sample_professional, future_weekday, agenda_cache):
+        """Testa que pausas são removidas dos intervalos abertos."""
+        from professionals.schedules import get_compiled_schedule
+        
+        self._schedule(sample_professional)
+        compiled = get_compiled_schedule(sample_professional.id)
+        
+        assert compiled.windows(future_weekday) == ((540, 720), (780, 1020))
+        starts = compiled.slot_starts(future_weekday, 60, 30)
+        assert [start.astimezone(compiled.tz).strftime('%H:%M') for start in starts][:6] == [
+            '09:00', '09:30', '10:00', '10:30', '11:00', '13:00'
+        ]
+        assert compiled.windows(future_weekday + timedelta(days=1)) == ()
+    
+    def test_compiled_once_per_request_without_cache(self, sample_professional, django_assert_num_queries):
+        """Testa que, sem cache compartilhado, o expediente é compilado uma vez por requisição."""
+        from datetime import date, time
+        from professionals.schedules import end_request_memo, get_compiled_schedule, start_request_memo
+        
+        schedule = self._schedule(sample_professional)
+        start_request_memo()
+        try:
+            # modelo + intervalos + exceções
+            with django_assert_num_queries(3):
+                get_compiled_schedule(sample_professional.id)
+            with django_assert_num_queries(0):
+                get_compiled_schedule(sample_professional.id)
+            
+            # Alteração no meio da requisição descarta a memória (terça-feira)
+            schedule.intervals.create(dia_semana=1, inicio=time(9), fim=time(12))
+            assert get_compiled_schedule(sample_professional.id).windows(date(2030, 1, 1)) == ((540, 720),)
+        finally:
+            end_request_memo()
+        
+        with django_assert_num_queries(3):
+            get_compiled_schedule(sample_professional.id)
+    
+    def test_exception_closes_day_and_invalidates(self, sample_professional, future_weekday, agenda_cache):
+        """Testa que exceções fecham o dia e invalidam o expediente compilado."""
+        from professionals.schedules import get_compiled_schedule
+        
+        schedule = self._schedule(sample_professional)
+        assert get_compiled_schedule(sample_professional.id).windows(future_weekday)
+        
+        schedule.exceptions.create(
+            data_inicio=future_weekday, data_fim=future_weekday, motivo='Congresso'
+        )
+        assert get_compiled_schedule(sample_professional.id).windows(future_weekday) == ()
+    
+    def test_timezone_shifts_slots(self, authenticated_client, sample_professional, future_weekday, agenda_cache):
+        """Testa que os horários seguem o fuso do expediente."""
+        from datetime import time
+        from zoneinfo import ZoneInfo
+        from professionals.schedules import get_compiled_schedule
+        
+        self._schedule(sample_professional, fuso_horario='America/Manaus')
+        response = authenticated_client.get(
+            f'/api/v1/appointments/available_slots/'
+            f'?professional_id={sample_professional.id}&date={future_weekday}'
+        )
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['timezone'] == 'America/Manaus'
+        assert response.data['slots'][0]['time'] == '09:00'
+        
+        # 9h em São Paulo (UTC-3) é 8h em Manaus (UTC-4), antes do expediente
+        compiled = get_compiled_schedule(sample_professional.id)
+        manaus = datetime.combine(future_weekday, time(9), tzinfo=ZoneInfo('America/Manaus'))
+        sao_paulo = datetime.combine(future_weekday, time(9), tzinfo=ZoneInfo('America/Sao_Paulo'))
+        assert compiled.contains(manaus, manaus + timedelta(hours=1))
+        assert not compiled.contains(sao_paulo, sao_paulo + timedelta(hours=1))
+    
+    def test_slots_on_dst_change_day(
+        self, authenticated_client, sample_professional, agenda_cache, appointment_factory
+    ):
+        """Testa a ocupação no dia em que começa o horário de verão do fuso."""
+        from datetime import date, time
+        from zoneinfo import ZoneInfo
+        
+        # Em Nova York o dia 14/03/2027 tem 23 horas (2h vira 3h)
+        day = date(2027, 3, 14)
+        schedule = self._schedule(sample_professional, fuso_horario='America/New_York')
+        schedule.intervals.create(dia_semana=6, inicio=time(9), fim=time(12))
+        appointment_factory(data_hora=datetime.combine(day, time(10), tzinfo=ZoneInfo('America/New_York')))
+        
+        response = authenticated_client.get(
+            f'/api/v1/appointments/available_slots/'
+            f'?professional_id={sample_professional.id}&date={day}&duration=60'
+        )
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['slots'] == [
+            {'time': '09:00', 'available': True},
+            {'time': '09:30', 'available': False},
+            {'time': '10:00', 'available': False},
+            {'time': '10:30', 'available': False},
+            {'time': '11:00', 'available': True},
+        ]
+    
+    def test_heatmap_falls_back_on_dst_change_day(self, sample_professional, agenda_cache, appointment_factory):
+        """Testa que a matriz usa day_slots no dia de 23 horas e bitset nos demais."""
+        from datetime import date, time
+        from unittest.mock import patch
+        from zoneinfo import ZoneInfo
+        from appointments import availability
+        
+        day = date(2027, 3, 14)
+        schedule = self._schedule(sample_professional, fuso_horario='America/New_York')
+        schedule.intervals.create(dia_semana=6, inicio=time(9), fim=time(12))
+        appointment_factory(data_hora=datetime.combine(day, time(10), tzinfo=ZoneInfo('America/New_York')))
+        
+        with patch.object(availability, 'day_slots', wraps=availability.day_slots) as fallback:
+            days, matrix = availability.availability_matrix(
+                [sample_professional.id], day - timedelta(days=1), day + timedelta(days=1), 60
+            )
+        
+        assert [call.args[3] for call in fallback.call_args_list] == [day]
+        # Domingo: 9h, 9h30, 10h, 10h30 e 11h no expediente; livres 9h e 11h
+        assert matrix[sample_professional.id] == [(0, 0), (2, 5), (12, 12)]